@@ -1,10 +1,19 @@
 from . import (
+    batching,
+    coalesce,
     config,
     error,
+    http_cache,
+    json_stream,
+    metrics,
     organization,
+    payload_codec,
     plan,
     project,
+    public_params,
     qgis_vector,
+    retry,
+    session,
     styledmap,
     team,
     user,
@@ -0,0 +1,167 @@
+"""
+地物の追加・更新・削除リクエストの適応的な分割
+
+- 地物数ではなく、エンコード後の推定バイト数でバッチを区切る
+  （点1000件は小さすぎ、複雑なポリゴン1000件は大きすぎる）
+- 1回のリクエストの所要時間を見て、目標時間に近づくよう次のバッチの大きさを調整する
+- エラーが起きたら次のバッチを小さくする
+- 学習した大きさは操作の種類ごとにプロバイダーとアップロード処理で共有する
+"""
+
+import threading
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, TypeVar
+
+from qgis.core import QgsFeature
+
+from .. import constants
+
+T = TypeVar("T")
+
+# 1リクエストの目標所要時間（秒）
+TARGET_SECONDS = 2.0
+# バッチのバイト数の初期値・下限・上限
+INITIAL_BATCH_BYTES = 2 * 1024 * 1024
+MIN_BATCH_BYTES = 64 * 1024
+MAX_BATCH_BYTES = 32 * 1024 * 1024
+
+# 属性1つあたりのJSON上のおおよそのバイト数
+_BYTES_PER_ATTRIBUTE = 24
+# レコードごとのキーや区切り文字のおおよそのバイト数
+_BYTES_PER_RECORD = 48
+
+
+class AdaptiveBatcher:
+    """Splits items into batches by estimated encoded bytes (thread-safe)
+
+    The byte budget grows while requests finish well under TARGET_SECONDS
+    and shrinks when they are slow or fail. Batches never exceed
+    constants.MAX_FEATURES_PER_REQUEST items (server limit).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_count: int = constants.MAX_FEATURES_PER_REQUEST,
+        initial_bytes: int = INITIAL_BATCH_BYTES,
+        min_bytes: int = MIN_BATCH_BYTES,
+        max_bytes: int = MAX_BATCH_BYTES,
+        target_seconds: float = TARGET_SECONDS,
+    ):
+        self.name = name
+        self.max_count = max_count
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.target_seconds = target_seconds
+        self._budget = initial_bytes
+        self._lock = threading.Lock()
+
+    @property
+    def budget(self) -> int:
+        """Current byte budget of a batch"""
+        with self._lock:
+            return self._budget
+
+    def batches(
+        self, items: Iterable[T], size_of: Callable[[T], int]
+    ) -> Iterator[List[T]]:
+        """Yield batches of items. items may be a lazy iterator; the budget
+        is read again for every batch so it follows record() feedback."""
+        batch: List[T] = []
+        batch_bytes = 0
+        budget = self.budget
+        for item in items:
+            size = size_of(item)
+            # memo: 1件だけで予算を超える地物は単独のバッチにする
+            if batch and (batch_bytes + size > budget or len(batch) >= self.max_count):
+                yield batch
+                batch = []
+                batch_bytes = 0
+                budget = self.budget
+            batch.append(item)
+            batch_bytes += size
+        if batch:
+            yield batch
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        """Adjust the budget from the duration and outcome of a request"""
+        with self._lock:
+            if not ok:
+                self._budget //= 2
+            elif seconds < self.target_seconds / 2:
+                self._budget = int(self._budget * 1.5)
+            elif seconds > self.target_seconds * 1.5:
+                # 所要時間が目標に比例するように縮める
+                self._budget = int(self._budget * self.target_seconds / seconds)
+            self._budget = min(self.max_bytes, max(self.min_bytes, self._budget))
+
+    def run(
+        self,
+        items: Iterable[T],
+        size_of: Callable[[T], int],
+        send: Callable[[List[T]], None],
+    ) -> int:
+        """Send all items in adaptive batches
+
+        Returns:
+            Number of items sent. The error of a failed batch is raised
+            (items of earlier batches have been sent).
+        """
+        sent = 0
+        for batch in self.batches(items, size_of):
+            self.send(batch, send)
+            sent += len(batch)
+        return sent
+
+    def send(self, batch: List[T], send: Callable[[List[T]], None]) -> None:
+        """Call send(batch) and record its duration and outcome"""
+        started = time.perf_counter()
+        try:
+            send(batch)
+        except Exception:
+            self.record(time.perf_counter() - started, ok=False)
+            raise
+        self.record(time.perf_counter() - started)
+
+
+def feature_size(feature: QgsFeature) -> int:
+    """Estimated encoded size of a feature in an add-features request"""
+    size = _BYTES_PER_RECORD + _BYTES_PER_ATTRIBUTE * feature.attributeCount()
+    geometry = feature.geometry()
+    if not geometry.isNull():
+        # memo: WKBはJSONではbase64になるので4/3倍する
+        size += geometry.constGet().wkbSize() * 4 // 3
+    return size
+
+
+def geometry_item_size(item: Dict) -> int:
+    """Estimated encoded size of a change-geometry-values item"""
+    return _BYTES_PER_RECORD + len(item["geom"]) * 4 // 3
+
+
+def attribute_item_size(item: Dict) -> int:
+    """Estimated encoded size of a change-attribute-values item"""
+    size = _BYTES_PER_RECORD
+    for value in item["properties"].values():
+        size += _BYTES_PER_ATTRIBUTE
+        if isinstance(value, str):
+            size += len(value)
+    return size
+
+
+def kumoy_id_size(_kumoy_id: int) -> int:
+    return 12
+
+
+_batchers: Dict[str, AdaptiveBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_batcher(name: str) -> AdaptiveBatcher:
+    """Return the process-wide batcher for an operation, e.g. "add_features".
+    The provider and the upload algorithm share what it has learned."""
+    with _batchers_lock:
+        batcher = _batchers.get(name)
+        if batcher is None:
+            batcher = _batchers[name] = AdaptiveBatcher(name)
+        return batcher
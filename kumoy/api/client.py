@@ -1,14 +1,65 @@
+import gzip
 import json
-from typing import Any, Dict, Optional
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from qgis.core import QgsBlockingNetworkRequest, QgsFeedback, QgsNetworkAccessManager
+from qgis.PyQt.QtCore import QByteArray, QEventLoop, QTimer, QUrl
+from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
+
+from ...pyqt_version import (
+    Q_NETWORK_REPLY_ERROR,
+    Q_NETWORK_REQUEST_ATTRIBUTE,
+    Q_NETWORK_REQUEST_HEADER,
+    exec_event_loop,
+)
+from . import error as api_error
+from . import coalesce, retry
+from .coalesce import get_request_coalescer
+from .http_cache import get_http_cache
+from .metrics import get_request_metrics
+from .session import get_session
 
-from qgis.core import QgsBlockingNetworkRequest
-from qgis.PyQt.QtCore import QByteArray, QUrl
-from qgis.PyQt.QtNetwork import QNetworkRequest
+AUTHENTICATION_ERROR = {"content": None, "error": "Authentication Error"}
 
-from ...pyqt_version import Q_NETWORK_REQUEST_HEADER
-from ..get_token import get_token
-from . import config as api_config
-from . import error as api_error
+# 非同期リクエストの同時実行数の既定値
+DEFAULT_MAX_CONCURRENCY = 4
+
+# この大きさ以上のPOSTリクエストボディはgzip圧縮して送信する
+GZIP_MIN_BODY_SIZE = 64 * 1024
+GZIP_COMPRESS_LEVEL = 5
+
+HTTP_UNSUPPORTED_MEDIA_TYPE = 415
+
+# エンドポイント中のIDとみなすパスセグメント（UUID・数値・長い英数字）
+_ID_SEGMENT = re.compile(
+    r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}"
+    r"|\d+"
+    r"|(?=[A-Za-z0-9_-]*\d)[A-Za-z0-9_-]{16,}"
+)
+
+
+# スレッドごとの、ブロッキングリクエストを中断するためのフィードバック（request_feedbackで設定）
+_thread_state = threading.local()
+
+
+@contextmanager
+def request_feedback(feedback: Optional[QgsFeedback]) -> Iterator[None]:
+    """Abort blocking requests sent from the current thread within the block
+    (and skip their retries) when feedback is canceled"""
+    previous = getattr(_thread_state, "feedback", None)
+    _thread_state.feedback = feedback
+    try:
+        yield
+    finally:
+        _thread_state.feedback = previous
+
+
+def _current_feedback() -> Optional[QgsFeedback]:
+    return getattr(_thread_state, "feedback", None)
 
 
 def handle_blocking_reply(content: QByteArray) -> Any:
@@ -22,54 +73,388 @@ def handle_blocking_reply(content: QByteArray) -> Any:
     return json.loads(text)
 
 
+def _build_url(endpoint: str, params: Optional[Dict] = None) -> str:
+    """Build an absolute API URL with optional query parameters"""
+    url = f"{get_session().server_url()}/api{endpoint}"
+    if params:
+        query_items = []
+        for key, value in params.items():
+            query_items.append(f"{key}={value}")
+        url = f"{url}?{'&'.join(query_items)}"
+    return url
+
+
+def _build_request(
+    url: str,
+    auth_header: bytes,
+    json_body: bool = False,
+    content_type: Optional[str] = None,
+) -> QNetworkRequest:
+    """Create a request with authorization (and content type) headers"""
+    req = QNetworkRequest(QUrl(url))
+    req.setRawHeader(b"Authorization", auth_header)
+    # memo: Accept-Encodingは設定しないこと。Qtが自動で "gzip, deflate" を付与し、
+    # 圧縮されたレスポンスを透過的に展開する（自前で設定すると展開されなくなる）
+    get_session().prepare_request(req)
+    if json_body:
+        content_type = "application/json"
+    if content_type:
+        req.setHeader(Q_NETWORK_REQUEST_HEADER.ContentTypeHeader, content_type)
+    return req
+
+
+def _encode_body(data: Any) -> QByteArray:
+    # Use json.dumps to preserve dictionary order
+    json_data = json.dumps(data, ensure_ascii=False)
+    return QByteArray(json_data.encode("utf-8"))
+
+
+def _encode_compressible_body(
+    data: Any, req: QNetworkRequest
+) -> Tuple[QByteArray, bool]:
+    """Encode body as JSON and gzip it when large enough.
+    Sets Content-Encoding on req and returns (body, compressed)."""
+    return _compress_body(json.dumps(data, ensure_ascii=False).encode("utf-8"), req)
+
+
+def _compress_body(raw: bytes, req: QNetworkRequest) -> Tuple[QByteArray, bool]:
+    """Gzip an encoded body when large enough (see _encode_compressible_body)"""
+    if len(raw) < GZIP_MIN_BODY_SIZE or not get_session().gzip_enabled():
+        return QByteArray(raw), False
+
+    req.setRawHeader(b"Content-Encoding", b"gzip")
+    return QByteArray(gzip.compress(raw, compresslevel=GZIP_COMPRESS_LEVEL)), True
+
+
+def endpoint_template(endpoint: str) -> str:
+    """Replace IDs in an endpoint path with {id}, e.g.
+    /_qgis/vector/3f2a...-.../get-diff -> /_qgis/vector/{id}/get-diff"""
+    path = endpoint.split("?", 1)[0]
+    return "/".join(
+        "{id}" if _ID_SEGMENT.fullmatch(segment) else segment
+        for segment in path.split("/")
+    )
+
+
+def _status_code(reply) -> Optional[int]:
+    status = reply.attribute(Q_NETWORK_REQUEST_ATTRIBUTE.HttpStatusCodeAttribute)
+    return int(status) if status else None
+
+
+def _retry_after(reply) -> Optional[float]:
+    return retry.parse_retry_after(bytes(reply.rawHeader(b"Retry-After")).decode())
+
+
+def _wait(seconds: float, feedback: Optional[QgsFeedback] = None) -> None:
+    """Wait without blocking the event loop of the calling thread
+    (the main thread keeps repainting while a retry is pending).
+    Returns early when feedback is canceled."""
+    if seconds <= 0:
+        return
+    loop = QEventLoop()
+    QTimer.singleShot(int(seconds * 1000), loop.quit)
+    if feedback is not None:
+        feedback.canceled.connect(loop.quit)
+        if feedback.isCanceled():
+            return
+    exec_event_loop(loop)
+
+
+def _send_blocking(
+    method: str,
+    endpoint: str,
+    req: QNetworkRequest,
+    body: Optional[QByteArray] = None,
+) -> Tuple[QgsBlockingNetworkRequest, int]:
+    """Send request, retrying transient failures according to the retry policy
+
+    Returns:
+        (blocking_request, error code of the last attempt)
+    """
+    template = endpoint_template(endpoint)
+    policy = retry.get_retry_policy()
+    metrics = retry.get_retry_metrics()
+    feedback = _current_feedback()
+    session = get_session()
+    # memo: GUIスレッドからの場合、QgsBlockingNetworkRequestはリクエストごとに新しいスレッド
+    # （とそのスレッドのQgsNetworkAccessManager）で送信するので、コネクションは再利用されない
+    from_gui_thread = coalesce.is_gui_thread()
+    if not from_gui_thread:
+        session.watch_manager(QgsNetworkAccessManager.instance())
+
+    attempt = 0
+    while True:
+        attempt += 1
+        blocking_request = QgsBlockingNetworkRequest()
+        if method == "GET":
+            # memo: Qt側のキャッシュは使わず、再検証はhttp_cacheで行う
+            err = blocking_request.get(req, forceRefresh=True, feedback=feedback)
+        elif method == "POST":
+            err = blocking_request.post(req, body, feedback=feedback)
+        elif method == "PUT":
+            err = blocking_request.put(req, body, feedback=feedback)
+        elif method == "DELETE":
+            err = blocking_request.deleteResource(req, feedback=feedback)
+        else:
+            raise ValueError(f"Unsupported method: {method}")
+
+        reply = blocking_request.reply()
+        session.record_reply(reply, new_connection=from_gui_thread)
+
+        if err == QgsBlockingNetworkRequest.NoError:
+            metrics.record_result(template, attempt, ok=True)
+            return blocking_request, err
+
+        status = _status_code(reply)
+        retry_after = _retry_after(reply)
+        canceled = feedback is not None and feedback.isCanceled()
+        if (
+            canceled
+            or attempt >= policy.max_attempts
+            or not policy.waits_for(retry_after)
+            or not retry.should_retry(
+                method, template, status, reply.error(), retry_after
+            )
+        ):
+            metrics.record_result(template, attempt, ok=False)
+            return blocking_request, err
+
+        metrics.record_retry(template, status)
+        # memo: time.sleepだとメインスレッドから呼ばれた場合にQGISが固まる
+        _wait(policy.delay(attempt, retry_after), feedback)
+
+
+def _decode_reply(
+    method: str,
+    endpoint: str,
+    started: float,
+    request_bytes: int,
+    status: Optional[int],
+    content: QByteArray,
+) -> Any:
+    """Decode a reply body and record the request in the metrics"""
+    wall_time = time.perf_counter() - started
+    decode_started = time.perf_counter()
+    try:
+        return handle_blocking_reply(content)
+    finally:
+        get_request_metrics().record(
+            endpoint_template(endpoint),
+            method,
+            status,
+            wall_time,
+            request_bytes,
+            content.size(),
+            time.perf_counter() - decode_started,
+        )
+
+
+def _raise_reply_error(content: Any, error_message: str) -> None:
+    """Raise an API exception from an error reply"""
+    # Handle empty content when network error occurs
+    if not content:
+        api_error.raise_error({"message": error_message, "error": ""})
+    else:
+        api_error.raise_error(content)
+
+
+def _get(endpoint: str, url: str, auth_header: bytes, cache: bool) -> Any:
+    req = _build_request(url, auth_header)
+
+    cache_key = None
+    cached = None
+    if cache:
+        http_cache = get_http_cache()
+        cache_key = http_cache.make_key(url, auth_header)
+        cached = http_cache.lookup(cache_key)
+        if cached is not None:
+            if cached.etag:
+                req.setRawHeader(b"If-None-Match", cached.etag.encode("utf-8"))
+            if cached.last_modified:
+                req.setRawHeader(
+                    b"If-Modified-Since", cached.last_modified.encode("utf-8")
+                )
+
+    # Execute request
+    started = time.perf_counter()
+    blocking_request, err = _send_blocking("GET", endpoint, req)
+    reply = blocking_request.reply()
+    status = _status_code(reply)
+
+    if cached is not None and status == 304:
+        # Not Modified: キャッシュ済みの本文を使う
+        return _decode_reply(
+            "GET", endpoint, started, 0, status, QByteArray(cached.body)
+        )
+
+    content = _decode_reply("GET", endpoint, started, 0, status, reply.content())
+    if err != QgsBlockingNetworkRequest.NoError:
+        _raise_reply_error(content, blocking_request.errorMessage())
+
+    if cache_key is not None:
+        get_http_cache().store(
+            cache_key,
+            etag=bytes(reply.rawHeader(b"ETag")).decode("utf-8"),
+            last_modified=bytes(reply.rawHeader(b"Last-Modified")).decode("utf-8"),
+            body=bytes(reply.content()),
+        )
+
+    return content
+
+
+def _post(endpoint: str, url: str, auth_header: bytes, raw: bytes) -> Any:
+    req = _build_request(url, auth_header, json_body=True)
+    body, compressed = _compress_body(raw, req)
+
+    # Execute request
+    started = time.perf_counter()
+    blocking_request, err = _send_blocking("POST", endpoint, req, body)
+    reply = blocking_request.reply()
+    status = _status_code(reply)
+
+    if compressed and status == HTTP_UNSUPPORTED_MEDIA_TYPE:
+        # サーバーがgzipされたリクエストを受け付けない場合は無効化して再送する
+        get_session().disable_gzip()
+        return _post(endpoint, url, auth_header, raw)
+
+    content = _decode_reply(
+        "POST", endpoint, started, body.size(), status, reply.content()
+    )
+    if err != QgsBlockingNetworkRequest.NoError:
+        _raise_reply_error(content, blocking_request.errorMessage())
+
+    return content
+
+
+def _post_raw(
+    endpoint: str,
+    url: str,
+    auth_header: bytes,
+    body: bytes,
+    content_type: str,
+    accept: Optional[str],
+) -> Tuple[bytes, str]:
+    req = _build_request(url, auth_header, content_type=content_type)
+    if accept:
+        req.setRawHeader(b"Accept", accept.encode("utf-8"))
+    request_body, compressed = _compress_body(body, req)
+
+    # Execute request
+    started = time.perf_counter()
+    blocking_request, err = _send_blocking("POST", endpoint, req, request_body)
+    reply = blocking_request.reply()
+    status = _status_code(reply)
+
+    if status == HTTP_UNSUPPORTED_MEDIA_TYPE:
+        if compressed:
+            get_session().disable_gzip()
+            return _post_raw(endpoint, url, auth_header, body, content_type, accept)
+        raise api_error.UnsupportedMediaTypeError(
+            "Unsupported Media Type", content_type
+        )
+
+    if err != QgsBlockingNetworkRequest.NoError:
+        content = _decode_reply(
+            "POST", endpoint, started, request_body.size(), status, reply.content()
+        )
+        _raise_reply_error(content, blocking_request.errorMessage())
+
+    raw = reply.content()
+    get_request_metrics().record(
+        endpoint_template(endpoint),
+        "POST",
+        status,
+        time.perf_counter() - started,
+        request_body.size(),
+        raw.size(),
+        0.0,
+    )
+    return raw.data(), bytes(reply.rawHeader(b"Content-Type")).decode("utf-8")
+
+
+def _put(endpoint: str, url: str, auth_header: bytes, data: Any) -> Any:
+    req = _build_request(url, auth_header, json_body=True)
+
+    # Execute request
+    body = _encode_body(data)
+    started = time.perf_counter()
+    blocking_request, err = _send_blocking("PUT", endpoint, req, body)
+    reply = blocking_request.reply()
+    content = _decode_reply(
+        "PUT", endpoint, started, body.size(), _status_code(reply), reply.content()
+    )
+    if err != QgsBlockingNetworkRequest.NoError:
+        _raise_reply_error(content, blocking_request.errorMessage())
+
+    return content
+
+
+def _delete(endpoint: str, url: str, auth_header: bytes) -> Any:
+    req = _build_request(url, auth_header)
+
+    # Execute request
+    started = time.perf_counter()
+    blocking_request, err = _send_blocking("DELETE", endpoint, req)
+    reply = blocking_request.reply()
+    content = _decode_reply(
+        "DELETE", endpoint, started, 0, _status_code(reply), reply.content()
+    )
+    if err != QgsBlockingNetworkRequest.NoError:
+        _raise_reply_error(content, blocking_request.errorMessage())
+
+    return content
+
+
+def _coalesced(
+    method: str,
+    endpoint: str,
+    url: str,
+    send: Callable[[], Any],
+    body: Optional[bytes] = None,
+    variant: str = "",
+) -> Any:
+    """Send a request through the process-wide coalescer: identical read-only
+    requests in flight share one round trip and GET results are memoised
+    briefly. Requests which change data invalidate the memo.
+    The key (a hash of variant and body) is computed for read-only requests only."""
+    coalescer = get_request_coalescer()
+    if not coalesce.is_read_only(method, endpoint_template(endpoint)):
+        try:
+            return send()
+        finally:
+            coalescer.invalidate()
+    return coalescer.run(
+        coalescer.make_key(method, url, body, variant), send, memo=method == "GET"
+    )
+
+
 class ApiClient:
     """Base API client for Kumoy backend"""
 
     @staticmethod
-    def get(endpoint: str, params: Optional[Dict] = None) -> Any:
+    def get(endpoint: str, params: Optional[Dict] = None, cache: bool = False) -> Any:
         """
         Args:
             endpoint (str): _description_
             params (Optional[Dict], optional): _description_. Defaults to None.
+            cache (bool, optional): Revalidate a cached response with
+                ETag/Last-Modified instead of downloading it again. Defaults to False.
 
         Returns:
             dict: {"content": dict, "error": None} or {"content": None, "error": str}
         """
-        _api_config = api_config.get_api_config()
         # Build URL with query parameters if provided
-        url = f"{_api_config.SERVER_URL}/api{endpoint}"
-        if params:
-            query_items = []
-            for key, value in params.items():
-                query_items.append(f"{key}={value}")
-            url = f"{url}?{'&'.join(query_items)}"
+        url = _build_url(endpoint, params)
 
         # Create request with authorization header
-        req = QNetworkRequest(QUrl(url))
-        token = get_token()
+        auth_header = get_session().auth_header()
+        if not auth_header:
+            return dict(AUTHENTICATION_ERROR)
 
-        if not token:
-            return {"content": None, "error": "Authentication Error"}
-
-        req.setRawHeader(
-            "Authorization".encode("utf-8"),
-            f"Bearer {token}".encode("utf-8"),
+        return _coalesced(
+            "GET", endpoint, url, lambda: _get(endpoint, url, auth_header, cache)
         )
 
-        # Execute request
-        blocking_request = QgsBlockingNetworkRequest()
-        err = blocking_request.get(req, forceRefresh=True)
-        content = handle_blocking_reply(blocking_request.reply().content())
-        if err != QgsBlockingNetworkRequest.NoError:
-            # Handle empty content when network error occurs
-            if not content:
-                error_message = blocking_request.errorMessage()
-                api_error.raise_error({"message": error_message, "error": ""})
-            else:
-                api_error.raise_error(content)
-
-        return content
-
     @staticmethod
     def post(endpoint: str, data: Any) -> Any:
         """Make POST request to API endpoint
@@ -81,38 +466,57 @@ class ApiClient:
         Returns:
             dict: {"content": dict, "error": None} or {"content": None, "error": str}
         """
-        _api_config = api_config.get_api_config()
-        url = f"{_api_config.SERVER_URL}/api{endpoint}"
+        url = _build_url(endpoint)
 
         # Create request with authorization header
-        req = QNetworkRequest(QUrl(url))
-        token = get_token()
-
-        if not token:
-            return {"content": None, "error": "Authentication Error"}
-
-        req.setRawHeader(
-            "Authorization".encode("utf-8"),
-            f"Bearer {token}".encode("utf-8"),
+        auth_header = get_session().auth_header()
+        if not auth_header:
+            return dict(AUTHENTICATION_ERROR)
+
+        raw = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        return _coalesced(
+            "POST",
+            endpoint,
+            url,
+            lambda: _post(endpoint, url, auth_header, raw),
+            body=raw,
         )
-        req.setHeader(Q_NETWORK_REQUEST_HEADER.ContentTypeHeader, "application/json")
-
-        # Use json.dumps to preserve dictionary order
-        json_data = json.dumps(data, ensure_ascii=False)
-        byte_array = QByteArray(json_data.encode("utf-8"))
 
-        # Execute request
-        blocking_request = QgsBlockingNetworkRequest()
-        err = blocking_request.post(req, byte_array)
-        content = handle_blocking_reply(blocking_request.reply().content())
-        if err != QgsBlockingNetworkRequest.NoError:
-            if not content:
-                error_message = blocking_request.errorMessage()
-                api_error.raise_error({"message": error_message, "error": ""})
-            else:
-                api_error.raise_error(content)
+    @staticmethod
+    def post_raw(
+        endpoint: str,
+        body: bytes,
+        content_type: str = "application/json",
+        accept: Optional[str] = None,
+    ) -> Tuple[bytes, str]:
+        """Make POST request with an already encoded body and return
+        (response body, response Content-Type) without decoding the body
+
+        For payloads other than plain JSON and for large responses which are
+        decoded incrementally (see payload_codec). Errors are raised the same
+        way as ApiClient.post.
+
+        Raises:
+            UnauthorizedError: not logged in
+            UnsupportedMediaTypeError: the server does not accept content_type
+        """
+        url = _build_url(endpoint)
 
-        return content
+        # Create request with authorization header
+        auth_header = get_session().auth_header()
+        if not auth_header:
+            raise api_error.UnauthorizedError(AUTHENTICATION_ERROR["error"])
+
+        # memo: 形式が異なれば別のリクエストとして扱う。ボディは連結せずにキーに含める
+        # （add-featuresなどの大きなボディを複製しない）
+        return _coalesced(
+            "POST",
+            endpoint,
+            url,
+            lambda: _post_raw(endpoint, url, auth_header, body, content_type, accept),
+            body=body,
+            variant=f"{content_type}\n{accept}",
+        )
 
     @staticmethod
     def put(endpoint: str, data: Any) -> Any:
@@ -125,38 +529,16 @@ class ApiClient:
         Returns:
             dict: {"content": dict, "error": None} or {"content": None, "error": str}
         """
-        _api_config = api_config.get_api_config()
-        url = f"{_api_config.SERVER_URL}/api{endpoint}"
+        url = _build_url(endpoint)
 
         # Create request with authorization header
-        req = QNetworkRequest(QUrl(url))
-        token = get_token()
-
-        if not token:
-            return {"content": None, "error": "Authentication Error"}
+        auth_header = get_session().auth_header()
+        if not auth_header:
+            return dict(AUTHENTICATION_ERROR)
 
-        req.setRawHeader(
-            "Authorization".encode("utf-8"),
-            f"Bearer {token}".encode("utf-8"),
+        return _coalesced(
+            "PUT", endpoint, url, lambda: _put(endpoint, url, auth_header, data)
         )
-        req.setHeader(Q_NETWORK_REQUEST_HEADER.ContentTypeHeader, "application/json")
-
-        # Use json.dumps to preserve dictionary order
-        json_data = json.dumps(data, ensure_ascii=False)
-        byte_array = QByteArray(json_data.encode("utf-8"))
-
-        # Execute request
-        blocking_request = QgsBlockingNetworkRequest()
-        err = blocking_request.put(req, byte_array)
-        content = handle_blocking_reply(blocking_request.reply().content())
-        if err != QgsBlockingNetworkRequest.NoError:
-            if not content:
-                error_message = blocking_request.errorMessage()
-                api_error.raise_error({"message": error_message, "error": ""})
-            else:
-                api_error.raise_error(content)
-
-        return content
 
     @staticmethod
     def delete(endpoint: str) -> Any:
@@ -168,30 +550,259 @@ class ApiClient:
         Returns:
             dict: {"content": dict, "error": None} or {"content": None, "error": str}
         """
-        _api_config = api_config.get_api_config()
-        url = f"{_api_config.SERVER_URL}/api{endpoint}"
+        url = _build_url(endpoint)
 
         # Create request with authorization header
-        req = QNetworkRequest(QUrl(url))
-        token = get_token()
+        auth_header = get_session().auth_header()
+        if not auth_header:
+            return dict(AUTHENTICATION_ERROR)
 
-        if not token:
-            return {"content": None, "error": "Authentication Error"}
-
-        req.setRawHeader(
-            "Authorization".encode("utf-8"),
-            f"Bearer {token}".encode("utf-8"),
+        return _coalesced(
+            "DELETE", endpoint, url, lambda: _delete(endpoint, url, auth_header)
         )
 
-        # Execute request
-        blocking_request = QgsBlockingNetworkRequest()
-        err = blocking_request.deleteResource(req)
-        content = handle_blocking_reply(blocking_request.reply().content())
-        if err != QgsBlockingNetworkRequest.NoError:
-            if not content:
-                error_message = blocking_request.errorMessage()
-                api_error.raise_error({"message": error_message})
-            else:
-                api_error.raise_error(content)
-
-        return content
+    @staticmethod
+    def get_async(endpoint: str, params: Optional[Dict] = None) -> "ApiFuture":
+        """Start GET request without blocking. See ApiClient.get"""
+        return _send_async("GET", endpoint, _build_url(endpoint, params))
+
+    @staticmethod
+    def post_async(endpoint: str, data: Any) -> "ApiFuture":
+        """Start POST request without blocking. See ApiClient.post"""
+        return _send_async("POST", endpoint, _build_url(endpoint), data)
+
+    @staticmethod
+    def put_async(endpoint: str, data: Any) -> "ApiFuture":
+        """Start PUT request without blocking. See ApiClient.put"""
+        return _send_async("PUT", endpoint, _build_url(endpoint), data)
+
+    @staticmethod
+    def delete_async(endpoint: str) -> "ApiFuture":
+        """Start DELETE request without blocking. See ApiClient.delete"""
+        return _send_async("DELETE", endpoint, _build_url(endpoint))
+
+
+class ApiFuture:
+    """Pending result of an asynchronous API request
+
+    Callbacks are invoked from the event loop of the thread which started
+    the request, so the thread must run an event loop (the main thread always
+    does; use gather() to wait from elsewhere).
+    """
+
+    def __init__(self):
+        self._done = False
+        self._result: Any = None
+        self._exception: Optional[BaseException] = None
+        self._callbacks: List[Callable[["ApiFuture"], None]] = []
+        self._reply: Optional[QNetworkReply] = None
+        self._cancelled = False
+
+    def done(self) -> bool:
+        return self._done
+
+    def result(self) -> Any:
+        """Return the decoded response, or raise the API error"""
+        if not self._done:
+            raise RuntimeError("API request has not finished yet")
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self) -> Optional[BaseException]:
+        return self._exception
+
+    def add_done_callback(self, callback: Callable[["ApiFuture"], None]) -> None:
+        """Call callback(future) when finished (immediately if already done)"""
+        if self._done:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def cancel(self) -> None:
+        """Abort the request. The future finishes with an error."""
+        if self._done:
+            return
+        self._cancelled = True
+        if self._reply is not None:
+            self._reply.abort()
+
+    def _set_result(self, result: Any) -> None:
+        self._result = result
+        self._finish()
+
+    def _set_exception(self, exception: BaseException) -> None:
+        self._exception = exception
+        self._finish()
+
+    def _finish(self) -> None:
+        self._done = True
+        self._reply = None
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+
+def _send_async(method: str, endpoint: str, url: str, data: Any = None) -> ApiFuture:
+    """Send request through the shared network access manager.
+    Transient failures are retried on a timer without blocking the event loop."""
+    future = ApiFuture()
+
+    auth_header = get_session().auth_header()
+    if not auth_header:
+        future._set_result(dict(AUTHENTICATION_ERROR))
+        return future
+
+    req = _build_request(url, auth_header, json_body=method in ("POST", "PUT"))
+    body, compressed = None, False
+    if method == "POST":
+        body, compressed = _encode_compressible_body(data, req)
+    elif method == "PUT":
+        body = _encode_body(data)
+
+    template = endpoint_template(endpoint)
+    policy = retry.get_retry_policy()
+    metrics = retry.get_retry_metrics()
+    request_bytes = body.size() if body is not None else 0
+    started = time.perf_counter()
+
+    def send(attempt: int):
+        if future._cancelled:
+            future._set_exception(api_error.AppError("Request cancelled", endpoint))
+            return
+
+        # QgsNetworkAccessManagerはスレッドごとに共有されるインスタンスで、
+        # プロキシ設定・タイムアウト・コネクションプールをQGIS本体と共有する
+        nam = QgsNetworkAccessManager.instance()
+        get_session().watch_manager(nam)
+        if method == "GET":
+            reply = nam.get(req)
+        elif method == "POST":
+            reply = nam.post(req, body)
+        elif method == "PUT":
+            reply = nam.put(req, body)
+        elif method == "DELETE":
+            reply = nam.deleteResource(req)
+        else:
+            raise ValueError(f"Unsupported method: {method}")
+
+        future._reply = reply
+        reply.finished.connect(lambda: on_finished(reply, attempt))
+
+    def on_finished(reply, attempt: int):
+        status = _status_code(reply)
+        if compressed and status == HTTP_UNSUPPORTED_MEDIA_TYPE:
+            # サーバーがgzipされたリクエストを受け付けない場合は無効化して再送する
+            get_session().disable_gzip()
+            reply.deleteLater()
+            retried = _send_async(method, endpoint, url, data)
+            future._reply = retried._reply
+            retried.add_done_callback(
+                lambda f: (
+                    future._set_exception(f.exception())
+                    if f.exception() is not None
+                    else future._set_result(f.result())
+                )
+            )
+            return
+
+        get_session().record_reply(reply)
+        failed = reply.error() != Q_NETWORK_REPLY_ERROR.NoError
+        retry_after = _retry_after(reply)
+        if (
+            failed
+            and not future._cancelled
+            and attempt < policy.max_attempts
+            and policy.waits_for(retry_after)
+            and retry.should_retry(method, template, status, reply.error(), retry_after)
+        ):
+            metrics.record_retry(template, status)
+            delay = policy.delay(attempt, retry_after)
+            reply.deleteLater()
+            future._reply = None
+            QTimer.singleShot(int(delay * 1000), lambda: send(attempt + 1))
+            return
+
+        metrics.record_result(template, attempt, ok=not failed)
+        if not coalesce.is_read_only(method, template):
+            get_request_coalescer().invalidate()
+        try:
+            content = _decode_reply(
+                method, endpoint, started, request_bytes, status, reply.readAll()
+            )
+            if failed:
+                _raise_reply_error(content, reply.errorString())
+        except Exception as e:
+            future._set_exception(e)
+        else:
+            future._set_result(content)
+        finally:
+            reply.deleteLater()
+
+    send(1)
+    return future
+
+
+def gather(
+    calls: List[Callable[[], ApiFuture]],
+    max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+) -> List[Any]:
+    """Run API calls concurrently and wait until all of them finish
+
+    Args:
+        calls: Functions starting a request, e.g.
+            lambda: ApiClient.get_async(f"/organization/{org_id}/projects")
+        max_concurrency: Maximum number of requests in flight at once
+
+    Returns:
+        Results in the same order as calls
+
+    Raises:
+        The first API error (in call order). Requests not started yet are
+        skipped once an error occurred.
+    """
+    results: List[Any] = [None] * len(calls)
+    errors: Dict[int, BaseException] = {}
+    if not calls:
+        return results
+
+    loop = QEventLoop()
+    next_index = 0
+    in_flight = 0
+
+    def start_next():
+        nonlocal next_index, in_flight
+        while (
+            next_index < len(calls)
+            and in_flight < max(1, max_concurrency)
+            and not errors
+        ):
+            index = next_index
+            next_index += 1
+            in_flight += 1
+            try:
+                future = calls[index]()
+            except Exception as e:
+                in_flight -= 1
+                errors[index] = e
+                break
+            future.add_done_callback(lambda f, i=index: on_done(i, f))
+
+    def on_done(index: int, future: ApiFuture):
+        nonlocal in_flight
+        in_flight -= 1
+        if future.exception() is not None:
+            errors[index] = future.exception()
+        else:
+            results[index] = future.result()
+        start_next()
+        if in_flight == 0 and loop.isRunning():
+            loop.quit()
+
+    start_next()
+    if in_flight > 0:
+        exec_event_loop(loop)
+
+    if errors:
+        raise errors[min(errors)]
+    return results
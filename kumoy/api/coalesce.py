@@ -0,0 +1,182 @@
+"""
+同一リクエストの重複排除
+
+- 同じ (メソッド, エンドポイント, ボディのハッシュ) のリクエストが実行中なら、
+  新たに送信せずその結果を待って共有する（GUIスレッドは待たずに独立して送信する）
+- GETの結果は短時間（MEMO_TTL_SECONDS）メモしておき、直後の同じGETに再利用する
+  （例: レイヤーを開く際に VectorItem.add_to_map と KumoyDataProvider の双方が
+  get_vector を呼ぶ）
+- 変更を伴うリクエストを送るとメモは破棄される
+"""
+
+import copy
+import hashlib
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from qgis.PyQt.QtCore import QCoreApplication, QThread
+
+from ...settings_manager import add_setting_listener
+
+# GETの結果を再利用する時間（秒）
+MEMO_TTL_SECONDS = 3.0
+# メモするエントリ数の上限
+MAX_MEMO_ENTRIES = 256
+
+# データを変更しない（結果を共有してよい）POSTエンドポイント
+READ_ONLY_POST_ENDPOINTS = [
+    re.compile(p)
+    for p in (
+        r"/_qgis/vector/\{id\}/get-features-v2",
+        r"/_qgis/vector/\{id\}/get-diff",
+    )
+]
+
+
+def is_read_only(method: str, endpoint_template: str) -> bool:
+    if method == "GET":
+        return True
+    if method == "POST":
+        return any(p.fullmatch(endpoint_template) for p in READ_ONLY_POST_ENDPOINTS)
+    return False
+
+
+@dataclass
+class CoalesceStats:
+    executed: int = 0  # 実際に送信したリクエスト数
+    joined: int = 0  # 実行中のリクエストの結果を共有した数
+    memo_hits: int = 0  # メモから返した数
+
+
+def is_gui_thread() -> bool:
+    """Whether the calling thread is the GUI (main) thread"""
+    app = QCoreApplication.instance()
+    return app is not None and QThread.currentThread() == app.thread()
+
+
+class _InFlight:
+    def __init__(self):
+        self.thread = threading.get_ident()
+        self.done = threading.Event()
+        self.joiners = 0
+        self.result: Any = None  # 共有用の複製（共有する場合のみ）
+        self.error: Optional[BaseException] = None
+
+
+class RequestCoalescer:
+    """Shares results of identical read-only requests (thread-safe)"""
+
+    def __init__(self, memo_ttl: float = MEMO_TTL_SECONDS):
+        self.memo_ttl = memo_ttl
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._memo: Dict[str, Tuple[float, Any]] = {}
+        # memo: 変更リクエストの前に開始したGETの結果をメモしないための世代
+        self._generation = 0
+        self._stats = CoalesceStats()
+
+    @staticmethod
+    def make_key(
+        method: str, url: str, body: Optional[bytes] = None, variant: str = ""
+    ) -> str:
+        """Key of a request. variant distinguishes requests with the same body
+        (e.g. content type); it is hashed before the body without copying it."""
+        if not body and not variant:
+            return f"{method} {url} "
+        digest = hashlib.sha256(f"{variant}\n".encode("utf-8"))
+        if body:
+            digest.update(body)
+        return f"{method} {url} {digest.hexdigest()}"
+
+    def run(self, key: str, send: Callable[[], Any], memo: bool = False) -> Any:
+        """Return send()'s result, sharing it with identical concurrent calls
+
+        Args:
+            memo: reuse the result for MEMO_TTL_SECONDS (GET only)
+
+        Results handed to joining callers or memoised are deep copies, so
+        callers may modify them. Errors are raised to every caller sharing
+        the request. The GUI thread never waits for another thread's request.
+        """
+        with self._lock:
+            if memo:
+                entry = self._memo.get(key)
+                if entry is not None and time.monotonic() - entry[0] < self.memo_ttl:
+                    self._stats.memo_hits += 1
+                    return copy.deepcopy(entry[1])
+
+            in_flight = self._in_flight.get(key)
+            # memo: 同じスレッドからの再入（イベントループ中の呼び出し）で待つとデッドロックするので、
+            # その場合は独立して送信する。GUIスレッドもイベントループなしで待つとQGISが固まり、
+            # 実行中のリクエストがメインスレッドを必要とする場合はデッドロックするので待たない
+            if (
+                in_flight is not None
+                and in_flight.thread != threading.get_ident()
+                and not is_gui_thread()
+            ):
+                in_flight.joiners += 1
+                self._stats.joined += 1
+                owner = False
+            else:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+                self._stats.executed += 1
+                owner = True
+            generation = self._generation
+
+        if not owner:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return copy.deepcopy(in_flight.result)
+
+        result = None
+        try:
+            result = send()
+        except BaseException as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is in_flight:
+                    del self._in_flight[key]
+                # memo: 一覧から外したので、これ以降に参加する呼び出し元はない
+                joiners = in_flight.joiners
+                store_memo = (
+                    memo and in_flight.error is None and generation == self._generation
+                )
+            if in_flight.error is None and (joiners or store_memo):
+                # 呼び出し元が結果を変更しても影響しないよう、共有用の複製を持つ
+                in_flight.result = copy.deepcopy(result)
+            if store_memo:
+                with self._lock:
+                    if generation == self._generation:
+                        self._memo[key] = (time.monotonic(), in_flight.result)
+                        while len(self._memo) > MAX_MEMO_ENTRIES:
+                            self._memo.pop(next(iter(self._memo)))
+            in_flight.done.set()
+
+        return result
+
+    def invalidate(self, _key: Optional[str] = None) -> None:
+        """Drop memoised results, e.g. after a request which changes data"""
+        with self._lock:
+            self._memo.clear()
+            self._generation += 1
+
+    def stats(self) -> CoalesceStats:
+        with self._lock:
+            return copy.copy(self._stats)
+
+
+_coalescer = RequestCoalescer()
+# 設定（サーバー・トークン）が変わったら、別のユーザーの結果を返さないよう破棄する
+add_setting_listener(_coalescer.invalidate)
+
+
+def get_request_coalescer() -> RequestCoalescer:
+    """Return the process-wide request coalescer"""
+    return _coalescer
@@ -61,6 +61,15 @@ class UnderMaintenanceError(Exception):
         super().__init__(message)
 
 
+class UnsupportedMediaTypeError(Exception):
+    """Exception raised when the server does not accept the request body format"""
+
+    def __init__(self, message: str, error: str = ""):
+        self.message = message
+        self.error = error
+        super().__init__(f"{message} : {error}")
+
+
 def raise_error(error: dict):
     """
     APIのエラーレスポンスを受け取り、適切な例外を発生させる
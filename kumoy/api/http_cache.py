@@ -0,0 +1,188 @@
+"""
+GETレスポンスの条件付きキャッシュ（ETag / Last-Modified による再検証）
+
+キャッシュしたレスポンスは必ずサーバーに再検証してから使うため、
+古いデータを返すことはない。変更がなければサーバーは 304 を返し、
+本文の再ダウンロードを省略できる。
+"""
+
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional
+
+from qgis.core import Qgis, QgsApplication, QgsMessageLog
+
+from ...settings_manager import add_setting_listener
+from ..constants import LOG_CATEGORY
+
+# メモリ上に保持するエントリ数の上限
+MAX_MEMORY_ENTRIES = 128
+# ディスク上に保持するエントリ数の上限
+MAX_DISK_ENTRIES = 1024
+
+
+@dataclass
+class CacheEntry:
+    etag: str
+    last_modified: str
+    body: bytes
+
+
+def _get_cache_dir() -> str:
+    """Return the default directory where cached responses are stored."""
+    setting_dir = QgsApplication.qgisSettingsDirPath()
+    cache_dir = os.path.join(setting_dir, "kumoygis", "http_cache")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def _token_subject(auth_header: bytes) -> str:
+    """Return the user of a Bearer token (JWT `sub`) so entries are per user
+    and survive token refreshes. Falls back to a hash of the header."""
+    try:
+        token = auth_header.decode("utf-8").split(" ", 1)[1]
+        payload = token.split(".")[1]
+        payload += "=" * ((4 - len(payload) % 4) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))["sub"]
+    except Exception:
+        return hashlib.sha256(auth_header).hexdigest()
+
+
+class HttpCache:
+    """ETag / Last-Modified cache for GET responses
+
+    Entries are kept in memory (LRU) and persisted to `directory` when given.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self._directory = directory
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, CacheEntry]" = OrderedDict()
+
+    def make_key(self, url: str, auth_header: bytes) -> str:
+        subject = _token_subject(auth_header)
+        return hashlib.sha256(f"{subject}\n{url}".encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry
+
+        entry = self._read_from_disk(key)
+        if entry is not None:
+            self._remember(key, entry)
+        return entry
+
+    def store(self, key: str, etag: str, last_modified: str, body: bytes) -> None:
+        if not etag and not last_modified:
+            # 再検証できないレスポンスはキャッシュしない
+            return
+        entry = CacheEntry(etag=etag, last_modified=last_modified, body=body)
+        self._remember(key, entry)
+        self._write_to_disk(key, entry)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self._directory is None or not os.path.isdir(self._directory):
+            return
+        for filename in os.listdir(self._directory):
+            try:
+                os.unlink(os.path.join(self._directory, filename))
+            except OSError as e:
+                QgsMessageLog.logMessage(
+                    f"Ignored file access error: {e}", LOG_CATEGORY, Qgis.Info
+                )
+
+    def _remember(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._memory[key] = entry
+            self._memory.move_to_end(key)
+            while len(self._memory) > MAX_MEMORY_ENTRIES:
+                self._memory.popitem(last=False)
+
+    def _read_from_disk(self, key: str) -> Optional[CacheEntry]:
+        if self._directory is None:
+            return None
+        meta_path = os.path.join(self._directory, f"{key}.json")
+        body_path = os.path.join(self._directory, f"{key}.body")
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                body = f.read()
+        except (OSError, ValueError):
+            return None
+        return CacheEntry(
+            etag=meta.get("etag", ""),
+            last_modified=meta.get("last_modified", ""),
+            body=body,
+        )
+
+    def _write_to_disk(self, key: str, entry: CacheEntry) -> None:
+        if self._directory is None:
+            return
+        try:
+            os.makedirs(self._directory, exist_ok=True)
+            with open(os.path.join(self._directory, f"{key}.body"), "wb") as f:
+                f.write(entry.body)
+            with open(
+                os.path.join(self._directory, f"{key}.json"), "w", encoding="utf-8"
+            ) as f:
+                json.dump({"etag": entry.etag, "last_modified": entry.last_modified}, f)
+            self._trim_disk()
+        except OSError as e:
+            QgsMessageLog.logMessage(
+                f"Failed to write HTTP cache entry: {e}", LOG_CATEGORY, Qgis.Info
+            )
+
+    def _trim_disk(self) -> None:
+        """Delete least recently written entries above MAX_DISK_ENTRIES"""
+        meta_files = [
+            os.path.join(self._directory, name)
+            for name in os.listdir(self._directory)
+            if name.endswith(".json")
+        ]
+        if len(meta_files) <= MAX_DISK_ENTRIES:
+            return
+        meta_files.sort(key=os.path.getmtime)
+        for meta_path in meta_files[: len(meta_files) - MAX_DISK_ENTRIES]:
+            body_path = meta_path[: -len(".json")] + ".body"
+            for path in (meta_path, body_path):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+
+
+_http_cache: Optional[HttpCache] = None
+
+
+def get_http_cache() -> HttpCache:
+    """Return the process-wide HTTP cache stored in the QGIS settings dir"""
+    global _http_cache
+    if _http_cache is None:
+        _http_cache = HttpCache(_get_cache_dir())
+    return _http_cache
+
+
+def set_http_cache(cache: HttpCache) -> None:
+    """Replace the process-wide HTTP cache (e.g. memory only or another dir)"""
+    global _http_cache
+    _http_cache = cache
+
+
+def _on_setting_changed(key: Optional[str]) -> None:
+    # プラグイン設定のリセット時はキャッシュも破棄する
+    if key is None and _http_cache is not None:
+        _http_cache.clear()
+
+
+add_setting_listener(_on_setting_changed)
@@ -0,0 +1,124 @@
+"""
+JSON配列を要素ごとに逐次デコードする
+
+get-features-v2 のレスポンスは最大5000件の地物の配列で、json.loads で
+一括デコードすると本文・文字列・全地物のdictが同時にメモリに載る。
+ここでは本文をチャンクごとにUTF-8デコードし、要素を1つずつ取り出すことで、
+同時に保持するのは本文と処理中の地物だけにする。
+"""
+
+import codecs
+import json
+from typing import Any, Iterator, Optional, Union
+
+# 一度にUTF-8デコードするバイト数
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+# 配列の要素の直後に来うる文字
+_DELIMITERS = _WHITESPACE + ",]"
+_decoder = json.JSONDecoder()
+
+
+class _TextBuffer:
+    """Text decoded from the source so far, minus what has been consumed"""
+
+    def __init__(
+        self,
+        data: Union[bytes, bytearray, memoryview],
+        chunk_size: int,
+        decoder: json.JSONDecoder,
+    ):
+        self._view = memoryview(data)
+        self._json_decoder = decoder
+        self._offset = 0
+        self._chunk_size = chunk_size
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.pos = 0
+
+    def fill(self) -> bool:
+        """Decode more input. Returns False at end of input."""
+        if self._offset >= len(self._view):
+            return False
+        # 未消費のテキストが大きい（巨大な要素を読んでいる）ときは読み込み量を倍に増やし、
+        # 再デコードの回数を対数回に抑える
+        size = max(self._chunk_size, len(self.text) - self.pos)
+        chunk = self._view[self._offset : self._offset + size]
+        self._offset += len(chunk)
+        final = self._offset >= len(self._view)
+        self.text = self.text[self.pos :] + self._decoder.decode(chunk, final=final)
+        self.pos = 0
+        return True
+
+    def skip_whitespace(self) -> None:
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or not self.fill():
+                return
+
+    def next_char(self) -> str:
+        """Consume and return the next non-whitespace character ("" at end)"""
+        self.skip_whitespace()
+        if self.pos >= len(self.text):
+            return ""
+        char = self.text[self.pos]
+        self.pos += 1
+        return char
+
+    def decode_value(self) -> Any:
+        self.skip_whitespace()
+        while True:
+            try:
+                value, end = self._json_decoder.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                # 要素がチャンクの境界をまたいでいる
+                if not self.fill():
+                    raise
+                continue
+            if (
+                end == len(self.text) or self.text[end] not in _DELIMITERS
+            ) and self.fill():
+                # 数値は途中で切れていてもデコードできてしまう（"1.5"が"1."で切れると1になる）ため、
+                # 続きを読んで再度デコードする
+                continue
+            self.pos = end
+            return value
+
+
+def iter_json_array(
+    data: Union[bytes, bytearray, memoryview],
+    chunk_size: int = CHUNK_SIZE,
+    decoder: Optional[json.JSONDecoder] = None,
+) -> Iterator[Any]:
+    """Yield the elements of a JSON array one at a time
+
+    Args:
+        data: UTF-8 encoded JSON text whose top level is an array.
+            An empty body yields nothing.
+        decoder: decoder for the elements, e.g. with an object_hook
+
+    Raises:
+        ValueError: data is not a JSON array (json.JSONDecodeError for
+            malformed elements)
+    """
+    buffer = _TextBuffer(data, chunk_size, decoder or _decoder)
+
+    char = buffer.next_char()
+    if char == "":
+        return
+    if char != "[":
+        raise ValueError(f"Expected a JSON array, got {char!r}")
+
+    buffer.skip_whitespace()
+    if buffer.text[buffer.pos : buffer.pos + 1] == "]":
+        return
+
+    while True:
+        yield buffer.decode_value()
+        char = buffer.next_char()
+        if char == "]":
+            return
+        if char != ",":
+            raise ValueError(f"Expected ',' or ']' in JSON array, got {char!r}")
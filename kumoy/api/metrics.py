@@ -0,0 +1,257 @@
+"""
+APIリクエストの計測
+
+- リクエストごとにエンドポイント・メソッド・ステータス・所要時間・
+  送受信バイト数・JSONデコード時間を記録する
+- 直近のサンプルのみを保持し（ローリング）、エンドポイントごとに集計する
+- 集計結果はKumoyのログカテゴリまたはJSONファイルに出力できる
+  （プラグインメニューの「Dump API Metrics」、または設定 dump_metrics_on_unload が
+  "true" の場合はプラグインの終了時・ログアウト時に dump_metrics() で出力する）
+"""
+
+import bisect
+import json
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from typing import Deque, Dict, List, Optional
+
+from qgis.core import Qgis, QgsApplication, QgsMessageLog
+
+from ... import settings_manager
+from ..constants import LOG_CATEGORY
+
+# 保持するサンプル数
+MAX_SAMPLES = 2000
+
+# 所要時間ヒストグラムのバケット上限（秒）
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+@dataclass
+class RequestSample:
+    endpoint: str  # エンドポイントのテンプレート（IDは{id}に置換済み）
+    method: str
+    status: Optional[int]  # Noneはネットワークエラー（タイムアウト・切断など）
+    wall_time: float  # 秒（再送を含む）
+    request_bytes: int
+    response_bytes: int
+    decode_time: float  # 秒
+    timestamp: float
+
+
+@dataclass
+class PhaseSample:
+    """Time spent outside the HTTP round trip, e.g. WKB encoding"""
+
+    name: str
+    seconds: float
+    items: int
+    timestamp: float
+
+
+@dataclass
+class EndpointSummary:
+    count: int
+    errors: int
+    wall_time_total: float
+    wall_time_p50: float
+    wall_time_p95: float
+    wall_time_max: float
+    decode_time_total: float
+    request_bytes: int
+    response_bytes: int
+    histogram: Dict[str, int]  # バケット上限（"<=0.5s"など）-> 件数
+
+
+def _is_error(status: Optional[int]) -> bool:
+    return status is None or status >= 400
+
+
+def _percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(q * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def _bucket_label(index: int) -> str:
+    if index < len(LATENCY_BUCKETS):
+        return f"<={LATENCY_BUCKETS[index]}s"
+    return f">{LATENCY_BUCKETS[-1]}s"
+
+
+class RequestMetrics:
+    """Thread-safe rolling window of request and phase samples"""
+
+    def __init__(self, max_samples: int = MAX_SAMPLES):
+        self._lock = threading.Lock()
+        self._requests: Deque[RequestSample] = deque(maxlen=max_samples)
+        self._phases: Deque[PhaseSample] = deque(maxlen=max_samples)
+
+    def record(
+        self,
+        endpoint: str,
+        method: str,
+        status: Optional[int],
+        wall_time: float,
+        request_bytes: int,
+        response_bytes: int,
+        decode_time: float,
+    ) -> None:
+        sample = RequestSample(
+            endpoint,
+            method,
+            status,
+            wall_time,
+            request_bytes,
+            response_bytes,
+            decode_time,
+            time.time(),
+        )
+        with self._lock:
+            self._requests.append(sample)
+
+    def record_phase(self, name: str, seconds: float, items: int = 0) -> None:
+        with self._lock:
+            self._phases.append(PhaseSample(name, seconds, items, time.time()))
+
+    @contextmanager
+    def measure(self, name: str, items: int = 0):
+        """Record the time spent in the with-block as phase `name`"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record_phase(name, time.perf_counter() - started, items)
+
+    def samples(self) -> List[RequestSample]:
+        with self._lock:
+            return list(self._requests)
+
+    def summary(self) -> Dict[str, EndpointSummary]:
+        """Aggregate the retained samples per "METHOD endpoint" """
+        grouped: Dict[str, List[RequestSample]] = {}
+        for sample in self.samples():
+            grouped.setdefault(f"{sample.method} {sample.endpoint}", []).append(sample)
+
+        result = {}
+        for key, samples in grouped.items():
+            wall_times = sorted(s.wall_time for s in samples)
+            histogram = [0] * (len(LATENCY_BUCKETS) + 1)
+            for wall_time in wall_times:
+                histogram[bisect.bisect_left(LATENCY_BUCKETS, wall_time)] += 1
+            result[key] = EndpointSummary(
+                count=len(samples),
+                errors=sum(1 for s in samples if _is_error(s.status)),
+                wall_time_total=sum(wall_times),
+                wall_time_p50=_percentile(wall_times, 0.5),
+                wall_time_p95=_percentile(wall_times, 0.95),
+                wall_time_max=wall_times[-1],
+                decode_time_total=sum(s.decode_time for s in samples),
+                request_bytes=sum(s.request_bytes for s in samples),
+                response_bytes=sum(s.response_bytes for s in samples),
+                histogram={_bucket_label(i): n for i, n in enumerate(histogram) if n},
+            )
+        return result
+
+    def phase_summary(self) -> Dict[str, dict]:
+        with self._lock:
+            phases = list(self._phases)
+        grouped: Dict[str, List[PhaseSample]] = {}
+        for phase in phases:
+            grouped.setdefault(phase.name, []).append(phase)
+        return {
+            name: {
+                "count": len(samples),
+                "seconds_total": sum(s.seconds for s in samples),
+                "seconds_median": statistics.median(s.seconds for s in samples),
+                "items": sum(s.items for s in samples),
+            }
+            for name, samples in grouped.items()
+        }
+
+    def dump_to_log(self) -> None:
+        """Write the summary to the Kumoy log category, slowest first"""
+        summary = self.summary()
+        for key, s in sorted(
+            summary.items(), key=lambda item: item[1].wall_time_total, reverse=True
+        ):
+            QgsMessageLog.logMessage(
+                f"{key}: n={s.count} err={s.errors} "
+                f"total={s.wall_time_total:.2f}s p50={s.wall_time_p50:.3f}s "
+                f"p95={s.wall_time_p95:.3f}s max={s.wall_time_max:.3f}s "
+                f"decode={s.decode_time_total:.2f}s "
+                f"sent={s.request_bytes:,}B received={s.response_bytes:,}B",
+                LOG_CATEGORY,
+                Qgis.Info,
+            )
+        for name, p in self.phase_summary().items():
+            QgsMessageLog.logMessage(
+                f"{name}: n={p['count']} total={p['seconds_total']:.2f}s "
+                f"items={p['items']:,}",
+                LOG_CATEGORY,
+                Qgis.Info,
+            )
+
+    def dump_to_file(self, path: str) -> None:
+        """Write the summary and the raw samples to a JSON file"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "endpoints": {k: asdict(v) for k, v in self.summary().items()},
+                    "phases": self.phase_summary(),
+                    "samples": [asdict(s) for s in self.samples()],
+                },
+                f,
+                indent=2,
+            )
+
+    def dump(self, directory: str) -> Optional[str]:
+        """Write the summary to the log and a timestamped JSON file in
+        directory. Returns the file path, or None when nothing was recorded."""
+        with self._lock:
+            if not self._requests and not self._phases:
+                return None
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(
+            directory, time.strftime("metrics-%Y%m%d-%H%M%S.json", time.localtime())
+        )
+        self.dump_to_log()
+        self.dump_to_file(path)
+        return path
+
+    def reset(self) -> None:
+        with self._lock:
+            self._requests.clear()
+            self._phases.clear()
+
+
+_metrics = RequestMetrics()
+
+
+def get_request_metrics() -> RequestMetrics:
+    """Return the process-wide request metrics"""
+    return _metrics
+
+
+def get_metrics_dir() -> str:
+    return os.path.join(QgsApplication.qgisSettingsDirPath(), "kumoygis", "metrics")
+
+
+def dump_metrics() -> Optional[str]:
+    """Dump the process-wide request metrics to the log and a JSON file in
+    get_metrics_dir(). Returns the file path, or None when nothing was recorded."""
+    return _metrics.dump(get_metrics_dir())
+
+
+def dump_metrics_if_enabled() -> Optional[str]:
+    """dump_metrics() when the dump_metrics_on_unload setting is "true"
+    (called when the plugin is unloaded and on logout)"""
+    if settings_manager.get_settings().dump_metrics_on_unload != "true":
+        return None
+    return dump_metrics()
@@ -27,7 +27,7 @@ def get_organizations() -> List[OrganizationWithRole]:
     Returns:
         List of Organization objects
     """
-    response = ApiClient.get("/organization")
+    response = ApiClient.get("/organization", cache=True)
 
     organizations = []
     for org in response:
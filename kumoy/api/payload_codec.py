@@ -0,0 +1,284 @@
+"""
+地物の送受信に使うペイロードのエンコード方式
+
+- JsonCodec: 従来の形式。WKBはbase64文字列としてJSONに含める
+- WkbFramesCodec: WKBをbase64にせず、長さ付きのバイナリとしてJSONの後ろに並べる
+  （base64による約33%のサイズ増加とエンコード・デコードの処理を省く）
+
+どちらの形式でも、呼び出し側が扱うデータの "kumoy_wkb" はWKBのbytesになる。
+バイナリ形式はサーバーが /api/_public/params の qgisPayloadCodecs で
+対応を示している場合のみ使い、それ以外はJSONにフォールバックする。
+"""
+
+import base64
+import json
+import struct
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from ...settings_manager import add_setting_listener
+from .json_stream import iter_json_array
+from .public_params import PUBLIC_PARAMS_SETTING_KEY, get_public_params_service
+
+JSON_CONTENT_TYPE = "application/json"
+WKB_FRAMES_CONTENT_TYPE = "application/vnd.kumoy.wkb-frames"
+
+# サーバーが対応しているペイロード形式を示す /api/_public/params のキー
+PUBLIC_PARAMS_CODECS_KEY = "qgisPayloadCodecs"
+
+_WKB_KEY = "kumoy_wkb"
+_UINT32 = struct.Struct(">I")
+
+
+class RecordStream:
+    """Request body {key: [record, ...]} whose records are produced lazily
+
+    Codecs write each record straight into one growing buffer instead of
+    building the whole document first, so encoding a large batch needs
+    little more memory than the encoded payload itself.
+
+    Args:
+        records: returns a new iterator over the records each time it is
+            called (the body may be encoded again, e.g. on a JSON fallback)
+    """
+
+    def __init__(self, key: str, records: Callable[[], Iterable[Dict]]):
+        self.key = key
+        self.records = records
+
+
+def _write_records(
+    buffer: bytearray, stream: RecordStream, encoder: json.JSONEncoder
+) -> None:
+    buffer += b"{" + json.dumps(stream.key).encode("utf-8") + b": ["
+    first = True
+    for record in stream.records():
+        if not first:
+            buffer += b", "
+        buffer += encoder.encode(record).encode("utf-8")
+        first = False
+    buffer += b"]}"
+
+
+class PayloadCodec:
+    """Encodes request bodies and decodes response bodies of vector endpoints"""
+
+    content_type: str = ""
+
+    def encode(self, data: Any) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, body: bytes) -> Any:
+        raise NotImplementedError
+
+    def iter_array(self, body: bytes) -> Iterator[Any]:
+        """Yield the elements of an array response one at a time"""
+        raise NotImplementedError
+
+
+def _hook_decoder(decode_wkb: Callable[[Any], bytes]) -> json.JSONDecoder:
+    def object_hook(obj: dict) -> dict:
+        if _WKB_KEY in obj:
+            obj[_WKB_KEY] = decode_wkb(obj[_WKB_KEY])
+        return obj
+
+    return json.JSONDecoder(object_hook=object_hook)
+
+
+class JsonCodec(PayloadCodec):
+    """WKB as base64 strings inside JSON"""
+
+    content_type = JSON_CONTENT_TYPE
+
+    def __init__(self):
+        self._decoder = _hook_decoder(base64.b64decode)
+
+    def encode(self, data: Any) -> bytes:
+        if isinstance(data, RecordStream):
+            buffer = bytearray()
+            _write_records(
+                buffer,
+                data,
+                json.JSONEncoder(ensure_ascii=False, default=_base64_default),
+            )
+            return buffer
+        # memo: bytesはjson.dumpsのdefaultで直列化の途中にbase64へ変換する
+        return json.dumps(data, ensure_ascii=False, default=_base64_default).encode(
+            "utf-8"
+        )
+
+    def decode(self, body: bytes) -> Any:
+        if not body.strip():
+            return {}
+        return self._decoder.decode(body.decode("utf-8"))
+
+    def iter_array(self, body: bytes) -> Iterator[Any]:
+        return iter_json_array(body, decoder=self._decoder)
+
+
+def _base64_default(obj: Any) -> str:
+    if isinstance(obj, (bytes, bytearray)):
+        return base64.b64encode(obj).decode("utf-8")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class WkbFramesCodec(PayloadCodec):
+    """JSON document followed by length-prefixed WKB blobs
+
+    Layout (integers are big-endian uint32)::
+
+        b"KMYW" version(1 byte) json_length json
+        (blob_length blob) * number of blobs
+
+    In the JSON document each "kumoy_wkb" value is the index of its blob.
+    """
+
+    content_type = WKB_FRAMES_CONTENT_TYPE
+    MAGIC = b"KMYW"
+    VERSION = 1
+
+    def encode(self, data: Any) -> bytes:
+        if isinstance(data, RecordStream):
+            return self._encode_stream(data)
+
+        blobs: List[bytes] = []
+
+        def blob_index(obj: Any) -> int:
+            if isinstance(obj, (bytes, bytearray)):
+                blobs.append(obj)
+                return len(blobs) - 1
+            raise TypeError(
+                f"Object of type {type(obj).__name__} is not JSON serializable"
+            )
+
+        document = json.dumps(data, ensure_ascii=False, default=blob_index).encode(
+            "utf-8"
+        )
+        parts = [
+            self.MAGIC,
+            bytes([self.VERSION]),
+            _UINT32.pack(len(document)),
+            document,
+        ]
+        for blob in blobs:
+            parts.append(_UINT32.pack(len(blob)))
+            parts.append(blob)
+        return b"".join(parts)
+
+    def _encode_stream(self, stream: RecordStream) -> bytearray:
+        # memo: blobは長さ付きで別のバッファに書き、最後に文書の後ろへ連結する
+        frames = bytearray()
+        blob_count = 0
+
+        def blob_index(obj: Any) -> int:
+            nonlocal blob_count
+            if isinstance(obj, (bytes, bytearray)):
+                frames.extend(_UINT32.pack(len(obj)))
+                frames.extend(obj)
+                blob_count += 1
+                return blob_count - 1
+            raise TypeError(
+                f"Object of type {type(obj).__name__} is not JSON serializable"
+            )
+
+        buffer = bytearray(self.MAGIC)
+        buffer.append(self.VERSION)
+        buffer += bytes(_UINT32.size)  # 文書の長さ（書き込み後に埋める）
+        document_start = len(buffer)
+        _write_records(
+            buffer, stream, json.JSONEncoder(ensure_ascii=False, default=blob_index)
+        )
+        _UINT32.pack_into(buffer, 5, len(buffer) - document_start)
+        buffer += frames
+        return buffer
+
+    def _split(self, body: bytes):
+        view = memoryview(body)
+        if bytes(view[:4]) != self.MAGIC or view[4] != self.VERSION:
+            raise ValueError("Not a kumoy WKB frames payload")
+        (document_length,) = _UINT32.unpack_from(view, 5)
+        document_end = 9 + document_length
+        document = view[9:document_end]
+
+        # 各blobの位置を先に求めておき、デコード時にはスライスするだけにする
+        blobs = []
+        offset = document_end
+        while offset < len(view):
+            (length,) = _UINT32.unpack_from(view, offset)
+            offset += _UINT32.size
+            if offset + length > len(view):
+                raise ValueError("Truncated kumoy WKB frames payload")
+            blobs.append((offset, length))
+            offset += length
+
+        def decode_wkb(index: Any) -> bytes:
+            start, length = blobs[index]
+            return bytes(view[start : start + length])
+
+        return document, _hook_decoder(decode_wkb)
+
+    def decode(self, body: bytes) -> Any:
+        document, decoder = self._split(body)
+        return decoder.decode(str(document, "utf-8"))
+
+    def iter_array(self, body: bytes) -> Iterator[Any]:
+        document, decoder = self._split(body)
+        return iter_json_array(document, decoder=decoder)
+
+
+JSON_CODEC = JsonCodec()
+WKB_FRAMES_CODEC = WkbFramesCodec()
+
+_CODECS = {codec.content_type: codec for codec in (JSON_CODEC, WKB_FRAMES_CODEC)}
+
+# サーバーがバイナリ形式のリクエストを受け付けなかった場合にFalseにする
+_binary_enabled = True
+
+# サーバーのパラメータから決めたコーデック（パラメータか接続先が変わるまで使う）
+_negotiated: Optional[PayloadCodec] = None
+
+
+def codec_for_content_type(content_type: str) -> PayloadCodec:
+    """Codec for a response, by its Content-Type (JSON if unknown)"""
+    media_type = content_type.split(";", 1)[0].strip().lower()
+    return _CODECS.get(media_type, JSON_CODEC)
+
+
+def negotiate_codec() -> PayloadCodec:
+    """Codec to use for requests: the binary one if the server supports it.
+    Only already fetched server parameters are consulted (no network access)."""
+    global _negotiated
+    if not _binary_enabled:
+        return JSON_CODEC
+    if _negotiated is None:
+        # memo: last_known()はメモリになければQSettingsを読むので、毎回は呼ばない
+        params = get_public_params_service().last_known() or {}
+        if WKB_FRAMES_CONTENT_TYPE in (params.get(PUBLIC_PARAMS_CODECS_KEY) or []):
+            _negotiated = WKB_FRAMES_CODEC
+        else:
+            _negotiated = JSON_CODEC
+    return _negotiated
+
+
+def accept_header(codec: PayloadCodec) -> str:
+    if codec is JSON_CODEC:
+        return JSON_CONTENT_TYPE
+    return f"{codec.content_type}, {JSON_CONTENT_TYPE};q=0.5"
+
+
+def disable_binary() -> None:
+    """Fall back to JSON for the rest of the session"""
+    global _binary_enabled
+    _binary_enabled = False
+
+
+def _on_setting_changed(key: Optional[str]) -> None:
+    # 接続先のサーバーが変わったら再びバイナリ形式を試す
+    global _binary_enabled, _negotiated
+    if key is None or key in ("use_custom_server", "custom_server_url"):
+        _binary_enabled = True
+        _negotiated = None
+    elif key == PUBLIC_PARAMS_SETTING_KEY:
+        _negotiated = None
+
+
+add_setting_listener(_on_setting_changed)
@@ -35,7 +35,7 @@ def get_plan_limits(
     if purchased_storage_units is not None:
         params = {"purchasedStorageUnits": str(purchased_storage_units)}
 
-    response = ApiClient.get(f"/plan/{plan}", params=params)
+    response = ApiClient.get(f"/plan/{plan}", params=params, cache=True)
 
     return PlanLimits(
         maxProjects=response.get("maxProjects", 0),
@@ -1,7 +1,7 @@
 from dataclasses import dataclass
 from typing import List, Literal
 
-from .client import ApiClient
+from .client import ApiClient, gather
 from .organization import Organization
 from .team import Team
 
@@ -172,6 +172,33 @@ def get_projects_by_organization(organization_id: str) -> List[ProjectsInOrganiz
         List of Project objects
     """
     response = ApiClient.get(f"/organization/{organization_id}/projects")
+    return _parse_projects_in_organization(response)
+
+
+def get_projects_by_organizations(
+    organization_ids: List[str],
+) -> List[List[ProjectsInOrganization]]:
+    """
+    Get projects for several organizations, fetching them in parallel
+
+    Args:
+        organization_ids: Organization IDs
+
+    Returns:
+        List of project lists, in the same order as organization_ids
+    """
+    responses = gather(
+        [
+            lambda org_id=org_id: ApiClient.get_async(
+                f"/organization/{org_id}/projects"
+            )
+            for org_id in organization_ids
+        ]
+    )
+    return [_parse_projects_in_organization(response) for response in responses]
+
+
+def _parse_projects_in_organization(response: list) -> List[ProjectsInOrganization]:
     projects = []
     for project in response:
         projects.append(
@@ -237,7 +264,7 @@ def get_project(project_id: str) -> ProjectDetail:
     Returns:
         Project object or None if not found
     """
-    response = ApiClient.get(f"/project/{project_id}")
+    response = ApiClient.get(f"/project/{project_id}", cache=True)
 
     return ProjectDetail(
         id=response.get("id", ""),
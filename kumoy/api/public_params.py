@@ -0,0 +1,197 @@
+"""
+/api/_public/params（Cognito設定・対応するプラグインの最低バージョン）のキャッシュ
+
+- 取得した値はTTLの間メモリ上で共有する（トークン更新・ログイン・バージョン確認）
+- 最後に取得した値をサーバーURLとともに設定に保存し、取得に失敗した際に使えるようにする
+- QGIS起動時はQgsNetworkAccessManagerで非同期に取得し、起動を待たせない
+"""
+
+import json
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional
+
+from qgis.core import Qgis, QgsMessageLog, QgsNetworkAccessManager
+from qgis.PyQt.QtCore import QUrl
+from qgis.PyQt.QtNetwork import QNetworkRequest
+
+from ...pyqt_version import Q_NETWORK_REPLY_ERROR, Q_NETWORK_REQUEST_ATTRIBUTE
+from ...settings_manager import add_setting_listener, get_settings, store_setting
+from ..constants import LOG_CATEGORY
+from . import config as api_config
+
+# 取得した値を再利用する時間（秒）
+PARAMS_TTL_SECONDS = 60 * 60
+
+# 設定に保存する際のキー
+PUBLIC_PARAMS_SETTING_KEY = "public_params"
+
+_SERVER_SETTING_KEYS = ("use_custom_server", "custom_server_url")
+
+
+class PublicParamsError(Exception):
+    """Fetching /api/_public/params failed"""
+
+    def __init__(self, message: str, server_error: bool = False):
+        self.message = message
+        # Trueならサーバーがエラーを返した（Falseならネットワークエラー）
+        self.server_error = server_error
+        super().__init__(message)
+
+
+@dataclass(frozen=True)
+class _Entry:
+    server_url: str
+    params: Dict
+    fetched_at: float  # time.time()
+
+
+ParamsCallback = Callable[[Optional[Dict], Optional[PublicParamsError]], None]
+
+
+class PublicParamsService:
+    """Shared, cached access to the public server parameters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entry: Optional[_Entry] = None
+        self._pending: List[ParamsCallback] = []
+
+    def get(
+        self, max_age: float = PARAMS_TTL_SECONDS, allow_stale: bool = False
+    ) -> Dict:
+        """Return the parameters, fetching them if older than max_age seconds
+
+        Blocking; safe to call from worker threads.
+
+        Args:
+            allow_stale: on fetch failure return the last known value
+                (possibly from a previous session) instead of raising
+
+        Raises:
+            urllib.error.HTTPError / urllib.error.URLError: fetch failed
+        """
+        server_url = api_config.get_api_config().SERVER_URL
+        entry = self._fresh_entry(server_url, max_age)
+        if entry is not None:
+            return entry.params
+
+        try:
+            with urllib.request.urlopen(f"{server_url}/api/_public/params") as response:
+                params = json.loads(response.read().decode("utf-8"))
+        except Exception:
+            stale = self.last_known(server_url)
+            if allow_stale and stale is not None:
+                QgsMessageLog.logMessage(
+                    "Using last known server parameters", LOG_CATEGORY, Qgis.Info
+                )
+                return stale
+            raise
+
+        self._store(server_url, params)
+        return params
+
+    def fetch_async(self, callback: ParamsCallback) -> None:
+        """Fetch the parameters without blocking and call
+        callback(params, None) or callback(None, error) from the event loop.
+        A fresh cached value is passed immediately."""
+        server_url = api_config.get_api_config().SERVER_URL
+        entry = self._fresh_entry(server_url, PARAMS_TTL_SECONDS)
+        if entry is not None:
+            callback(entry.params, None)
+            return
+
+        with self._lock:
+            self._pending.append(callback)
+            if len(self._pending) > 1:
+                # 取得中のリクエストの結果を待つ
+                return
+
+        reply = QgsNetworkAccessManager.instance().get(
+            QNetworkRequest(QUrl(f"{server_url}/api/_public/params"))
+        )
+
+        def on_finished():
+            params, error = None, None
+            body = bytes(reply.readAll())
+            status = reply.attribute(
+                Q_NETWORK_REQUEST_ATTRIBUTE.HttpStatusCodeAttribute
+            )
+            if reply.error() != Q_NETWORK_REPLY_ERROR.NoError:
+                message = reply.errorString()
+                if status:
+                    try:
+                        message = json.loads(body.decode("utf-8")).get("error", message)
+                    except (ValueError, AttributeError):
+                        pass
+                error = PublicParamsError(message, server_error=bool(status))
+            else:
+                try:
+                    params = json.loads(body.decode("utf-8"))
+                    self._store(server_url, params)
+                except ValueError as e:
+                    error = PublicParamsError(str(e), server_error=True)
+            reply.deleteLater()
+
+            with self._lock:
+                callbacks, self._pending = self._pending, []
+            for cb in callbacks:
+                cb(params, error)
+
+        reply.finished.connect(on_finished)
+
+    def last_known(self, server_url: Optional[str] = None) -> Optional[Dict]:
+        """Last fetched parameters for the server, from memory or settings"""
+        if server_url is None:
+            server_url = api_config.get_api_config().SERVER_URL
+        entry = self._entry or self._load_persisted()
+        if entry is None or entry.server_url != server_url:
+            return None
+        return entry.params
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        if key is None or key in _SERVER_SETTING_KEYS:
+            with self._lock:
+                self._entry = None
+
+    def _fresh_entry(self, server_url: str, max_age: float) -> Optional[_Entry]:
+        with self._lock:
+            entry = self._entry
+        if (
+            entry is not None
+            and entry.server_url == server_url
+            and time.time() - entry.fetched_at < max_age
+        ):
+            return entry
+        return None
+
+    def _store(self, server_url: str, params: Dict) -> None:
+        entry = _Entry(server_url, params, time.time())
+        store_setting(
+            PUBLIC_PARAMS_SETTING_KEY,
+            json.dumps({"server_url": server_url, "params": params}),
+        )
+        with self._lock:
+            self._entry = entry
+
+    def _load_persisted(self) -> Optional[_Entry]:
+        persisted = get_settings().public_params
+        if not persisted:
+            return None
+        try:
+            data = json.loads(persisted)
+            # 前回のセッションの値は古いものとして扱う（fetched_at=0）
+            return _Entry(data["server_url"], data["params"], 0.0)
+        except (ValueError, KeyError, TypeError):
+            return None
+
+
+_service = PublicParamsService()
+add_setting_listener(_service.invalidate)
+
+
+def get_public_params_service() -> PublicParamsService:
+    """Return the process-wide public parameters service"""
+    return _service
@@ -1,35 +1,88 @@
-import base64
-from typing import Dict, List, Optional
+import time
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
-from qgis.core import QgsFeature
+from qgis.core import QgsFeature, QgsFields
 from qgis.PyQt.QtCore import QCoreApplication, QDate, QDateTime, QTime, QVariant
 
 from .. import constants
+from . import payload_codec
 from .client import ApiClient
+from .error import UnsupportedMediaTypeError
+from .metrics import get_request_metrics
 
 
 def tr(message: str) -> str:
     return QCoreApplication.translate("@default", message)
 
 
-def get_features(
+def _post(endpoint: str, data: Any) -> Tuple[payload_codec.PayloadCodec, bytes]:
+    """
+    POST data (with "kumoy_wkb" values as WKB bytes) using the negotiated
+    payload codec. Returns the codec for the response and the raw response body.
+    """
+    codec = payload_codec.negotiate_codec()
+    # memo: エンコード時間を通信時間と分けて計測する（e.g. "add_features.encode"）
+    phase = endpoint.rsplit("/", 1)[-1].replace("-", "_") + ".encode"
+    with get_request_metrics().measure(phase):
+        encoded = codec.encode(data)
+    try:
+        body, content_type = ApiClient.post_raw(
+            endpoint,
+            encoded,
+            content_type=codec.content_type,
+            accept=payload_codec.accept_header(codec),
+        )
+    except UnsupportedMediaTypeError:
+        if codec is payload_codec.JSON_CODEC:
+            raise
+        # サーバーがバイナリ形式を受け付けない場合はJSONに戻して再送する
+        payload_codec.disable_binary()
+        return _post(endpoint, data)
+    return payload_codec.codec_for_content_type(content_type), body
+
+
+def iter_features(
     vector_id: str,
     after_id: Optional[int] = None,
-) -> list:
+    on_response: Optional[Callable[[int], None]] = None,
+) -> Iterator[Dict]:
     """
-    Get features from a vector layer
+    Get a page of features from a vector layer, decoding them one at a time.
+    Only the response body and the current feature are held in memory.
+    on_response is called with the size of the response body in bytes.
     """
     options = {}
     if after_id is not None:
         options["after_id"] = after_id
 
-    response = ApiClient.post(f"/_qgis/vector/{vector_id}/get-features-v2", options)
+    codec, body = _post(f"/_qgis/vector/{vector_id}/get-features-v2", options)
+    if on_response is not None:
+        on_response(len(body))
 
-    # decode base64
-    for feature in response:
-        feature["kumoy_wkb"] = base64.b64decode(feature["kumoy_wkb"])
+    decode_time = 0.0
+    count = 0
+    features = codec.iter_array(body)
+    while True:
+        started = time.perf_counter()
+        # memo: kumoy_wkbはコーデックがbytesにデコードする
+        feature = next(features, None)
+        decode_time += time.perf_counter() - started
+        if feature is None:
+            break
+        count += 1
+        yield feature
 
-    return response
+    get_request_metrics().record_phase("get_features.decode", decode_time, count)
+
+
+def get_features(
+    vector_id: str,
+    after_id: Optional[int] = None,
+) -> list:
+    """
+    Get features from a vector layer
+    """
+    return list(iter_features(vector_id, after_id))
 
 
 class WkbTooLargeError(Exception):
@@ -38,62 +91,114 @@ class WkbTooLargeError(Exception):
     pass
 
 
-def add_features(
-    vector_id: str,
-    features: List[QgsFeature],
-) -> None:
-    """
-    Add features to a vector layer
-    """
-    _features = []
+# memo: 日時型の属性はQDateTime/QDate/QTimeとして得られるので文字列に変換して送信する
+# input: PyQt.QtCore.QDateTime(2026, 2, 4, 10, 29, 41, 859)
+# output: '2026-02-04T10:29:41.859'
+_QT_TEMPORAL_FORMATS = (
+    (QDateTime, "yyyy-MM-ddTHH:mm:ss.zzz"),
+    (QDate, "yyyy-MM-dd"),
+    (QTime, "HH:mm:ss.zzz"),
+)
+
+
+def _convert_value(value: Any) -> Any:
+    """Convert an attribute value of f.attributes() to a JSON value"""
+    # HACK: replace QVariant of properties with None
+    # attribute of f.attributes() become QVariant when it is null (other type is automatically casted to primitive)
+    if isinstance(value, QVariant):
+        return None if value.isNull() else value
+    for qt_class, fmt in _QT_TEMPORAL_FORMATS:
+        if isinstance(value, qt_class):
+            return value.toString(fmt)
+    return value
+
+
+_PLAIN_TYPES = frozenset((str, int, float, bool, type(None)))
+
+
+def _convert_plain(value: Any) -> Any:
+    # memo: ほとんどの値はそのまま送れるので、型の集合で判定して変換を省く
+    if value.__class__ in _PLAIN_TYPES:
+        return value
+    return _convert_value(value)
+
+
+def _temporal_converter(qt_class: type, fmt: str) -> Callable[[Any], Any]:
+    def convert(value: Any) -> Any:
+        if value.__class__ is qt_class:
+            return value.toString(fmt)
+        return _convert_value(value)
+
+    return convert
+
+
+_FIELD_TYPE_CONVERTERS = {
+    QVariant.DateTime: _temporal_converter(*_QT_TEMPORAL_FORMATS[0]),
+    QVariant.Date: _temporal_converter(*_QT_TEMPORAL_FORMATS[1]),
+    QVariant.Time: _temporal_converter(*_QT_TEMPORAL_FORMATS[2]),
+}
+
+
+def _converter_plan(fields: QgsFields) -> List[Tuple[int, str, Callable[[Any], Any]]]:
+    """(attribute index, column name, converter) of the columns to send,
+    chosen once from the field types instead of inspecting every value"""
+    plan = []
+    for index, field in enumerate(fields):
+        if field.name() == "kumoy_id":
+            continue
+        converter = _FIELD_TYPE_CONVERTERS.get(field.type(), _convert_plain)
+        plan.append((index, field.name(), converter))
+    return plan
+
+
+def _iter_serialized(features: List[QgsFeature]) -> Iterator[Dict]:
+    if not features:
+        return
+
+    # memo: 列ごとの変換は最初に1度だけ決め、地物ごとの型判定を省く。
+    # 変換は1地物ずつ行い、バッチ全体の中間リストは作らない
+    plan = _converter_plan(features[0].fields())
+
     for f in features:
-        kumoy_wkb = base64.b64encode(f.geometry().asWkb()).decode("utf-8")
-        if len(kumoy_wkb) > constants.MAX_WKB_LENGTH:
+        attributes = f.attributes()
+        properties = {name: convert(attributes[index]) for index, name, convert in plan}
+        kumoy_wkb = bytes(f.geometry().asWkb())
+        # memo: 上限はbase64エンコード後の長さで定められている
+        encoded_length = 4 * ((len(kumoy_wkb) + 2) // 3)
+        if encoded_length > constants.MAX_WKB_LENGTH:
             raise WkbTooLargeError(
                 tr("Feature geometry exceeds maximum WKB length ({} > {})").format(
-                    f"{len(kumoy_wkb):,}", f"{constants.MAX_WKB_LENGTH:,}"
+                    f"{encoded_length:,}", f"{constants.MAX_WKB_LENGTH:,}"
                 )
             )
-        _features.append(
-            {
-                "kumoy_wkb": kumoy_wkb,
-                "properties": dict(zip(f.fields().names(), f.attributes())),
-            }
-        )
+        yield {"kumoy_wkb": kumoy_wkb, "properties": properties}
 
-    # rm kumoy_id from properties
-    for feature in _features:
-        if "kumoy_id" in feature["properties"]:
-            del feature["properties"]["kumoy_id"]
-
-    for feature in _features:
-        for k in feature["properties"]:
-            # HACK: replace QVariant of properties with None
-            # attribute of f.attributes() become QVariant when it is null (other type is automatically casted to primitive)
-            if (
-                isinstance(feature["properties"][k], QVariant)
-                and feature["properties"][k].isNull()
-            ):
-                feature["properties"][k] = None
-
-            # HACK: Replace Qt datetime objects to string
-            # attribute of f.attributes() become QDateTime/QDate/QTime when the field type is written in date time format
-            # input: PyQt.QtCore.QDateTime(2026, 2, 4, 10, 29, 41, 859)
-            # output: '2026-02-04T10:29:41.859'
-            elif isinstance(feature["properties"][k], QDateTime):
-                feature["properties"][k] = feature["properties"][k].toString(
-                    "yyyy-MM-ddTHH:mm:ss.zzz"
-                )
-            elif isinstance(feature["properties"][k], QDate):
-                feature["properties"][k] = feature["properties"][k].toString(
-                    "yyyy-MM-dd"
-                )
-            elif isinstance(feature["properties"][k], QTime):
-                feature["properties"][k] = feature["properties"][k].toString(
-                    "HH:mm:ss.zzz"
-                )
 
-    ApiClient.post(f"/_qgis/vector/{vector_id}/add-features", {"features": _features})
+def serialize_features(features: List[QgsFeature]) -> List[Dict]:
+    """
+    Convert features to the add-features payload ("kumoy_wkb" as WKB bytes).
+    All features of a batch are expected to share the fields of the first one.
+    """
+    return list(_iter_serialized(features))
+
+
+def features_payload(features: List[QgsFeature]) -> payload_codec.RecordStream:
+    """
+    add-features request body whose records are serialized while the codec
+    writes them, so the list of record dicts is never built.
+    """
+    return payload_codec.RecordStream("features", lambda: _iter_serialized(features))
+
+
+def add_features(
+    vector_id: str,
+    features: List[QgsFeature],
+) -> None:
+    """
+    Add features to a vector layer
+    """
+    # memo: 変換とエンコードは "add_features.encode" として計測される
+    _post(f"/_qgis/vector/{vector_id}/add-features", features_payload(features))
 
 
 def delete_features(
@@ -128,17 +233,15 @@ def change_geometry_values(
     """
     Change geometry values of a feature in a vector layer
     """
-    geometry_items_encoded = [
-        {
-            "kumoy_id": item["kumoy_id"],
-            "kumoy_wkb": base64.b64encode(item["geom"]).decode("utf-8"),
-        }
-        for item in geometry_items
-    ]
-
-    ApiClient.post(
+    _post(
         f"/_qgis/vector/{vector_id}/change-geometry-values",
-        {"geometry_items": geometry_items_encoded},
+        payload_codec.RecordStream(
+            "geometry_items",
+            lambda: (
+                {"kumoy_id": item["kumoy_id"], "kumoy_wkb": bytes(item["geom"])}
+                for item in geometry_items
+            ),
+        ),
     )
 
 
@@ -201,12 +304,12 @@ def get_diff(vector_id: str, last_updated: str) -> Dict:
     Returns:
         A list of features that have changed since the last updated time.
     """
-    response = ApiClient.post(
+    codec, body = _post(
         f"/_qgis/vector/{vector_id}/get-diff",
         {"last_updated": last_updated},
     )
 
-    for feature in response["updatedRows"]:
-        feature["kumoy_wkb"] = base64.b64decode(feature["kumoy_wkb"])
+    with get_request_metrics().measure("get_diff.decode"):
+        response = codec.decode(body)
 
     return response
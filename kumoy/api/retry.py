@@ -0,0 +1,204 @@
+"""
+APIリクエストの再試行ポリシー
+
+- 429 はサーバーが処理せずに拒否したことを示すので、どのリクエストも再送してよい
+- タイムアウトや 502/504 はサーバー側で処理済みの可能性があるため、
+  冪等なリクエストのみ再送する（地物追加の二重登録を防ぐ）
+- 503 はプロキシ・ゲートウェイが返した場合は処理済みの可能性があるため 502/504 と同様に扱う。
+  ただし Retry-After があればサーバーが処理せずに拒否したものとして再送する
+- 待機時間は指数バックオフ + ジッター。Retry-After があればそれに従う
+  （Retry-After が max_delay より長ければ待たずに失敗とする）
+"""
+
+import random
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from qgis.PyQt.QtNetwork import QNetworkReply
+
+from ...pyqt_version import Q_NETWORK_REPLY_ERROR
+
+# サーバーが処理せずに拒否したことを示すステータス
+REJECTED_STATUS = (429,)
+# 処理済みかどうか不明なステータス
+AMBIGUOUS_STATUS = (502, 504)
+# Retry-After があれば拒否、なければ処理済みかどうか不明とみなすステータス
+SERVICE_UNAVAILABLE = 503
+
+# 冪等な（同じ内容で再送しても結果が変わらない）POSTエンドポイント
+IDEMPOTENT_POST_ENDPOINTS = [
+    re.compile(p)
+    for p in (
+        r"/_qgis/vector/\{id\}/get-features-v2",
+        r"/_qgis/vector/\{id\}/get-diff",
+        r"/_qgis/vector/\{id\}/delete-features",
+        r"/_qgis/vector/\{id\}/change-attribute-values",
+        r"/_qgis/vector/\{id\}/change-geometry-values",
+        r"/_qgis/vector/\{id\}/update-columns",
+    )
+]
+
+
+def _network_errors(*names: str) -> tuple:
+    return tuple(
+        getattr(Q_NETWORK_REPLY_ERROR, name)
+        for name in names
+        if hasattr(Q_NETWORK_REPLY_ERROR, name)
+    )
+
+
+# リクエストが送信される前に失敗したことが確実なネットワークエラー
+NOT_SENT_ERRORS = _network_errors(
+    "ConnectionRefusedError",
+    "HostNotFoundError",
+    "TemporaryNetworkFailureError",
+    "NetworkSessionFailedError",
+    "ProxyConnectionRefusedError",
+)
+# 送信後に失敗した可能性があるネットワークエラー
+# memo: QGISのタイムアウトはOperationCanceledErrorとして報告される
+INTERRUPTED_ERRORS = _network_errors(
+    "RemoteHostClosedError",
+    "TimeoutError",
+    "OperationCanceledError",
+    "UnknownNetworkError",
+)
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    max_attempts: int = 4
+    base_delay: float = 0.5  # 秒
+    max_delay: float = 10.0  # 秒
+
+    def waits_for(self, retry_after: Optional[float]) -> bool:
+        """Whether the server's Retry-After is short enough to wait for.
+        Retrying earlier than requested would only add load during the outage."""
+        return retry_after is None or retry_after <= self.max_delay
+
+    def delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """Seconds to wait before the next attempt (attempt starts at 1).
+        Retry-After is followed as is; check waits_for() first."""
+        if retry_after is not None:
+            return max(retry_after, 0.0)
+        # exponential backoff with "full jitter"
+        backoff = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, backoff)
+
+
+NO_RETRY = RetryPolicy(max_attempts=1)
+
+
+def is_idempotent(method: str, endpoint_template: str) -> bool:
+    """Whether sending the request twice has the same effect as once"""
+    if method in ("GET", "PUT", "DELETE"):
+        return True
+    return any(p.fullmatch(endpoint_template) for p in IDEMPOTENT_POST_ENDPOINTS)
+
+
+def should_retry(
+    method: str,
+    endpoint_template: str,
+    status: Optional[int],
+    network_error: "QNetworkReply.NetworkError",
+    retry_after: Optional[float] = None,
+) -> bool:
+    """Classify a failed attempt as retryable or not
+
+    retry_after is the parsed Retry-After header of the reply, if any."""
+    if status in REJECTED_STATUS:
+        return True
+    if status == SERVICE_UNAVAILABLE:
+        return retry_after is not None or is_idempotent(method, endpoint_template)
+    if status in AMBIGUOUS_STATUS:
+        return is_idempotent(method, endpoint_template)
+    if status:
+        # その他のHTTPエラー（4xx/500）は再送しても結果は変わらない
+        return False
+    if network_error in NOT_SENT_ERRORS:
+        return True
+    if network_error in INTERRUPTED_ERRORS:
+        return is_idempotent(method, endpoint_template)
+    return False
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """Parse a Retry-After header (delta seconds or HTTP date) to seconds"""
+    value = value.strip()
+    if not value:
+        return None
+    if value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+@dataclass
+class RetryStats:
+    retries: Counter = field(default_factory=Counter)  # endpoint -> 再送回数
+    recovered: Counter = field(default_factory=Counter)  # 再送後に成功した数
+    gave_up: Counter = field(default_factory=Counter)  # 再送しても失敗した数
+    statuses: Counter = field(default_factory=Counter)  # 再送の原因となったステータス
+
+
+class RetryMetrics:
+    """Thread-safe counters of retried requests per endpoint template"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = RetryStats()
+
+    def record_retry(self, endpoint_template: str, status: Optional[int]) -> None:
+        with self._lock:
+            self._stats.retries[endpoint_template] += 1
+            self._stats.statuses[status or "network"] += 1
+
+    def record_result(self, endpoint_template: str, attempts: int, ok: bool) -> None:
+        if attempts <= 1:
+            return
+        with self._lock:
+            if ok:
+                self._stats.recovered[endpoint_template] += 1
+            else:
+                self._stats.gave_up[endpoint_template] += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                "retries": dict(self._stats.retries),
+                "recovered": dict(self._stats.recovered),
+                "gave_up": dict(self._stats.gave_up),
+                "statuses": dict(self._stats.statuses),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats = RetryStats()
+
+
+_policy = RetryPolicy()
+_metrics = RetryMetrics()
+
+
+def get_retry_policy() -> RetryPolicy:
+    return _policy
+
+
+def set_retry_policy(policy: RetryPolicy) -> None:
+    """Replace the policy used by ApiClient (NO_RETRY disables retries)"""
+    global _policy
+    _policy = policy
+
+
+def get_retry_metrics() -> RetryMetrics:
+    return _metrics
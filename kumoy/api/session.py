@@ -0,0 +1,167 @@
+"""
+全APIリクエストで共有するセッション状態
+
+- サーバーURLと認証ヘッダーを設定が変わるまでメモリ上に保持する
+- HTTP keep-alive / HTTP/2 でコネクションを再利用できるようリクエストを設定する
+- 開いたコネクション数・再利用したコネクション数を、リクエストを実際に送信した
+  QgsNetworkAccessManager ごとに計測する
+"""
+
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Optional
+
+from qgis.core import QgsNetworkAccessManager
+from qgis.PyQt.QtNetwork import QNetworkRequest
+
+from ...pyqt_version import Q_NETWORK_REQUEST_ATTRIBUTE
+from ...settings_manager import add_setting_listener
+
+# memo: get_tokenモジュールはこのパッケージをimportするため、関数ではなくモジュールとして
+# importして循環importを避ける
+from .. import get_token as auth_token
+from . import config as api_config
+
+# これらの設定が変更されたらキャッシュを破棄する
+_SERVER_SETTING_KEYS = ("use_custom_server", "custom_server_url")
+_TOKEN_SETTING_KEYS = ("id_token", "refresh_token", "token_expires_at")
+
+# Qt5.15以降とQt6で名前が異なる
+_HTTP2_ALLOWED_ATTRIBUTE = getattr(
+    Q_NETWORK_REQUEST_ATTRIBUTE,
+    "Http2AllowedAttribute",
+    getattr(Q_NETWORK_REQUEST_ATTRIBUTE, "HTTP2AllowedAttribute", None),
+)
+_HTTP2_WAS_USED_ATTRIBUTE = getattr(
+    Q_NETWORK_REQUEST_ATTRIBUTE,
+    "Http2WasUsedAttribute",
+    getattr(Q_NETWORK_REQUEST_ATTRIBUTE, "HTTP2WasUsedAttribute", None),
+)
+
+
+@dataclass
+class SessionStats:
+    requests: int = 0
+    # TLSハンドシェイクが行われた回数（=新規に開いたコネクション数）
+    connections_opened: int = 0
+    # ハンドシェイクなしで送信されたリクエスト数（=再利用されたコネクション）
+    connections_reused: int = 0
+    http2_requests: int = 0
+
+
+class ApiSession:
+    """Process-wide state shared by all Kumoy API requests
+
+    Qt keeps a keep-alive connection pool per QNetworkAccessManager and
+    QgsNetworkAccessManager.instance() returns one manager per thread.
+    Asynchronous requests and blocking requests made from a worker thread
+    are sent by the calling thread's manager and reuse its connections; new
+    connections are counted from that manager's `encrypted` signal (TLS
+    handshakes, so plain HTTP servers are counted as reused).
+
+    A blocking request made from the GUI thread is sent by
+    QgsBlockingNetworkRequest on a new thread with its own manager, so it
+    always opens a new connection and is counted as such
+    (record_reply(new_connection=True)).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._api_config: Optional[api_config.ApiConfig] = None
+        self._token: Optional[str] = None
+        self._auth_header: Optional[bytes] = None
+        self._stats = SessionStats()
+        self._watched_managers = weakref.WeakSet()
+        self._gzip_enabled = True
+
+    def api_config(self) -> api_config.ApiConfig:
+        """Return server configuration, read from settings once"""
+        with self._lock:
+            if self._api_config is None:
+                self._api_config = api_config.get_api_config()
+            return self._api_config
+
+    def server_url(self) -> str:
+        return self.api_config().SERVER_URL
+
+    def auth_header(self) -> Optional[bytes]:
+        """Return the Authorization header value, or None if not logged in"""
+        # memo: get_token()はメモリ上のトークンを返し、期限切れの前に更新も行う
+        token = auth_token.get_token()
+        if not token:
+            return None
+
+        with self._lock:
+            if token != self._token:
+                self._token = token
+                self._auth_header = f"Bearer {token}".encode("utf-8")
+            return self._auth_header
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        """Drop cached values derived from the given setting (None: all)"""
+        with self._lock:
+            if key is None or key in _SERVER_SETTING_KEYS:
+                self._api_config = None
+                self._gzip_enabled = True
+            if key is None or key in _TOKEN_SETTING_KEYS:
+                self._token = None
+                self._auth_header = None
+
+    def gzip_enabled(self) -> bool:
+        """Whether large request bodies may be sent gzip-compressed"""
+        return self._gzip_enabled
+
+    def disable_gzip(self) -> None:
+        """Stop compressing request bodies (server rejected them)"""
+        self._gzip_enabled = False
+
+    def prepare_request(self, req: QNetworkRequest) -> None:
+        """Apply connection reuse options"""
+        if _HTTP2_ALLOWED_ATTRIBUTE is not None:
+            req.setAttribute(_HTTP2_ALLOWED_ATTRIBUTE, True)
+
+    def watch_manager(self, nam: QgsNetworkAccessManager) -> None:
+        """Count the TLS handshakes of a manager which sends requests"""
+        with self._lock:
+            if nam in self._watched_managers:
+                return
+            self._watched_managers.add(nam)
+        nam.encrypted.connect(self._on_encrypted)
+
+    def record_reply(self, reply, new_connection: bool = False) -> None:
+        """Update counters from a finished QNetworkReply or QgsNetworkReplyContent.
+        new_connection: the request was sent by a manager created for it
+        (not watched, so its handshake is counted here)"""
+        http2 = False
+        if _HTTP2_WAS_USED_ATTRIBUTE is not None:
+            http2 = bool(reply.attribute(_HTTP2_WAS_USED_ATTRIBUTE))
+        with self._lock:
+            self._stats.requests += 1
+            if new_connection:
+                self._stats.connections_opened += 1
+            if http2:
+                self._stats.http2_requests += 1
+
+    def stats(self) -> SessionStats:
+        with self._lock:
+            stats = SessionStats(**vars(self._stats))
+        stats.connections_reused = max(0, stats.requests - stats.connections_opened)
+        return stats
+
+    def reset_stats(self) -> None:
+        with self._lock:
+            self._stats = SessionStats()
+
+    def _on_encrypted(self, _reply) -> None:
+        with self._lock:
+            self._stats.connections_opened += 1
+
+
+_session = ApiSession()
+add_setting_listener(_session.invalidate)
+
+
+def get_session() -> ApiSession:
+    """Return the process-wide API session"""
+    return _session
@@ -50,7 +50,7 @@ def get_vectors(project_id: str) -> List[KumoyVector]:
     Returns:
         List of KumoyVector objects
     """
-    response = ApiClient.get(f"/project/{project_id}/vector")
+    response = ApiClient.get(f"/project/{project_id}/vector", cache=True)
     vectors: List[KumoyVector] = []
     for vector_data in response:
         vectors.append(
@@ -28,6 +28,8 @@ MAX_CHARACTERS_STYLEDMAP_DESCRIPTION = 255
 # Kumoyのシステム上の制限
 MAX_CHARACTERS_STRING_FIELD = 255
 MAX_WKB_LENGTH = 10_000_000  # WKBのbase64エンコード後の最大文字列長
+# 地物の追加・更新・削除APIの1リクエストあたりの最大件数
+MAX_FEATURES_PER_REQUEST = 1000
 
 # 予約しているカラム名の接頭辞
 RESERVED_FIELD_NAME_PREFIX = "kumoy_"
@@ -1,16 +1,27 @@
 import json
+import threading
 import urllib.parse
 import urllib.request
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Dict, Optional
 from urllib.error import HTTPError
 
-from qgis.core import Qgis
+from qgis.core import Qgis, QgsMessageLog
 from qgis.utils import iface
 
-from ..settings_manager import get_settings, store_setting
-from .api import config as api_config
+from ..settings_manager import add_setting_listener, get_settings, store_setting
+from .api.public_params import get_public_params_service
 from .api.error import format_api_error, raise_error
+from .constants import LOG_CATEGORY
+
+
+# トークンの有効期限に対する余裕（この時間を切ったトークンは使わない）
+TOKEN_EXPIRY_BUFFER_SECONDS = 300
+# 上記の余裕を切るこの時間前にバックグラウンドでトークンを更新する
+PROACTIVE_REFRESH_MARGIN_SECONDS = 120
+
+_TOKEN_SETTING_KEYS = ("id_token", "refresh_token", "token_expires_at")
 
 
 class TokenExpiredOrInvalidError(Exception):
@@ -54,14 +65,10 @@ def _refresh_token(refresh_token: str) -> Optional[Dict]:
     if not refresh_token:
         return None
 
-    config = api_config.get_api_config()
-
     try:
         # /api/_public/params エンドポイントからCognito設定を取得
-        params_response = urllib.request.urlopen(
-            f"{config.SERVER_URL}/api/_public/params"
-        )
-        params_data = json.loads(params_response.read().decode("utf-8"))
+        # memo: 取得済みの値を使い、取得できない場合は前回の値で更新を試みる
+        params_data = get_public_params_service().get(allow_stale=True)
 
         cognito_domain = params_data.get("cognitoDomain")
         cognito_client_id = params_data.get("cognitoClientId")
@@ -134,7 +141,7 @@ def _is_token_valid(expires_at: str) -> bool:
         current_time = datetime.now()
 
         # Add a 5-minute buffer to avoid edge cases
-        buffer_seconds = 300  # 5 minutes
+        buffer_seconds = TOKEN_EXPIRY_BUFFER_SECONDS
 
         # Check if the token is still valid with buffer
         return current_time < (expiration_time - timedelta(seconds=buffer_seconds))
@@ -169,6 +176,153 @@ def _save_token_to_cache(auth_response: Dict) -> None:
         print(f"Error saving token to cache: {format_api_error(e)}")
 
 
+@dataclass(frozen=True)
+class _Tokens:
+    id_token: str = ""
+    refresh_token: str = ""
+    expires_at: str = ""
+
+
+class _TokenCache:
+    """In-memory copy of the tokens stored in settings
+
+    Settings are read once and re-read only after one of the token settings
+    changes. Refreshes are single-flight: while one caller talks to Cognito
+    the others wait for its result instead of starting their own refresh.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._tokens: Optional[_Tokens] = None
+        self._refresh_lock = threading.Lock()
+        # 完了したリフレッシュの回数とその結果（待っていた呼び出し元が参照する）
+        self._refresh_generation = 0
+        self._refresh_result: Optional[str] = None
+        self._timer: Optional[threading.Timer] = None
+        self._timer_expires_at = ""
+
+    def tokens(self) -> _Tokens:
+        with self._lock:
+            if self._tokens is None:
+                settings = get_settings()
+                self._tokens = _Tokens(
+                    settings.id_token or "",
+                    settings.refresh_token or "",
+                    settings.token_expires_at or "",
+                )
+            return self._tokens
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        if key is not None and key not in _TOKEN_SETTING_KEYS:
+            return
+        with self._lock:
+            self._tokens = None
+
+    def refresh(self, background: bool = False) -> Optional[str]:
+        """Refresh the id token, or wait for a refresh already in progress"""
+        with self._lock:
+            generation = self._refresh_generation
+
+        with self._refresh_lock:
+            with self._lock:
+                refreshed = self._refresh_generation != generation
+                result = self._refresh_result
+            if refreshed:
+                # 待っている間に他の呼び出し元がリフレッシュを終えた
+                tokens = self.tokens()
+                if tokens.id_token and _is_token_valid(tokens.expires_at):
+                    return tokens.id_token
+                return result
+
+            tokens = self.tokens()
+            if background:
+                if not tokens.refresh_token:
+                    return None
+            elif tokens.id_token and _is_token_valid(tokens.expires_at):
+                return tokens.id_token
+
+            result = None
+            try:
+                result = self._do_refresh(tokens.refresh_token, background)
+            finally:
+                with self._lock:
+                    self._refresh_generation += 1
+                    self._refresh_result = result
+            return result
+
+    def _do_refresh(self, refresh_token: str, background: bool) -> Optional[str]:
+        if not refresh_token:
+            return None
+
+        print("Attempting to refresh token...")
+        try:
+            refresh_response = _refresh_token(refresh_token)
+        except TokenExpiredOrInvalidError:
+            if background:
+                # UIの操作はメインスレッドで行う必要があるため、
+                # 次回のget_token()呼び出し時に処理させる
+                self.invalidate()
+                return None
+            _clear_authentication_state()
+            return None
+
+        if not refresh_response or "id_token" not in refresh_response:
+            print("Token refresh failed, will try with credentials")
+            return None
+
+        # Save the refreshed token to cache
+        _save_token_to_cache(refresh_response)
+        return refresh_response["id_token"]
+
+    def schedule_refresh(self, expires_at: str) -> None:
+        """Refresh in the background shortly before the token stops being
+        usable, so that no API request has to wait for a refresh"""
+        try:
+            expiration_time = datetime.fromisoformat(expires_at)
+        except ValueError:
+            return
+
+        with self._lock:
+            if self._timer_expires_at == expires_at:
+                return
+            if self._timer is not None:
+                self._timer.cancel()
+            refresh_at = expiration_time - timedelta(
+                seconds=TOKEN_EXPIRY_BUFFER_SECONDS + PROACTIVE_REFRESH_MARGIN_SECONDS
+            )
+            delay = max(0.0, (refresh_at - datetime.now()).total_seconds())
+            self._timer = threading.Timer(delay, self._refresh_in_background)
+            self._timer.daemon = True
+            self._timer_expires_at = expires_at
+            self._timer.start()
+
+    def cancel_scheduled_refresh(self) -> None:
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+            self._timer_expires_at = ""
+
+    def _refresh_in_background(self) -> None:
+        try:
+            self.refresh(background=True)
+        except Exception as e:
+            QgsMessageLog.logMessage(
+                f"Background token refresh failed: {format_api_error(e)}",
+                LOG_CATEGORY,
+                Qgis.Warning,
+            )
+
+
+_token_cache = _TokenCache()
+add_setting_listener(_token_cache.invalidate)
+
+
+def cancel_scheduled_refresh() -> None:
+    """Stop the pending background token refresh (on plugin unload)"""
+    _token_cache.cancel_scheduled_refresh()
+
+
 def get_token() -> Optional[str]:
     """
     Get authentication token from cache or by authenticating with credentials
@@ -177,27 +331,15 @@ def get_token() -> Optional[str]:
         str: Authentication token or None if authentication fails
     """
     # Try to get token from cache first
-    cached_token = get_settings().id_token
-    token_expires_at = get_settings().token_expires_at
+    tokens = _token_cache.tokens()
 
     # If we have a valid cached token, use it
-    if cached_token and _is_token_valid(token_expires_at):
-        return cached_token
+    if tokens.id_token and _is_token_valid(tokens.expires_at):
+        _token_cache.schedule_refresh(tokens.expires_at)
+        return tokens.id_token
 
     # Try to refresh the token if we have a refresh token
-    cached_refresh_token = get_settings().refresh_token
-    if cached_refresh_token:
-        print("Attempting to refresh token...")
-
-        try:
-            refresh_response = _refresh_token(cached_refresh_token)
-
-            if refresh_response and "id_token" in refresh_response:
-                # Save the refreshed token to cache
-                _save_token_to_cache(refresh_response)
-                return refresh_response["id_token"]
-            else:
-                print("Token refresh failed, will try with credentials")
-        except TokenExpiredOrInvalidError:
-            _clear_authentication_state()
-            return None
+    if not tokens.refresh_token:
+        _token_cache.cancel_scheduled_refresh()
+        return None
+    return _token_cache.refresh()
@@ -0,0 +1,206 @@
+"""
+キャッシュ（GPKG）への一括書き込み
+
+QgsVectorFileWriter.addFeature で1件ずつ書き込むと、地物ごとに QgsFeature への変換と
+SQLiteの既定の耐久性設定（journal・synchronous）による書き込みが発生し、
+数百万件の地物では1件あたりのオーバーヘッドが支配的になる。
+
+そこでテーブルの作成だけを QgsVectorFileWriter で行い、地物の書き込みは OGR で直接行う。
+- 大きな明示的トランザクション（TRANSACTION_SIZE件ごとにコミット）で書き込む
+- 書き込み中は journal_mode=WAL, synchronous=NORMAL にし、終了時に元の設定に戻す
+  （コミットごとのfsyncを省きつつ、プロセスが落ちてもコミット済みの地物は残る）
+- WKBはそのまま OGR のジオメトリにする（QgsGeometryを経由しない）
+
+コミット済みの地物の最大の kumoy_id（last_id）が、中断したキャッシュ作成を
+再開する位置になる。
+
+既存のキャッシュへの差分の適用（relax_durability=False）では耐久性の設定は変えず、
+削除と追加を1つのトランザクションで行う。
+- 削除・更新された地物は kumoy_id のリストでまとめて DELETE する
+- 更新された地物は削除後に同じ kumoy_id で追加する（INSERT OR REPLACE と同等）
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+from osgeo import gdal, ogr
+from qgis.core import QgsFields
+
+# 1トランザクションで書き込む地物数
+TRANSACTION_SIZE = 50000
+
+# 1回のDELETE文で削除する地物数
+DELETE_CHUNK_SIZE = 5000
+
+# 書き込み中のSQLiteの設定
+_BULK_PRAGMAS = {"journal_mode": "WAL", "synchronous": "NORMAL"}
+
+
+class GpkgBulkWriter:
+    """Write features fetched from the server into an existing, empty GPKG
+    layer in large transactions
+
+    Use as a context manager; the transaction is rolled back and the
+    durable settings are restored when an error occurs; a failed commit or
+    DELETE raises so that the sync is treated as failed. With
+    relax_durability=False everything is written in a single transaction
+    under the file's own durability settings (used to apply diffs)::
+
+        with GpkgBulkWriter(cache_file, fields) as writer:
+            for feature in features:
+                writer.add(feature)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        fields: QgsFields,
+        transaction_size: Optional[int] = None,
+        relax_durability: bool = True,
+    ):
+        self.path = path
+        self.fields = fields
+        self.transaction_size = transaction_size or TRANSACTION_SIZE
+        self.relax_durability = relax_durability
+        self.written = 0
+        self.deleted = 0  # 削除を要求したkumoy_idの数
+        # 開いた時点で書き込まれていた地物数と最大のkumoy_id
+        self.existing_count = 0
+        self.last_id: Optional[int] = None
+        self._dataset: Optional[ogr.DataSource] = None
+        self._layer: Optional[ogr.Layer] = None
+        self._defn: Optional[ogr.FeatureDefn] = None
+        # (OGRのフィールド番号, 属性名)
+        self._columns: List[Tuple[int, str]] = []
+        self._original_pragmas: Dict[str, str] = {}
+        self._pending = 0
+
+    def __enter__(self) -> "GpkgBulkWriter":
+        self._dataset = ogr.Open(self.path, 1)
+        if self._dataset is None:
+            raise Exception(f"Error opening cache file {self.path}")
+        self._layer = self._dataset.GetLayer(0)
+        self._defn = self._layer.GetLayerDefn()
+        for name in self.fields.names():
+            if name == "kumoy_id":
+                # memo: kumoy_idはFIDとして書き込む
+                continue
+            index = self._defn.GetFieldIndex(name)
+            if index >= 0:
+                self._columns.append((index, name))
+
+        table = self._layer.GetName()
+        fid_column = self._layer.GetFIDColumn()
+        result = self._dataset.ExecuteSQL(
+            f'SELECT COUNT(*), MAX("{fid_column}") FROM "{table}"'
+        )
+        try:
+            row = result.GetNextFeature()
+            self.existing_count = row.GetField(0) or 0
+            self.last_id = row.GetField(1)
+        finally:
+            self._dataset.ReleaseResultSet(result)
+
+        if self.relax_durability:
+            for name, value in _BULK_PRAGMAS.items():
+                original = self._pragma(name)
+                if original:
+                    self._original_pragmas[name] = original
+                # memo: 耐久性の設定は性能のためのものなので、失敗しても書き込みは続ける
+                self._execute(f"PRAGMA {name} = {value}", check=False)
+        self._start_transaction()
+        return self
+
+    def __exit__(self, exc_type, _exc, _tb) -> None:
+        try:
+            try:
+                if exc_type is None:
+                    # memo: コミットの失敗（e.g. SQLITE_BUSY）は例外にして、同期を失敗として扱う
+                    # （マニフェストのlast_updatedを進めると差分が失われる）
+                    self._commit_transaction()
+                else:
+                    self._dataset.RollbackTransaction()
+            except Exception:
+                self._dataset.RollbackTransaction()
+                raise
+            finally:
+                # 耐久性の設定を元に戻す
+                for name, value in self._original_pragmas.items():
+                    self._execute(f"PRAGMA {name} = {value}", check=False)
+        finally:
+            self._layer = None
+            self._defn = None
+            self._dataset = None
+
+    def add(self, feature: Dict) -> None:
+        """Write a feature as returned by api.qgis_vector.iter_features"""
+        ogr_feature = ogr.Feature(self._defn)
+        ogr_feature.SetFID(feature["kumoy_id"])
+        wkb = feature["kumoy_wkb"]
+        if wkb:
+            ogr_feature.SetGeometryDirectly(ogr.CreateGeometryFromWkb(bytes(wkb)))
+
+        properties = feature["properties"]
+        for index, name in self._columns:
+            value = properties.get(name)
+            if value is None:
+                ogr_feature.SetFieldNull(index)
+            elif isinstance(value, bool):
+                ogr_feature.SetField(index, int(value))
+            else:
+                ogr_feature.SetField(index, value)
+
+        if self._layer.CreateFeature(ogr_feature) != ogr.OGRERR_NONE:
+            raise Exception(
+                f"Error writing feature {feature['kumoy_id']} to {self.path}"
+            )
+        self.written += 1
+        self.last_id = feature["kumoy_id"]
+
+        self._pending += 1
+        if self.relax_durability and self._pending >= self.transaction_size:
+            self._commit_transaction()
+            self._start_transaction()
+            self._pending = 0
+
+    def delete(self, kumoy_ids: List[int]) -> None:
+        """Delete features by kumoy_id; ids not in the cache are ignored"""
+        table = self._layer.GetName()
+        fid_column = self._layer.GetFIDColumn()
+        for i in range(0, len(kumoy_ids), DELETE_CHUNK_SIZE):
+            chunk = kumoy_ids[i : i + DELETE_CHUNK_SIZE]
+            # memo: kumoy_idは整数なのでSQLに直接埋め込む
+            ids = ",".join(str(int(kumoy_id)) for kumoy_id in chunk)
+            self._execute(f'DELETE FROM "{table}" WHERE "{fid_column}" IN ({ids})')
+            self.deleted += len(chunk)
+
+    def _start_transaction(self) -> None:
+        if self._dataset.StartTransaction() != ogr.OGRERR_NONE:
+            raise Exception(
+                f"Error starting a transaction on {self.path}: {gdal.GetLastErrorMsg()}"
+            )
+
+    def _commit_transaction(self) -> None:
+        if self._dataset.CommitTransaction() != ogr.OGRERR_NONE:
+            raise Exception(
+                f"Error committing to {self.path}: {gdal.GetLastErrorMsg()}"
+            )
+
+    def _execute(self, sql: str, check: bool = True) -> None:
+        """Execute a statement; raise if it fails unless check is False"""
+        gdal.ErrorReset()
+        result = self._dataset.ExecuteSQL(sql)
+        if result is not None:
+            self._dataset.ReleaseResultSet(result)
+        if check and gdal.GetLastErrorType() >= gdal.CE_Failure:
+            raise Exception(
+                f"Error executing SQL on {self.path}: {gdal.GetLastErrorMsg()}"
+            )
+
+    def _pragma(self, name: str) -> str:
+        result = self._dataset.ExecuteSQL(f"PRAGMA {name}")
+        try:
+            row = result.GetNextFeature() if result is not None else None
+            return str(row.GetField(0)) if row is not None else ""
+        finally:
+            if result is not None:
+                self._dataset.ReleaseResultSet(result)
@@ -0,0 +1,192 @@
+"""
+キャッシュの容量制限（LRU）
+
+ベクター（GPKG）とマップ（.qgs）のキャッシュの合計サイズが設定値（cache_quota_mb）を超えたら、
+最後にアクセスされてから最も時間が経ったものから削除する。
+- 開いているレイヤーのキャッシュ・開いているマップのファイルは削除しない
+  （削除中に開かれたレイヤーも、layersAdded で更新される一覧で除外する）
+- 同期中のベクターのキャッシュは削除しない（同期のロックが取れなければ飛ばす）
+- 直近（MIN_IDLE_SECONDS以内）にアクセス・同期されたキャッシュも削除しない
+  （開かれる途中のレイヤーを含めるため）
+- 削除はバックグラウンド（QgsTask）で行う
+"""
+
+import os
+import time
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, List, Optional, Set
+
+from qgis.core import Qgis, QgsApplication, QgsMessageLog, QgsProject, QgsTask
+
+from ... import settings_manager
+from ..constants import DATA_PROVIDER_KEY, LOG_CATEGORY
+from . import manifest
+from . import map as map_cache
+from . import vector as vector_cache
+
+# アクセス・同期からこの秒数が経っていないキャッシュは削除しない
+MIN_IDLE_SECONDS = 300
+
+# 開いているレイヤーのベクターID（メインスレッドで置き換え、削除タスクから参照する）
+_open_vector_ids: FrozenSet[str] = frozenset()
+
+
+@dataclass
+class CacheItem:
+    kind: str  # "vector" または "map"
+    id: str
+    byte_size: int
+    last_accessed: float
+
+
+def plan_eviction(
+    items: Iterable[CacheItem],
+    quota_bytes: int,
+    protected: Set[str],
+    now: Optional[float] = None,
+) -> List[CacheItem]:
+    """Return the items to delete, least recently accessed first, so that
+    the total size fits in quota_bytes. Protected ids and recently
+    accessed items are kept even if the quota cannot be met."""
+    now = time.time() if now is None else now
+    items = sorted(items, key=lambda item: item.last_accessed)
+    total = sum(item.byte_size for item in items)
+    evicted = []
+    for item in items:
+        if total <= quota_bytes:
+            break
+        if item.id in protected or now - item.last_accessed < MIN_IDLE_SECONDS:
+            continue
+        evicted.append(item)
+        total -= item.byte_size
+    return evicted
+
+
+def _cache_items() -> List[CacheItem]:
+    items = [
+        CacheItem("vector", e.vector_id, e.byte_size, e.last_accessed or 0.0)
+        for e in manifest.entries()
+    ]
+    map_dir = map_cache._get_cache_dir()
+    for filename in os.listdir(map_dir):
+        if not filename.endswith(".qgs"):
+            continue
+        stat = os.stat(os.path.join(map_dir, filename))
+        items.append(
+            CacheItem("map", filename[: -len(".qgs")], stat.st_size, stat.st_mtime)
+        )
+    return items
+
+
+class CacheEvictionTask(QgsTask):
+    """Delete least recently used caches until they fit in the quota"""
+
+    def __init__(self, quota_bytes: int, protected: Set[str]):
+        super().__init__("Kumoy: evict cache", QgsTask.CanCancel)
+        self.quota_bytes = quota_bytes
+        self.protected = protected
+        self.evicted: List[CacheItem] = []
+
+    def run(self) -> bool:
+        try:
+            for item in plan_eviction(_cache_items(), self.quota_bytes, self.protected):
+                if self.isCanceled():
+                    break
+                if item.kind == "vector":
+                    deleted = _clear_idle_vector(item.id)
+                else:
+                    deleted = map_cache.clear(item.id)
+                if deleted:
+                    self.evicted.append(item)
+        except Exception as e:
+            QgsMessageLog.logMessage(
+                f"Error evicting cache: {e}", LOG_CATEGORY, Qgis.Warning
+            )
+            return False
+        return True
+
+    def finished(self, result: bool) -> None:
+        if self.evicted:
+            QgsMessageLog.logMessage(
+                "Evicted {} caches ({:.1f} MB) to fit the {:.0f} MB quota.".format(
+                    len(self.evicted),
+                    sum(item.byte_size for item in self.evicted) / 1024 / 1024,
+                    self.quota_bytes / 1024 / 1024,
+                ),
+                LOG_CATEGORY,
+                Qgis.Info,
+            )
+
+
+def _clear_idle_vector(vector_id: str) -> bool:
+    """Delete the cache of a vector unless a layer of it has been opened or
+    it is being synced. Returns True if deleted."""
+    if vector_id in _open_vector_ids:
+        return False
+    lock = vector_cache._sync_lock(vector_id)
+    if not lock.acquire(blocking=False):
+        return False
+    try:
+        return vector_cache.clear(vector_id)
+    finally:
+        lock.release()
+
+
+def _kumoy_vector_ids() -> Set[str]:
+    vector_ids = set()
+    for layer in QgsProject.instance().mapLayers().values():
+        provider = layer.dataProvider()
+        if provider is not None and provider.name() == DATA_PROVIDER_KEY:
+            vector_ids.add(provider.vector_id)
+    return vector_ids
+
+
+def update_open_vectors(*_args) -> None:
+    """Refresh the ids of vectors backing open layers. Connected to the
+    project's layersAdded/layersRemoved signals (main thread only)."""
+    global _open_vector_ids
+    _open_vector_ids = frozenset(_kumoy_vector_ids())
+
+
+def open_vector_ids() -> FrozenSet[str]:
+    """Ids of vectors backing open layers as of the last update_open_vectors()"""
+    return _open_vector_ids
+
+
+def _protected_ids() -> Set[str]:
+    """Ids of caches backing open layers and the open map (main thread only)"""
+    protected = _kumoy_vector_ids()
+    project_file = QgsProject.instance().fileName()
+    if project_file:
+        protected.add(os.path.splitext(os.path.basename(project_file))[0])
+    return protected
+
+
+_task: Optional[CacheEvictionTask] = None
+
+
+def get_quota_bytes() -> int:
+    """Cache quota from the settings in bytes; 0 means unlimited"""
+    try:
+        return max(0, int(settings_manager.get_settings().cache_quota_mb)) * 1024 * 1024
+    except ValueError:
+        return 0
+
+
+def schedule_eviction() -> None:
+    """Start a background eviction when the caches exceed the quota.
+    Must be called from the main thread."""
+    global _task
+    quota_bytes = get_quota_bytes()
+    if quota_bytes == 0:
+        return
+    if _task is not None:
+        try:
+            if _task.status() not in (QgsTask.Complete, QgsTask.Terminated):
+                return
+        except RuntimeError:
+            # memo: 終了したタスクのC++オブジェクトは削除されている
+            pass
+    update_open_vectors()
+    _task = CacheEvictionTask(quota_bytes, _protected_ids())
+    QgsApplication.taskManager().addTask(_task)
@@ -0,0 +1,222 @@
+"""
+キャッシュディレクトリのマニフェスト（SQLite）
+
+ベクターごとのキャッシュの状態を1つのデータベースに記録する。
+- スキーマのハッシュ・地物数・ファイルサイズ
+- 最終同期時刻（差分取得の基準、旧 QSettings の last_updated）
+- 最終アクセス時刻・同期の所要時間
+- キャッシュの形式のバージョン
+
+同期時の整合性の確認はマニフェストの1行の参照で行い、容量管理・統計・形式の移行にも用いる。
+エントリはキャッシュファイルが完成した後にのみ書き込まれるので、
+エントリがあればキャッシュファイルも存在する。
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Iterator, List, Optional, Set
+
+from qgis.core import QgsApplication, QgsFields, QgsWkbTypes
+from qgis.PyQt.QtCore import QSettings
+
+# キャッシュファイルの形式のバージョン。互換性のない変更をしたら上げる（古いキャッシュは作り直される）
+CACHE_FORMAT_VERSION = 1
+
+MANIFEST_FILE = "manifest.sqlite"
+
+# マニフェスト自体のスキーマのバージョン（PRAGMA user_version）
+_SCHEMA_VERSION = 1
+
+# 以前 last_updated を保存していた QSettings のグループ
+LEGACY_SETTING_GROUP = "/Kumoy/local_cache"
+
+_lock = threading.Lock()
+
+# マイグレーション済みのマニフェストのパス（プロセスごとに1回だけ確認する）
+_migrated: Set[str] = set()
+
+
+@dataclass
+class CacheEntry:
+    vector_id: str
+    format_version: int
+    schema_hash: Optional[str]  # Noneは不明（旧バージョンから移行したエントリ）
+    feature_count: int
+    byte_size: int
+    last_updated: Optional[str]  # 差分取得の基準となる最終同期時刻（ISO 8601）
+    last_accessed: Optional[float]  # UNIX時刻
+    sync_seconds: Optional[float]  # 直近の同期の所要時間
+
+
+def get_cache_dir() -> str:
+    """Return the directory where vector cache files are stored."""
+    setting_dir = QgsApplication.qgisSettingsDirPath()
+    cache_dir = os.path.join(setting_dir, "kumoygis", "local_cache", "vectors")
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
+
+
+def is_manifest_file(filename: str) -> bool:
+    """Whether a file in the cache directory belongs to the manifest"""
+    return filename.startswith(MANIFEST_FILE)
+
+
+def schema_hash(fields: QgsFields, geometry_type: QgsWkbTypes.GeometryType) -> str:
+    """Hash of the columns (name and type) and geometry type of a cache"""
+    schema = [int(geometry_type)] + [[f.name(), int(f.type())] for f in fields]
+    return hashlib.sha256(json.dumps(schema).encode("utf-8")).hexdigest()[:16]
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    if version >= _SCHEMA_VERSION:
+        return
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS vectors (
+            vector_id TEXT PRIMARY KEY,
+            format_version INTEGER NOT NULL,
+            schema_hash TEXT,
+            feature_count INTEGER NOT NULL DEFAULT 0,
+            byte_size INTEGER NOT NULL DEFAULT 0,
+            last_updated TEXT,
+            last_accessed REAL,
+            sync_seconds REAL
+        )
+        """
+    )
+
+    # memo: QSettingsに保存されていたlast_updatedを取り込む（形式はバージョン1と同じ）
+    qsettings = QSettings()
+    qsettings.beginGroup(LEGACY_SETTING_GROUP)
+    for vector_id in qsettings.childKeys():
+        cache_file = os.path.join(get_cache_dir(), f"{vector_id}.gpkg")
+        if not os.path.exists(cache_file):
+            continue
+        conn.execute(
+            "INSERT OR IGNORE INTO vectors"
+            " (vector_id, format_version, byte_size, last_updated)"
+            " VALUES (?, 1, ?, ?)",
+            (
+                vector_id,
+                os.path.getsize(cache_file),
+                qsettings.value(vector_id),
+            ),
+        )
+    qsettings.remove("")
+    qsettings.endGroup()
+
+    conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+
+@contextmanager
+def _connect() -> Iterator[sqlite3.Connection]:
+    """Open the manifest; changes are committed when the block exits"""
+    with _lock:
+        path = os.path.join(get_cache_dir(), MANIFEST_FILE)
+        conn = sqlite3.connect(path, timeout=10)
+        try:
+            if path not in _migrated:
+                _migrate(conn)
+                conn.commit()
+                _migrated.add(path)
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def _to_entry(row) -> CacheEntry:
+    return CacheEntry(*row)
+
+
+_COLUMNS = (
+    "vector_id, format_version, schema_hash, feature_count, byte_size,"
+    " last_updated, last_accessed, sync_seconds"
+)
+
+
+def get_entry(vector_id: str) -> Optional[CacheEntry]:
+    with _connect() as conn:
+        row = conn.execute(
+            f"SELECT {_COLUMNS} FROM vectors WHERE vector_id = ?", (vector_id,)
+        ).fetchone()
+    return _to_entry(row) if row is not None else None
+
+
+def entries() -> List[CacheEntry]:
+    """All cache entries, least recently accessed first"""
+    with _connect() as conn:
+        rows = conn.execute(
+            f"SELECT {_COLUMNS} FROM vectors ORDER BY COALESCE(last_accessed, 0)"
+        ).fetchall()
+    return [_to_entry(row) for row in rows]
+
+
+def record_sync(
+    vector_id: str,
+    schema_hash: str,
+    feature_count: int,
+    byte_size: int,
+    last_updated: str,
+    sync_seconds: float,
+) -> None:
+    """Record a completed sync of a cache file"""
+    now = time.time()
+    with _connect() as conn:
+        conn.execute(
+            f"INSERT INTO vectors ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(vector_id) DO UPDATE SET"
+            " format_version = excluded.format_version,"
+            " schema_hash = excluded.schema_hash,"
+            " feature_count = excluded.feature_count,"
+            " byte_size = excluded.byte_size,"
+            " last_updated = excluded.last_updated,"
+            " last_accessed = excluded.last_accessed,"
+            " sync_seconds = excluded.sync_seconds",
+            (
+                vector_id,
+                CACHE_FORMAT_VERSION,
+                schema_hash,
+                feature_count,
+                byte_size,
+                last_updated,
+                now,
+                sync_seconds,
+            ),
+        )
+
+
+def set_last_updated(vector_id: str, last_updated: str) -> None:
+    with _connect() as conn:
+        conn.execute(
+            "INSERT INTO vectors (vector_id, format_version, last_updated)"
+            " VALUES (?, ?, ?)"
+            " ON CONFLICT(vector_id) DO UPDATE SET last_updated = excluded.last_updated",
+            (vector_id, CACHE_FORMAT_VERSION, last_updated),
+        )
+
+
+def touch(vector_id: str) -> None:
+    """Record an access to a cache (used for eviction)"""
+    with _connect() as conn:
+        conn.execute(
+            "UPDATE vectors SET last_accessed = ? WHERE vector_id = ?",
+            (time.time(), vector_id),
+        )
+
+
+def delete_entry(vector_id: str) -> None:
+    with _connect() as conn:
+        conn.execute("DELETE FROM vectors WHERE vector_id = ?", (vector_id,))
+
+
+def reset() -> None:
+    with _connect() as conn:
+        conn.execute("DELETE FROM vectors")
@@ -0,0 +1,173 @@
+"""
+キャッシュ新規作成時の地物の先読み
+
+get-features-v2 は after_id によるページングなので、次のページを要求するには
+現在のページの最後の kumoy_id が必要になる。そこで取得用スレッドがページを
+1件ずつデコードしてキューに積み、ページを読み終えた時点ですぐ次のページを要求する。
+書き込み側（GPKG）はキューから取り出して書き込むだけなので、
+通信と書き込みが並行し、所要時間はおおよそ max(通信, 書き込み) になる。
+
+キューに積む地物数には上限があり（既定で2ページ分）、メモリ使用量は一定に保たれる。
+throttle を渡すと、ページを受信するたびに取得用スレッドで受信バイト数を渡して呼び出す
+（帯域の制限に用いる）。
+
+取得用スレッドは QThread で、呼び出し元（SyncWorker・QgsTask）がコンテキストマネージャーの
+終了時に停止して待つ。1回のキャッシュ作成の全ページは同じスレッドの
+QgsNetworkAccessManager から送信されるので、コネクションが再利用される。
+feedback を渡すと、キャンセル時に stop() が呼ばれ、送信中のリクエストも中断される。
+"""
+
+import queue
+import threading
+from typing import Callable, Dict, Iterator, List, Optional
+
+from qgis.core import QgsFeedback
+from qgis.PyQt.QtCore import QThread
+
+from .. import api
+from ..api.client import request_feedback
+
+# get-features-v2 が1回に返す最大件数。API仕様として固定値
+PAGE_SIZE = 5000
+# キューに1度に積む地物数
+CHUNK_SIZE = 500
+# 先読みしておくページ数
+PREFETCH_PAGES = 2
+# キューが満杯の場合に停止を確認する間隔（秒）。通常は stop() がキューを空にして起こす
+PUT_TIMEOUT = 5.0
+
+# 取得終了を示す目印
+_END = object()
+# 停止されたことを読み出し側に知らせる目印
+_STOPPED = object()
+
+
+class _FetchError:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class _FetchThread(QThread):
+    def __init__(self, target: Callable[[], None]):
+        super().__init__()
+        self._target = target
+
+    def run(self) -> None:
+        self._target()
+
+
+class FeaturePrefetcher:
+    """Iterate over all features of a vector while the next ones are fetched
+    in a background thread
+
+    Use as a context manager so that the fetcher stops when the consumer
+    stops early (e.g. on a write error)::
+
+        with FeaturePrefetcher(vector_id, feedback=feedback) as features:
+            for feature in features:
+                ...
+
+    stop() (called when feedback is canceled) may be called from any thread;
+    the iteration then ends early.
+    """
+
+    def __init__(
+        self,
+        vector_id: str,
+        after_id: Optional[int] = None,
+        prefetch_pages: int = PREFETCH_PAGES,
+        throttle: Optional[Callable[[int], None]] = None,
+        feedback: Optional[QgsFeedback] = None,
+    ):
+        self.vector_id = vector_id
+        self.after_id = after_id
+        self.throttle = throttle
+        self.feedback = feedback
+        self._queue: "queue.Queue" = queue.Queue(
+            maxsize=max(1, prefetch_pages * PAGE_SIZE // CHUNK_SIZE)
+        )
+        self._stop = threading.Event()
+        self._thread: Optional[_FetchThread] = None
+
+    def __enter__(self) -> Iterator[Dict]:
+        if self.feedback is not None:
+            self.feedback.canceled.connect(self.stop)
+            if self.feedback.isCanceled():
+                self.stop()
+        self._thread = _FetchThread(self._run)
+        self._thread.start()
+        return self._iter()
+
+    def __exit__(self, *_exc) -> None:
+        if self.feedback is not None:
+            try:
+                self.feedback.canceled.disconnect(self.stop)
+            except TypeError:
+                pass
+        self.stop()
+        self._thread.wait()
+
+    def stop(self) -> None:
+        """Stop fetching and end the iteration"""
+        self._stop.set()
+        # memo: 満杯のキューで待っている取得スレッドと、空のキューで待っている読み出し側を起こす。
+        # 停止後に取得スレッドが積むのは高々1回なので、2回目には必ず積める
+        while True:
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            try:
+                self._queue.put_nowait(_STOPPED)
+                return
+            except queue.Full:
+                continue
+
+    def _iter(self) -> Iterator[Dict]:
+        while True:
+            item = self._queue.get()
+            if item is _END or item is _STOPPED or self._stop.is_set():
+                return
+            if isinstance(item, _FetchError):
+                raise item.error
+            yield from item
+
+    def _put(self, item) -> bool:
+        """Put item on the queue unless stopped. Returns False when stopped."""
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _run(self) -> None:
+        after_id = self.after_id
+        try:
+            with request_feedback(self.feedback):
+                while not self._stop.is_set():
+                    fetched_count = 0
+                    chunk: List[Dict] = []
+                    for feature in api.qgis_vector.iter_features(
+                        vector_id=self.vector_id,
+                        after_id=after_id,
+                        on_response=self.throttle,
+                    ):
+                        chunk.append(feature)
+                        fetched_count += 1
+                        after_id = feature["kumoy_id"]
+                        if len(chunk) >= CHUNK_SIZE:
+                            if not self._put(chunk):
+                                return
+                            chunk = []
+                    if chunk and not self._put(chunk):
+                        return
+                    if fetched_count < PAGE_SIZE:
+                        # 取得終了
+                        break
+        except Exception as e:
+            self._put(_FetchError(e))
+            return
+        self._put(_END)
@@ -0,0 +1,87 @@
+"""
+キャッシュ（GPKG）の空間インデックス（R-tree）の作成と検査
+
+- 新規作成時は空間インデックスなしでテーブルを作り、地物の一括書き込み後に1回だけ作成する
+  （書き込みの度にR-treeを更新しない）
+- 差分の適用後は空間インデックスの有無を確認し、大きな差分の後は件数を照合して
+  古くなっていれば作り直す
+- 範囲指定の読み込み（KumoyFeatureIterator）は常に空間インデックスを使える状態にする
+"""
+
+from typing import Optional, Tuple
+
+from osgeo import ogr
+from qgis.core import Qgis, QgsMessageLog
+
+from ..constants import LOG_CATEGORY
+
+# この件数以上の差分を適用したら空間インデックスの件数を照合する
+LARGE_DIFF_ROWS = 1000
+
+
+def _open(cache_file: str, update: bool) -> Tuple[ogr.DataSource, str, str]:
+    dataset = ogr.Open(cache_file, 1 if update else 0)
+    if dataset is None:
+        raise Exception(f"Error opening cache file {cache_file}")
+    layer = dataset.GetLayer(0)
+    return dataset, layer.GetName(), layer.GetGeometryColumn()
+
+
+def _scalar(dataset: ogr.DataSource, sql: str) -> Optional[int]:
+    result = dataset.ExecuteSQL(sql)
+    if result is None:
+        return None
+    try:
+        row = result.GetNextFeature()
+        return row.GetField(0) if row is not None else None
+    finally:
+        dataset.ReleaseResultSet(result)
+
+
+def _has_index(dataset: ogr.DataSource, table: str, column: str) -> bool:
+    return _scalar(dataset, f"SELECT HasSpatialIndex('{table}', '{column}')") == 1
+
+
+def _is_fresh(dataset: ogr.DataSource, table: str, column: str) -> bool:
+    """Whether the R-tree has one entry per non-empty geometry"""
+    indexed = _scalar(dataset, f'SELECT COUNT(*) FROM "rtree_{table}_{column}"')
+    geometries = _scalar(
+        dataset,
+        f'SELECT COUNT(*) FROM "{table}" '
+        f'WHERE "{column}" IS NOT NULL AND NOT ST_IsEmpty("{column}")',
+    )
+    return indexed == geometries
+
+
+def has_spatial_index(cache_file: str) -> bool:
+    dataset, table, column = _open(cache_file, update=False)
+    return _has_index(dataset, table, column)
+
+
+def build_spatial_index(cache_file: str) -> None:
+    """Create (or recreate) the spatial index of a cache file"""
+    dataset, table, column = _open(cache_file, update=True)
+    if _has_index(dataset, table, column):
+        _scalar(dataset, f"SELECT DisableSpatialIndex('{table}', '{column}')")
+    _scalar(dataset, f"SELECT CreateSpatialIndex('{table}', '{column}')")
+
+
+def ensure_spatial_index(cache_file: str, verify: bool = False) -> bool:
+    """Build the spatial index when it is missing, or when verify is set
+    and it does not match the table. Returns True when it was (re)built."""
+    dataset, table, column = _open(cache_file, update=False)
+    if not _has_index(dataset, table, column):
+        reason = "missing"
+    elif verify and not _is_fresh(dataset, table, column):
+        reason = "stale"
+    else:
+        return False
+    del dataset
+
+    QgsMessageLog.logMessage(
+        f"Spatial index of {cache_file} is {reason}, rebuilding.",
+        LOG_CATEGORY,
+        Qgis.Info,
+    )
+    build_spatial_index(cache_file)
+    return True
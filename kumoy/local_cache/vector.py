@@ -1,15 +1,17 @@
 import datetime
+import json
 import os
-from typing import Callable, Optional
+import threading
+import time
+from typing import Callable, Dict, Optional
 
+from osgeo import ogr
 from qgis.core import (
     Qgis,
-    QgsApplication,
     QgsCoordinateReferenceSystem,
-    QgsFeature,
+    QgsFeedback,
     QgsField,
     QgsFields,
-    QgsGeometry,
     QgsMessageLog,
     QgsProject,
     QgsVectorFileWriter,
@@ -18,34 +20,52 @@ from qgis.core import (
 )
 
 from .. import api
+from ..api.client import request_feedback
 from ..constants import LOG_CATEGORY
-from .settings import delete_last_updated, get_last_updated, store_last_updated
+from . import manifest, spatial_index
+from .bulk_writer import GpkgBulkWriter
+from .prefetch import FeaturePrefetcher
+
+
+# ベクターごとのキャッシュの同期のロック（手動の同期と定期的な差分の同期が同時に書き込まないようにする）
+_sync_locks: Dict[str, threading.Lock] = {}
+_sync_locks_lock = threading.Lock()
+
+# 同期のロックを待つ間にキャンセルを確認する間隔（秒）
+LOCK_POLL_SECONDS = 0.2
+
+# ロックを持っている、譲ることのできるバックグラウンドの同期（キャッシュの事前作成）のフィードバック
+_yielding_feedbacks: Dict[str, QgsFeedback] = {}
+
+
+class SyncCancelledError(Exception):
+    """Raised by sync_local_cache when its feedback is canceled"""
+
+
+def _is_canceled(feedback: Optional[QgsFeedback]) -> bool:
+    return feedback is not None and feedback.isCanceled()
 
 
 def _get_cache_dir() -> str:
-    """Return the directory where cache files are stored.
-    data_type: subdirectory name maps or vectors"""
-    setting_dir = QgsApplication.qgisSettingsDirPath()
-    cache_dir = os.path.join(setting_dir, "kumoygis", "local_cache", "vectors")
-    os.makedirs(cache_dir, exist_ok=True)
-    return cache_dir
+    """Return the directory where cache files are stored."""
+    return manifest.get_cache_dir()
 
 
-def _create_new_cache(
+def _sync_lock(vector_id: str) -> threading.Lock:
+    with _sync_locks_lock:
+        return _sync_locks.setdefault(vector_id, threading.Lock())
+
+
+def _create_cache_table(
     cache_file: str,
-    vector_id: str,
     fields: QgsFields,
     geometry_type: QgsWkbTypes.GeometryType,
-    progress_callback: Optional[Callable[[int], None]] = None,
-) -> str:
-    """
-    新規にキャッシュファイルを作成する
-
-    Returns:
-        updated_at: 最終更新日時
-    """
+) -> None:
+    """Create an empty cache file with kumoy_id as the FID column.
+    Features are written by GpkgBulkWriter."""
     options = QgsVectorFileWriter.SaveVectorOptions()
-    options.layerOptions = ["FID=kumoy_id"]
+    # memo: 空間インデックスは地物の書き込み後に作成する
+    options.layerOptions = ["FID=kumoy_id", "SPATIAL_INDEX=NO"]
     options.driverName = "GPKG"
     options.fileEncoding = "UTF-8"
 
@@ -67,66 +87,137 @@ def _create_new_cache(
         raise Exception(
             f"Error creating cache file {cache_file}: {writer.errorMessage()}"
         )
+    del writer
 
-    # memo: ページングによりレコードを逐次取得していくが、取得中にレコードの更新があった際に
-    # 正しく差分を取得するために、逐次取得開始前の時刻をlast_updatedとする
-    updated_at = datetime.datetime.now(datetime.timezone.utc).strftime(
-        "%Y-%m-%dT%H:%M:%SZ"
-    )
 
-    after_id = None  # 1回のバッチで最後に取得したkumoy_idを保持する
-    processed_features = 0
-    while True:
-        # Fetch features in batches
-        features = api.qgis_vector.get_features(
-            vector_id=vector_id,
-            after_id=after_id,
-        )
+def _create_new_cache(
+    cache_file: str,
+    vector_id: str,
+    fields: QgsFields,
+    geometry_type: QgsWkbTypes.GeometryType,
+    progress_callback: Optional[Callable[[int], None]] = None,
+    throttle: Optional[Callable[[int], None]] = None,
+    feedback: Optional[QgsFeedback] = None,
+) -> str:
+    """
+    新規にキャッシュファイルを作成する
 
-        for feature in features:
-            qgsfeature = QgsFeature()
-            # Set geometry
-            g = QgsGeometry()
-            g.fromWkb(feature["kumoy_wkb"])
-            qgsfeature.setGeometry(g)
-
-            # Set attributes
-            qgsfeature.setFields(fields)
-            for name in fields.names():
-                if name == "kumoy_id":
-                    qgsfeature["kumoy_id"] = feature["kumoy_id"]
-                else:
-                    qgsfeature[name] = feature["properties"][name]
-
-            # Set feature ID and validity
-            qgsfeature.setValid(True)
-            # 地物を書き込み
-            writer.addFeature(qgsfeature)
+    - 作成中は一時ファイル（{vector_id}.part.gpkg）に書き込み、完了したらキャッシュファイルに置き換える
+    - 中断された場合は、次回の作成時に一時ファイルのコミット済みの地物の続きから再開する
+    - feedbackがキャンセルされたら、書き込み済みの地物をコミットしてSyncCancelledErrorを投げる
 
-            if progress_callback is not None:
-                processed_features += 1
-                progress_callback(processed_features)
+    Returns:
+        updated_at: 最終更新日時
+    """
+    part_file = _part_file(cache_file)
+    state = _load_build_state(part_file, fields, geometry_type)
+    if state is None:
+        _remove_part_files(part_file)
+        _create_cache_table(part_file, fields, geometry_type)
+        # memo: ページングによりレコードを逐次取得していくが、取得中にレコードの更新があった際に
+        # 正しく差分を取得するために、逐次取得開始前の時刻をlast_updatedとする
+        # 再開した場合も最初の取得開始時刻を用いる
+        state = {
+            "updated_at": datetime.datetime.now(datetime.timezone.utc).strftime(
+                "%Y-%m-%dT%H:%M:%SZ"
+            ),
+            "fields": fields.names(),
+            "geometry_type": int(geometry_type),
+        }
+        _save_build_state(part_file, state)
+
+    with GpkgBulkWriter(part_file, fields) as bulk_writer:
+        if bulk_writer.last_id is not None:
+            QgsMessageLog.logMessage(
+                f"Resuming cache build of {vector_id} after {bulk_writer.existing_count} features.",
+                LOG_CATEGORY,
+                Qgis.Info,
+            )
+        # memo: 地物は取得用スレッドが先読みしてデコードするので、書き込みの間も次のページの取得が進む
+        # memo: キャンセル時は取得用スレッドが停止され、ループを抜けて書き込み・先読みを正常に終了する
+        # （一時ファイルのトランザクションとファイルを開いたまま残さない）
+        with FeaturePrefetcher(
+            vector_id,
+            after_id=bulk_writer.last_id,
+            throttle=throttle,
+            feedback=feedback,
+        ) as features:
+            for feature in features:
+                if _is_canceled(feedback):
+                    break
+                bulk_writer.add(feature)
+                if progress_callback is not None:
+                    progress_callback(bulk_writer.existing_count + bulk_writer.written)
 
-        BATCH_SIZE = 5000  # 1回のバッチで取得する最大レコード数。API仕様として固定値
-        if len(features) < BATCH_SIZE:
-            # 取得終了
-            break
+    if _is_canceled(feedback):
+        raise SyncCancelledError()
 
-        # Update after_id for the next batch
-        after_id = features[-1]["kumoy_id"]
-    del writer
+    spatial_index.build_spatial_index(part_file)
 
-    return updated_at
+    # 完成したファイルでキャッシュファイルを置き換える
+    os.replace(part_file, cache_file)
+    _remove_part_files(part_file)
 
+    return state["updated_at"]
 
-def _update_existing_cache(cache_file: str, fields: QgsFields, diff: dict) -> str:
-    """
-    既存のキャッシュファイルを更新する
 
-    Returns:
-        updated_at: 最終更新日時
-    """
+def _part_file(cache_file: str) -> str:
+    """Temporary file of a cache file being built"""
+    # memo: 拡張子が.gpkgでないとQgsVectorFileWriterが付け足すので、.part.gpkgとする
+    return f"{os.path.splitext(cache_file)[0]}.part.gpkg"
+
 
+def part_file_size(vector_id: str) -> int:
+    """Size in bytes of the files of a cache being built (0 if none)"""
+    part_file = _part_file(os.path.join(_get_cache_dir(), f"{vector_id}.gpkg"))
+    return sum(
+        os.path.getsize(f) for f in (part_file, f"{part_file}-wal") if os.path.exists(f)
+    )
+
+
+def _load_build_state(
+    part_file: str, fields: QgsFields, geometry_type: QgsWkbTypes.GeometryType
+) -> Optional[dict]:
+    """Return the state of an interrupted cache build which can be resumed"""
+    state_file = f"{part_file}.json"
+    if not os.path.exists(part_file) or not os.path.exists(state_file):
+        return None
+    try:
+        with open(state_file, encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    # カラムやジオメトリタイプが変わっていたら最初から作り直す
+    if state.get("fields") != fields.names() or state.get("geometry_type") != int(
+        geometry_type
+    ):
+        return None
+    if not QgsVectorLayer(part_file, "part", "ogr").isValid():
+        return None
+    return state
+
+
+def _save_build_state(part_file: str, state: dict) -> None:
+    state_file = f"{part_file}.json"
+    with open(f"{state_file}.tmp", "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(f"{state_file}.tmp", state_file)
+
+
+def _remove_part_files(part_file: str) -> None:
+    for f in (
+        part_file,
+        f"{part_file}-wal",
+        f"{part_file}-shm",
+        f"{part_file}-journal",
+        f"{part_file}.json",
+    ):
+        if os.path.exists(f):
+            os.unlink(f)
+
+
+def _update_columns(cache_file: str, fields: QgsFields) -> None:
+    """Add and delete columns of a cache file to match the server"""
     vlayer = QgsVectorLayer(cache_file, "temp", "ogr")
     vlayer.startEditing()
 
@@ -143,6 +234,32 @@ def _update_existing_cache(cache_file: str, fields: QgsFields, diff: dict) -> st
         if vlayer.fields().indexOf(name) == -1:
             vlayer.addAttribute(QgsField(name, fields[name].type()))
 
+    vlayer.commitChanges()
+    # memo: 地物の書き込みのためにファイルを閉じる
+    del vlayer
+
+
+def _update_existing_cache(
+    cache_file: str,
+    fields: QgsFields,
+    diff: dict,
+    progress_callback: Optional[Callable[[int], None]] = None,
+    schema_changed: bool = True,
+    feedback: Optional[QgsFeedback] = None,
+) -> str:
+    """
+    既存のキャッシュファイルを更新する
+
+    Args:
+        schema_changed: Falseならカラムの照合を省く（マニフェストのスキーマのハッシュが一致する場合）
+        feedback: キャンセルされたら差分の適用を取り消してSyncCancelledErrorを投げる
+
+    Returns:
+        updated_at: 最終更新日時
+    """
+    if schema_changed:
+        _update_columns(cache_file, fields)
+
     updated_at = datetime.datetime.now(datetime.timezone.utc).strftime(
         "%Y-%m-%dT%H:%M:%SZ"
     )
@@ -151,42 +268,30 @@ def _update_existing_cache(cache_file: str, fields: QgsFields, diff: dict) -> st
         map(lambda rec: rec["kumoy_id"], diff["updatedRows"])
     )
 
-    if len(should_deleted_fids) == 0 and len(diff["updatedRows"]) == 0:
+    if len(should_deleted_fids) == 0:
         # No changes, do nothing
-        pass
-    else:
-        # 削除された行と更新された行を全て削除する
-        if len(should_deleted_fids) > 0:
-            for fid in should_deleted_fids:
-                # Delete features by fid
-                feature = vlayer.getFeature(fid)
-                if feature.isValid():
-                    vlayer.deleteFeature(feature.id())
-
-        # 更新された行を新たなレコードとして追加する
-        if len(diff["updatedRows"]) > 0:
-            # add features
-            for feature in diff["updatedRows"]:
-                qgsfeature = QgsFeature()
-                # Set geometry
-                g = QgsGeometry()
-                g.fromWkb(feature["kumoy_wkb"])
-                qgsfeature.setGeometry(g)
-
-                # Set attributes
-                qgsfeature.setFields(fields)
-
-                for name in fields.names():
-                    if name == "kumoy_id":
-                        qgsfeature["kumoy_id"] = feature["kumoy_id"]
-                    else:
-                        qgsfeature[name] = feature["properties"][name]
-
-                # Set feature ID and validity
-                qgsfeature.setValid(True)
-                vlayer.addFeature(qgsfeature)
+        spatial_index.ensure_spatial_index(cache_file)
+        return updated_at
+
+    # 削除された行と更新された行をまとめて削除し、更新された行を新たなレコードとして追加する
+    # memo: 1つのトランザクションで行うので、途中で失敗してもキャッシュは元の状態のまま
+    with GpkgBulkWriter(cache_file, fields, relax_durability=False) as bulk_writer:
+        bulk_writer.delete(should_deleted_fids)
+        if progress_callback is not None:
+            progress_callback(len(diff["deletedRows"]))
+        for feature in diff["updatedRows"]:
+            if _is_canceled(feedback):
+                # memo: 例外でトランザクションがロールバックされ、キャッシュは元の状態のまま
+                raise SyncCancelledError()
+            bulk_writer.add(feature)
+            if progress_callback is not None:
+                progress_callback(len(diff["deletedRows"]) + bulk_writer.written)
+
+    # 大きな差分の後は空間インデックスが地物と一致しているか照合する
+    spatial_index.ensure_spatial_index(
+        cache_file, verify=len(should_deleted_fids) >= spatial_index.LARGE_DIFF_ROWS
+    )
 
-    vlayer.commitChanges()
     return updated_at
 
 
@@ -195,38 +300,110 @@ def sync_local_cache(
     fields: QgsFields,
     geometry_type: QgsWkbTypes.GeometryType,
     progress_callback: Optional[Callable[[int], None]] = None,
+    throttle: Optional[Callable[[int], None]] = None,
+    feedback: Optional[QgsFeedback] = None,
+    yield_to_foreground: bool = False,
 ):
     """
     サーバー上のデータとローカルのキャッシュを同期する
     - キャッシュはGPKGを用いる
     - ローカルにGPKGが存在しなければ新規で作成する
     - この関数の実行時、サーバー上のデータとの差分を取得してローカルのキャッシュを更新する
+    - 同期の結果はマニフェストに記録する
+    - 同じベクターの同期が実行中なら終わるまで待つ（待っている間も feedback でキャンセルできる）
+    - throttle はキャッシュの新規作成時に地物のページを受信するたびに受信バイト数を渡して呼び出す
+    - feedback がキャンセルされたら、送信中のリクエストを中断し、ファイルを閉じてから
+      SyncCancelledError を投げる（作成途中のキャッシュは次回の同期で再開される）
+    - yield_to_foreground がTrueなら、同じベクターの他の同期が待っているときに
+      feedback をキャンセルしてロックを譲る（バックグラウンドの同期用）
     """
+    lock = _sync_lock(vector_id)
+    _acquire_sync_lock(vector_id, lock, feedback)
+    if yield_to_foreground and feedback is not None:
+        with _sync_locks_lock:
+            _yielding_feedbacks[vector_id] = feedback
+    try:
+        with request_feedback(feedback):
+            _sync_local_cache(
+                vector_id, fields, geometry_type, progress_callback, throttle, feedback
+            )
+    except SyncCancelledError:
+        raise
+    except Exception as e:
+        # memo: 中断されたリクエストのエラーはキャンセルとして扱う
+        if _is_canceled(feedback):
+            raise SyncCancelledError() from e
+        raise
+    finally:
+        if yield_to_foreground:
+            with _sync_locks_lock:
+                _yielding_feedbacks.pop(vector_id, None)
+        lock.release()
+
+
+def _acquire_sync_lock(
+    vector_id: str, lock: threading.Lock, feedback: Optional[QgsFeedback]
+) -> None:
+    """Wait for the sync lock of a vector, giving up when feedback is canceled.
+    A background sync holding the lock is asked to yield."""
+    # memo: 他の同期（バックグラウンドでの作成など）の終了を待つ間もキャンセルできるようにする
+    while not lock.acquire(timeout=LOCK_POLL_SECONDS):
+        with _sync_locks_lock:
+            yielding = _yielding_feedbacks.get(vector_id)
+        if yielding is not None and yielding is not feedback:
+            # memo: 帯域を制限した事前作成の終了を待たせない。作成途中のキャッシュは引き継がれる
+            yielding.cancel()
+        if _is_canceled(feedback):
+            raise SyncCancelledError()
+
+
+def _sync_local_cache(
+    vector_id: str,
+    fields: QgsFields,
+    geometry_type: QgsWkbTypes.GeometryType,
+    progress_callback: Optional[Callable[[int], None]] = None,
+    throttle: Optional[Callable[[int], None]] = None,
+    feedback: Optional[QgsFeedback] = None,
+):
+    started = time.perf_counter()
     cache_dir = _get_cache_dir()
     cache_file = os.path.join(cache_dir, f"{vector_id}.gpkg")
-
-    last_updated = get_last_updated(vector_id)
-    if last_updated is None and os.path.exists(cache_file):
-        # キャッシュファイルが存在するが、最終更新日時が設定されていない場合
+    current_schema_hash = manifest.schema_hash(fields, geometry_type)
+
+    # memo: マニフェストのエントリはキャッシュファイルの完成後にのみ書き込まれるので、
+    # エントリの有無でキャッシュの有無を判断できる
+    entry = manifest.get_entry(vector_id)
+    if entry is not None and (
+        entry.format_version != manifest.CACHE_FORMAT_VERSION
+        or entry.last_updated is None
+        or not os.path.exists(cache_file)
+    ):
+        # 古い形式のキャッシュ、または不整合が生じているので作り直す
+        QgsMessageLog.logMessage(
+            f"Cache of vector {vector_id} is outdated or inconsistent, recreating cache file.",
+            LOG_CATEGORY,
+            Qgis.Info,
+        )
+        clear(vector_id)
+        entry = None
+    if entry is None and os.path.exists(cache_file):
+        # キャッシュファイルが存在するが、マニフェストに記録されていない場合
         # 不整合が生じているので既存ファイルを削除する
         clear(vector_id)
-    if last_updated is not None and not os.path.exists(cache_file):
-        # キャッシュファイルが存在しないが、最終更新日時が設定されている場合
-        # 不整合が生じているので最終更新日時を削除する
-        delete_last_updated(vector_id)
-        last_updated = None
-
-    if os.path.exists(cache_file):
-        # 既存キャッシュファイルを更新（ファイルが存在するのでlast_updatedはNoneではないはず）
-        if last_updated is None:
-            raise Exception(
-                "Inconsistent state: cache file exists but last_updated is None"
-            )
+
+    if entry is not None:
         try:
             # memo: この処理は失敗しうる（e.g. 差分が大きすぎる場合）
-            diff = api.qgis_vector.get_diff(vector_id, last_updated)
+            diff = api.qgis_vector.get_diff(vector_id, entry.last_updated)
             # 差分取得でエラーがなかった場合は、得られた差分をキャッシュに適用する
-            updated_at = _update_existing_cache(cache_file, fields, diff)
+            updated_at = _update_existing_cache(
+                cache_file,
+                fields,
+                diff,
+                progress_callback=progress_callback,
+                schema_changed=entry.schema_hash != current_schema_hash,
+                feedback=feedback,
+            )
         except api.error.AppError as e:
             if e.error == "MAX_DIFF_COUNT_EXCEEDED":
                 # 差分が大きすぎる場合はキャッシュファイルを削除して新規作成する
@@ -242,6 +419,8 @@ def sync_local_cache(
                     fields,
                     geometry_type,
                     progress_callback=progress_callback,
+                    throttle=throttle,
+                    feedback=feedback,
                 )
             else:
                 raise e
@@ -253,9 +432,83 @@ def sync_local_cache(
             fields,
             geometry_type,
             progress_callback=progress_callback,
+            throttle=throttle,
+            feedback=feedback,
         )
 
-    store_last_updated(vector_id, updated_at)
+    _record_sync(vector_id, cache_file, current_schema_hash, updated_at, started)
+
+
+def sync_diff(
+    vector_id: str,
+    fields: QgsFields,
+    geometry_type: QgsWkbTypes.GeometryType,
+) -> Optional[int]:
+    """
+    サーバー上の差分だけを既存のキャッシュに適用する（定期的な同期用）
+
+    キャッシュの作成・作り直しが必要な場合や、同じベクターの同期が実行中の場合は何もしない
+    （レイヤーを開き直すか手動の同期で行う）
+
+    Returns:
+        変更された地物数。差分を適用しなかった場合はNone
+    """
+    lock = _sync_lock(vector_id)
+    if not lock.acquire(blocking=False):
+        return None
+    try:
+        started = time.perf_counter()
+        cache_file = os.path.join(_get_cache_dir(), f"{vector_id}.gpkg")
+        current_schema_hash = manifest.schema_hash(fields, geometry_type)
+
+        entry = manifest.get_entry(vector_id)
+        if (
+            entry is None
+            or entry.format_version != manifest.CACHE_FORMAT_VERSION
+            or entry.last_updated is None
+            or entry.schema_hash != current_schema_hash
+            or not os.path.exists(cache_file)
+        ):
+            return None
+
+        try:
+            diff = api.qgis_vector.get_diff(vector_id, entry.last_updated)
+        except api.error.AppError as e:
+            if e.error == "MAX_DIFF_COUNT_EXCEEDED":
+                return None
+            raise e
+
+        updated_at = _update_existing_cache(
+            cache_file, fields, diff, schema_changed=False
+        )
+        _record_sync(vector_id, cache_file, current_schema_hash, updated_at, started)
+        return len(diff["deletedRows"]) + len(diff["updatedRows"])
+    finally:
+        lock.release()
+
+
+def _record_sync(
+    vector_id: str,
+    cache_file: str,
+    schema_hash: str,
+    updated_at: str,
+    started: float,
+) -> None:
+    manifest.record_sync(
+        vector_id,
+        schema_hash=schema_hash,
+        feature_count=_feature_count(cache_file),
+        byte_size=os.path.getsize(cache_file),
+        last_updated=updated_at,
+        sync_seconds=time.perf_counter() - started,
+    )
+
+
+def _feature_count(cache_file: str) -> int:
+    dataset = ogr.Open(cache_file, 0)
+    if dataset is None:
+        return 0
+    return dataset.GetLayer(0).GetFeatureCount()
 
 
 def get_layer(vector_id: str) -> QgsVectorLayer:
@@ -266,6 +519,7 @@ def get_layer(vector_id: str) -> QgsVectorLayer:
     layer = QgsVectorLayer(cache_file, "cache", "ogr")
 
     if layer.isValid():
+        manifest.touch(vector_id)
         return layer
     else:
         QgsMessageLog.logMessage(
@@ -274,6 +528,22 @@ def get_layer(vector_id: str) -> QgsVectorLayer:
         return None
 
 
+def has_spatial_index(vector_id: str) -> bool:
+    """Whether the cache of a vector has a spatial index"""
+    cache_file = os.path.join(_get_cache_dir(), f"{vector_id}.gpkg")
+    if not os.path.exists(cache_file):
+        return False
+    try:
+        return spatial_index.has_spatial_index(cache_file)
+    except Exception as e:
+        QgsMessageLog.logMessage(
+            f"Error checking spatial index of {vector_id}: {e}",
+            LOG_CATEGORY,
+            Qgis.Info,
+        )
+        return False
+
+
 def clear_all() -> bool:
     """Clear all cached GPKG files. Returns True if all files were deleted successfully."""
 
@@ -282,12 +552,14 @@ def clear_all() -> bool:
 
     # Remove all files in cache directory
     for filename in os.listdir(cache_dir):
+        if manifest.is_manifest_file(filename):
+            continue
         file_path = os.path.join(cache_dir, filename)
         try:
             os.unlink(file_path)
             if filename.endswith(".gpkg"):
-                project_id = filename.split(".gpkg")[0]
-                delete_last_updated(project_id)
+                vector_id = filename.split(".gpkg")[0]
+                manifest.delete_entry(vector_id)
         except PermissionError as e:
             # Ignore Permission denied error and continue
             QgsMessageLog.logMessage(
@@ -317,7 +589,20 @@ def clear(vector_id: str) -> bool:
     gpkg_wal_file = f"{cache_file}-wal"
     gpkg_journal_file = f"{cache_file}-journal"
 
-    files_to_remove = [cache_file, gpkg_shm_file, gpkg_wal_file, gpkg_journal_file]
+    part_file = _part_file(cache_file)
+
+    files_to_remove = [
+        cache_file,
+        gpkg_shm_file,
+        gpkg_wal_file,
+        gpkg_journal_file,
+        # 作成途中のキャッシュ
+        part_file,
+        f"{part_file}-wal",
+        f"{part_file}-shm",
+        f"{part_file}-journal",
+        f"{part_file}.json",
+    ]
     success = True
 
     # Remove cache file if it exists
@@ -337,7 +622,7 @@ def clear(vector_id: str) -> bool:
                     Qgis.Critical,
                 )
                 success = False
-    # Delete last updated timestamp
-    delete_last_updated(vector_id)
+    # Delete the manifest entry
+    manifest.delete_entry(vector_id)
 
     return success
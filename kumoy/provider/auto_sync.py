@@ -0,0 +1,236 @@
+"""
+読み込まれているKumoyレイヤーの定期的な差分の同期
+
+一定間隔（sync_interval_sec）ごとに、開いているKumoyレイヤーのキャッシュに
+サーバー上の差分（get_diff）をバックグラウンド（QgsTask）で適用する。
+既定では無効で、メニューの "Auto Sync Interval" で間隔を設定すると有効になる。
+- 変更があったレイヤーだけキャッシュを開き直して再描画する
+- 変更がなかった・失敗した場合は間隔を倍にしていく（最大でMAX_BACKOFF倍）
+- 非表示のレイヤーは最大の間隔で同期する
+- 編集中のレイヤーは同期しない（手動の同期と同じ）
+- 同期中に編集が始まったレイヤーは、編集の終了後にキャッシュを開き直す
+- キャッシュの作り直しが必要な場合はレイヤーを開き直すか手動で同期する
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Set
+
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsFields,
+    QgsMessageLog,
+    QgsProject,
+    QgsTask,
+    QgsVectorLayer,
+    QgsWkbTypes,
+)
+from qgis.PyQt.QtCore import QObject, QTimer
+
+from ... import settings_manager
+from .. import local_cache
+from ..api.error import format_api_error
+from ..constants import DATA_PROVIDER_KEY, LOG_CATEGORY
+
+# 同期が必要なレイヤーを確認する間隔
+TICK_SECONDS = 15
+
+# 変更がないレイヤーの同期間隔の上限（設定の間隔の倍数）
+MAX_BACKOFF = 8
+
+
+def next_interval(
+    base: float, previous: float, changed: bool, visible: bool = True
+) -> float:
+    """Interval until the next sync of a layer: the base interval after a
+    change, doubled after an unchanged or failed sync, and the longest
+    interval for hidden layers"""
+    longest = base * MAX_BACKOFF
+    if not visible:
+        return longest
+    if changed:
+        return base
+    return min(max(previous * 2, base), longest)
+
+
+def get_interval_seconds() -> int:
+    """Sync interval from the settings in seconds; 0 disables the sync"""
+    try:
+        return max(0, int(settings_manager.get_settings().sync_interval_sec))
+    except ValueError:
+        return 0
+
+
+@dataclass
+class _SyncState:
+    interval: float
+    next_due: float
+
+
+class DiffSyncTask(QgsTask):
+    """Apply the server diff to the cache of a vector"""
+
+    def __init__(
+        self,
+        vector_id: str,
+        fields: QgsFields,
+        wkb_type: QgsWkbTypes.Type,
+        on_finished: Callable[["DiffSyncTask", bool], None],
+    ):
+        # memo: 定期的な処理なのでタスクマネージャーに通知を出さない
+        super().__init__(f"Kumoy: sync {vector_id}", QgsTask.Silent)
+        self.vector_id = vector_id
+        self.fields = fields
+        self.wkb_type = wkb_type
+        self.on_finished = on_finished
+        self.changed: Optional[int] = None
+        self.error: Optional[str] = None
+
+    def run(self) -> bool:
+        try:
+            self.changed = local_cache.vector.sync_diff(
+                self.vector_id, self.fields, self.wkb_type
+            )
+        except Exception as e:
+            self.error = format_api_error(e)
+            return False
+        return True
+
+    def finished(self, result: bool) -> None:
+        self.on_finished(self, result)
+
+
+class AutoSyncScheduler(QObject):
+    """Periodically sync the caches of the loaded Kumoy layers in the background"""
+
+    def __init__(self, parent: Optional[QObject] = None):
+        super().__init__(parent)
+        self._states: Dict[str, _SyncState] = {}
+        self._tasks: Dict[str, DiffSyncTask] = {}
+        # 編集の終了後にキャッシュを開き直すレイヤーのID
+        self._deferred_reloads: Set[str] = set()
+        self._running = False
+        self._timer = QTimer(self)
+        self._timer.setInterval(TICK_SECONDS * 1000)
+        self._timer.timeout.connect(self._on_tick)
+
+    def start(self) -> None:
+        self._running = True
+        self._timer.start()
+
+    def stop(self) -> None:
+        self._running = False
+        self._timer.stop()
+        # memo: 実行中のタスクは完了させるが、結果は反映しない
+        self._tasks.clear()
+        self._states.clear()
+
+    def _kumoy_layers(self) -> Dict[str, List[QgsVectorLayer]]:
+        layers: Dict[str, List[QgsVectorLayer]] = {}
+        for layer in QgsProject.instance().mapLayers().values():
+            if not isinstance(layer, QgsVectorLayer) or not layer.isValid():
+                continue
+            provider = layer.dataProvider()
+            if provider is None or provider.name() != DATA_PROVIDER_KEY:
+                continue
+            layers.setdefault(provider.vector_id, []).append(layer)
+        return layers
+
+    @staticmethod
+    def _is_visible(layer: QgsVectorLayer) -> bool:
+        node = QgsProject.instance().layerTreeRoot().findLayer(layer.id())
+        return node is not None and node.isVisible()
+
+    def _on_tick(self) -> None:
+        base = get_interval_seconds()
+        if base == 0 or not settings_manager.get_settings().id_token:
+            return
+
+        now = time.monotonic()
+        layers_by_vector = self._kumoy_layers()
+
+        # 閉じられたレイヤーの状態を破棄する
+        for vector_id in list(self._states):
+            if vector_id not in layers_by_vector:
+                del self._states[vector_id]
+
+        for vector_id, layers in layers_by_vector.items():
+            if vector_id in self._tasks:
+                continue
+            if any(layer.isEditable() for layer in layers):
+                continue
+
+            state = self._states.get(vector_id)
+            if state is None:
+                # memo: レイヤーを開いた時点で同期されているので、次の間隔から同期する
+                self._states[vector_id] = _SyncState(base, now + base)
+                continue
+            if now < state.next_due:
+                continue
+
+            provider = layers[0].dataProvider()
+            task = DiffSyncTask(
+                vector_id, provider.fields(), provider.wkbType(), self._on_finished
+            )
+            self._tasks[vector_id] = task
+            QgsApplication.taskManager().addTask(task)
+
+    def _on_finished(self, task: DiffSyncTask, result: bool) -> None:
+        if self._tasks.get(task.vector_id) is not task:
+            # 停止後に完了したタスク
+            return
+        del self._tasks[task.vector_id]
+
+        if not result:
+            QgsMessageLog.logMessage(
+                f"Background sync of {task.vector_id} failed: {task.error}",
+                LOG_CATEGORY,
+                Qgis.Warning,
+            )
+
+        layers = self._kumoy_layers().get(task.vector_id, [])
+        changed = bool(result and task.changed)
+        if changed:
+            for layer in layers:
+                if layer.isEditable():
+                    # memo: 同期中に編集が始まった。編集バッファの下でキャッシュを開き直さない
+                    self._reload_after_editing(layer)
+                    continue
+                self._reload(layer)
+            QgsMessageLog.logMessage(
+                f"Background sync applied {task.changed} changes to {task.vector_id}.",
+                LOG_CATEGORY,
+                Qgis.Info,
+            )
+
+        state = self._states.get(task.vector_id)
+        if state is None:
+            return
+        visible = any(self._is_visible(layer) for layer in layers)
+        state.interval = next_interval(
+            get_interval_seconds() or state.interval, state.interval, changed, visible
+        )
+        state.next_due = time.monotonic() + state.interval
+
+    @staticmethod
+    def _reload(layer: QgsVectorLayer) -> None:
+        provider = layer.dataProvider()
+        provider.reload_cache()
+        if provider.cached_layer is not None:
+            provider.kumoy_vector.count = provider.cached_layer.featureCount()
+        layer.triggerRepaint()
+
+    def _reload_after_editing(self, layer: QgsVectorLayer) -> None:
+        layer_id = layer.id()
+        if layer_id in self._deferred_reloads:
+            return
+        self._deferred_reloads.add(layer_id)
+
+        def on_editing_stopped():
+            layer.editingStopped.disconnect(on_editing_stopped)
+            self._deferred_reloads.discard(layer_id)
+            if self._running:
+                self._reload(layer)
+
+        layer.editingStopped.connect(on_editing_stopped)
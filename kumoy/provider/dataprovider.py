@@ -8,6 +8,8 @@ from qgis.core import (
     QgsFeature,
     QgsFeatureIterator,
     QgsFeatureRequest,
+    QgsFeatureSource,
+    QgsFeedback,
     QgsField,
     QgsFields,
     QgsGeometry,
@@ -30,13 +32,10 @@ from qgis.utils import iface
 from ...pyqt_version import QT_APPLICATION_MODAL, exec_event_loop
 from .. import api, constants, local_cache
 from ..api.error import format_api_error
+from ..local_cache.eviction import schedule_eviction
 from .feature_iterator import KumoyFeatureIterator
 from .feature_source import KumoyFeatureSource
 
-ADD_MAX_FEATURE_COUNT = 1000
-UPDATE_MAX_FEATURE_COUNT = 1000
-DELETE_MAX_FEATURE_COUNT = 1000
-
 
 class SyncWorker(QThread):
     """Worker thread for sync_local_cache operation"""
@@ -51,6 +50,11 @@ class SyncWorker(QThread):
         self.fields = fields
         self.wkb_type = wkb_type
         self.total_features = max(self.vector.count, 1)
+        self.feedback = QgsFeedback()
+
+    def cancel(self):
+        """Ask the sync to stop; run() returns after closing the cache files"""
+        self.feedback.cancel()
 
     def run(self):
         try:
@@ -64,7 +68,10 @@ class SyncWorker(QThread):
                 self.fields,
                 self.wkb_type,
                 progress_callback=on_progress_update,
+                feedback=self.feedback,
             )
+        except local_cache.vector.SyncCancelledError:
+            pass
         except Exception as e:
             self.error.emit(format_api_error(e))
 
@@ -90,6 +97,44 @@ def parse_uri(
     return (project_id, vector_id, vector_name)
 
 
+def vector_fields(kumoy_vector: api.vector.KumoyVectorDetail) -> QgsFields:
+    """Fields of a Kumoy vector (also the columns of its local cache)"""
+    fs = QgsFields()
+    fs.append(QgsField("kumoy_id", QVariant.LongLong))
+    for column in kumoy_vector.columns:
+        k = column["name"]
+        v = column["type"]
+
+        len = 0
+        if v == "string":
+            data_type = QVariant.String
+            len = constants.MAX_CHARACTERS_STRING_FIELD
+        elif v == "integer":
+            data_type = QVariant.LongLong
+        elif v == "float":
+            data_type = QVariant.Double
+        else:
+            data_type = QVariant.Bool
+
+        f = QgsField(k, data_type)
+        if len > 0:
+            f.setLength(len)
+        fs.append(f)
+
+    return fs
+
+
+def vector_wkb_type(kumoy_vector: api.vector.KumoyVector) -> QgsWkbTypes:
+    if kumoy_vector.type == "POINT":
+        return QgsWkbTypes.Point
+    elif kumoy_vector.type == "LINESTRING":
+        return QgsWkbTypes.LineString
+    elif kumoy_vector.type == "POLYGON":
+        return QgsWkbTypes.Polygon
+    else:
+        return QgsWkbTypes.Unknown
+
+
 class KumoyDataProvider(QgsVectorDataProvider):
     def __init__(
         self,
@@ -111,15 +156,22 @@ class KumoyDataProvider(QgsVectorDataProvider):
 
         # local cache
         self.kumoy_vector: Optional[api.vector.KumoyVectorDetail] = None
+        self._has_spatial_index = False
         self._reload_vector()
 
         if self.kumoy_vector is None:
             return
 
         self.cached_layer = local_cache.vector.get_layer(self.kumoy_vector.id)
+        self._has_spatial_index = local_cache.vector.has_spatial_index(
+            self.kumoy_vector.id
+        )
 
         self._is_valid = True
 
+        # キャッシュが増えたので、容量を超えていれば使われていないキャッシュを削除する
+        schedule_eviction()
+
         # Set native types based on PostgreSQL data type constraints
         self.setNativeTypes(
             [
@@ -231,10 +283,12 @@ class KumoyDataProvider(QgsVectorDataProvider):
         def on_progress_cancelled():
             nonlocal sync_cancelled
             sync_cancelled = True
-            if sync_worker.isRunning():
-                sync_worker.terminate()
-                sync_worker.wait()
-            loop.quit()
+            # memo: terminate()するとキャッシュのファイルとロックが開いたまま残るので、
+            # 同期の終了（finished）を待ってからループを抜ける
+            progress.setLabelText(self.tr("Cancelling..."))
+            sync_worker.cancel()
+            if not sync_worker.isRunning():
+                loop.quit()
 
         def on_worker_progress(percent):
             progress.setValue(percent)
@@ -270,12 +324,20 @@ class KumoyDataProvider(QgsVectorDataProvider):
                 level=Qgis.Warning,
             )
 
+        self.reload_cache()
+
+    def reload_cache(self):
+        """Reopen the local cache after it has been updated
+        (by _reload_vector or by a background sync)"""
         # Delete existing cached_layer before reloading
         if hasattr(self, "cached_layer") and self.cached_layer is not None:
             # Force closing connection with GPKG file
             del self.cached_layer
 
         self.cached_layer = local_cache.vector.get_layer(self.kumoy_vector.id)
+        self._has_spatial_index = local_cache.vector.has_spatial_index(
+            self.kumoy_vector.id
+        )
 
         self.clearMinMaxCache()
 
@@ -297,14 +359,7 @@ class KumoyDataProvider(QgsVectorDataProvider):
     def wkbType(self) -> QgsWkbTypes:
         if self.kumoy_vector is None:
             return QgsWkbTypes.Unknown
-        if self.kumoy_vector.type == "POINT":
-            return QgsWkbTypes.Point
-        elif self.kumoy_vector.type == "LINESTRING":
-            return QgsWkbTypes.LineString
-        elif self.kumoy_vector.type == "POLYGON":
-            return QgsWkbTypes.Polygon
-        else:
-            return QgsWkbTypes.Unknown
+        return vector_wkb_type(self.kumoy_vector)
 
     def name(self) -> str:
         """Return the name of provider
@@ -321,31 +376,11 @@ class KumoyDataProvider(QgsVectorDataProvider):
         return self.kumoy_vector.count
 
     def fields(self) -> QgsFields:
-        fs = QgsFields()
-        fs.append(QgsField("kumoy_id", QVariant.LongLong))
         if self.kumoy_vector is None:
+            fs = QgsFields()
+            fs.append(QgsField("kumoy_id", QVariant.LongLong))
             return fs
-        for column in self.kumoy_vector.columns:
-            k = column["name"]
-            v = column["type"]
-
-            len = 0
-            if v == "string":
-                data_type = QVariant.String
-                len = constants.MAX_CHARACTERS_STRING_FIELD
-            elif v == "integer":
-                data_type = QVariant.LongLong
-            elif v == "float":
-                data_type = QVariant.Double
-            else:
-                data_type = QVariant.Bool
-
-            f = QgsField(k, data_type)
-            if len > 0:
-                f.setLength(len)
-            fs.append(f)
-
-        return fs
+        return vector_fields(self.kumoy_vector)
 
     def extent(self) -> QgsRectangle:
         if self.kumoy_vector is None:
@@ -370,6 +405,12 @@ class KumoyDataProvider(QgsVectorDataProvider):
     def crs(self) -> QgsCoordinateReferenceSystem:
         return self._crs
 
+    def hasSpatialIndex(self) -> QgsFeatureSource.SpatialIndexPresence:
+        # memo: 範囲指定の読み込みはキャッシュのR-treeを使う
+        if self._has_spatial_index:
+            return QgsFeatureSource.SpatialIndexPresent
+        return QgsFeatureSource.SpatialIndexNotPresent
+
     def supportsSubsetString(self) -> bool:
         return False
 
@@ -403,13 +444,17 @@ class KumoyDataProvider(QgsVectorDataProvider):
         )
 
     def deleteFeatures(self, kumoy_ids: list[int]) -> bool:
-        # Process in chunks of 1000 to avoid server limits
-        for i in range(0, len(kumoy_ids), DELETE_MAX_FEATURE_COUNT):
-            chunk = kumoy_ids[i : i + DELETE_MAX_FEATURE_COUNT]
-            try:
-                api.qgis_vector.delete_features(self.kumoy_vector.id, chunk)
-            except Exception:
-                return False
+        # サーバーの制限を超えないよう分割してリクエストする
+        try:
+            api.batching.get_batcher("delete_features").run(
+                kumoy_ids,
+                api.batching.kumoy_id_size,
+                lambda chunk: api.qgis_vector.delete_features(
+                    self.kumoy_vector.id, chunk
+                ),
+            )
+        except Exception:
+            return False
         self._reload_vector()
         return True
 
@@ -427,13 +472,20 @@ class KumoyDataProvider(QgsVectorDataProvider):
             # 何もせず終了
             return True, []
 
-        # 地物追加APIには地物数制限があるので、それを上回らないよう分割リクエストする
-        for i in range(0, len(features), ADD_MAX_FEATURE_COUNT):
-            sliced = candidates[i : i + ADD_MAX_FEATURE_COUNT]
+        # 地物追加APIには地物数・サイズの制限があるので、それを上回らないよう分割リクエストする
+        batcher = api.batching.get_batcher("add_features")
+        added = 0
+        for sliced in batcher.batches(candidates, api.batching.feature_size):
             try:
-                api.qgis_vector.add_features(self.kumoy_vector.id, sliced)
+                batcher.send(
+                    sliced,
+                    lambda batch: api.qgis_vector.add_features(
+                        self.kumoy_vector.id, batch
+                    ),
+                )
             except Exception:
-                return False, candidates[0:i]
+                return False, candidates[0:added]
+            added += len(sliced)
 
         # reload
         self._reload_vector()
@@ -465,16 +517,17 @@ class KumoyDataProvider(QgsVectorDataProvider):
         if not attribute_items:
             return True
 
-        # Process in chunks of 1000 to avoid server limits
-        total_items = len(attribute_items)
-        for i in range(0, total_items, UPDATE_MAX_FEATURE_COUNT):
-            chunk = attribute_items[i : i + UPDATE_MAX_FEATURE_COUNT]
-            try:
-                api.qgis_vector.change_attribute_values(
+        # サーバーの制限を超えないよう分割してリクエストする
+        try:
+            api.batching.get_batcher("change_attribute_values").run(
+                attribute_items,
+                api.batching.attribute_item_size,
+                lambda chunk: api.qgis_vector.change_attribute_values(
                     vector_id=self.kumoy_vector.id, attribute_items=chunk
-                )
-            except Exception:
-                return False
+                ),
+            )
+        except Exception:
+            return False
 
         self._reload_vector()
         return True
@@ -485,15 +538,17 @@ class KumoyDataProvider(QgsVectorDataProvider):
             for feature_id, geometry in geometry_map.items()
         ]
 
-        # Process in chunks of 1000 to avoid server limits
-        for i in range(0, len(geometry_items), UPDATE_MAX_FEATURE_COUNT):
-            chunk = geometry_items[i : i + UPDATE_MAX_FEATURE_COUNT]
-            try:
-                api.qgis_vector.change_geometry_values(
+        # サーバーの制限を超えないよう分割してリクエストする
+        try:
+            api.batching.get_batcher("change_geometry_values").run(
+                geometry_items,
+                api.batching.geometry_item_size,
+                lambda chunk: api.qgis_vector.change_geometry_values(
                     vector_id=self.kumoy_vector.id, geometry_items=chunk
-                )
-            except Exception:
-                return False
+                ),
+            )
+        except Exception:
+            return False
 
         self._reload_vector()
         return True
@@ -0,0 +1,338 @@
+"""
+プロジェクトのベクターのキャッシュの事前作成（プリウォーム）
+
+プロジェクトの選択時・起動時に、プロジェクトの全ベクターのキャッシュを
+バックグラウンド（QgsTask）で同期しておき、後でレイヤーを開いたときの全件取得を省く。
+設定（prewarm_caches）で有効にした場合のみ行う。
+- ベクターの情報はMETADATA_CONCURRENCY件ずつ並行して取得する
+- 地物数の少ないベクターから同期する（多くのレイヤーを早く使えるようにする）
+- PREWARM_MAX_FEATURES件を超えるベクターは、開かれたときに同期する
+- 開いているレイヤーのベクターは同期しない（レイヤーを開いたときに同期されている）
+- 同時に同期するベクターはPREWARM_CONCURRENCY個まで
+- 地物の受信はPREWARM_BANDWIDTH（バイト/秒）に制限する（全ベクターの合計）
+- 既存のキャッシュの地物あたりのサイズから見積もって、容量の上限（cache_quota_mb）を
+  超えるなら同期を始めずに終了する。作成中に上限を超えた場合も中断して終了する
+- キャンセルされた作成途中のキャッシュは、次回の同期で続きから再開される
+- 同期中のベクターのレイヤーが開かれたら、そのベクターの同期を中断してレイヤー側の同期に譲る
+- 同期の完了後、その間に開かれたレイヤーはキャッシュを開き直す
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+from qgis.core import (
+    Qgis,
+    QgsApplication,
+    QgsFeedback,
+    QgsMessageLog,
+    QgsProject,
+    QgsTask,
+)
+
+from ... import settings_manager
+from .. import api, local_cache
+from ..api.client import request_feedback
+from ..api.error import format_api_error
+from ..constants import DATA_PROVIDER_KEY, LOG_CATEGORY
+from ..local_cache import manifest
+from ..local_cache.eviction import get_quota_bytes, open_vector_ids, update_open_vectors
+from ..local_cache.vector import SyncCancelledError
+from .dataprovider import vector_fields, vector_wkb_type
+
+# 同時に同期するベクター数
+PREWARM_CONCURRENCY = 2
+
+# 地物の受信の帯域の上限（バイト/秒）
+PREWARM_BANDWIDTH = 4 * 1024 * 1024
+
+# この地物数を超えるベクターは事前に同期しない
+PREWARM_MAX_FEATURES = 1_000_000
+
+# ベクターの情報を並行して取得する数
+METADATA_CONCURRENCY = 4
+
+# キャッシュがまだない場合の地物あたりのキャッシュのサイズの見積もり（バイト）
+DEFAULT_BYTES_PER_FEATURE = 512
+
+# 作成中のキャッシュのサイズを確認する間隔（地物数）
+QUOTA_CHECK_FEATURES = 10000
+
+
+class BandwidthLimiter:
+    """Thread-safe limit on the average rate of received bytes
+
+    consume() is called after receiving data and sleeps long enough to keep
+    the total rate of all threads under bytes_per_second."""
+
+    def __init__(self, bytes_per_second: float):
+        self.bytes_per_second = bytes_per_second
+        self._lock = threading.Lock()
+        self._available_at = 0.0
+        self._stop = threading.Event()
+
+    def reserve(self, nbytes: int, now: Optional[float] = None) -> float:
+        """Account for nbytes and return the seconds to wait"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._available_at = (
+                max(self._available_at, now) + nbytes / self.bytes_per_second
+            )
+            return self._available_at - now
+
+    def consume(self, nbytes: int) -> None:
+        delay = self.reserve(nbytes)
+        if delay > 0:
+            # memo: stop()されたら待たずに戻る
+            self._stop.wait(delay)
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+def _cached_bytes() -> int:
+    return sum(entry.byte_size for entry in manifest.entries())
+
+
+def bytes_per_feature(entries: Iterable[manifest.CacheEntry]) -> float:
+    """Average cache size per feature of the existing caches"""
+    entries = list(entries)
+    feature_count = sum(entry.feature_count for entry in entries)
+    if feature_count == 0:
+        return DEFAULT_BYTES_PER_FEATURE
+    return sum(entry.byte_size for entry in entries) / feature_count
+
+
+class CachePrewarmTask(QgsTask):
+    """Sync the caches of all vectors in a project, smallest first"""
+
+    def __init__(self, project_id: str):
+        super().__init__("Kumoy: prepare project caches", QgsTask.CanCancel)
+        self.project_id = project_id
+        self.synced: List[str] = []
+        self.failed: List[str] = []
+        self.skipped = 0
+        self.skipped_open = 0
+        self.yielded = 0
+        self._limiter = BandwidthLimiter(PREWARM_BANDWIDTH)
+        # タスク全体のフィードバックと、同期中のベクターごとのフィードバック
+        self._feedback = QgsFeedback()
+        self._vector_feedbacks: Dict[str, QgsFeedback] = {}
+        self._lock = threading.Lock()
+        self._quota_reached = threading.Event()
+        # 同期中のベクターの見積もりサイズ（バイト）
+        self._reserved: Dict[str, float] = {}
+        self._bytes_per_feature = float(DEFAULT_BYTES_PER_FEATURE)
+        # memo: 開いているレイヤーの一覧はメインスレッドで更新する
+        update_open_vectors()
+
+    def cancel(self) -> None:
+        self._stop()
+        super().cancel()
+
+    def _stop(self) -> None:
+        # memo: 同期中のベクターはファイルを閉じてから終了する
+        self._limiter.stop()
+        self._feedback.cancel()
+        with self._lock:
+            feedbacks = list(self._vector_feedbacks.values())
+        for feedback in feedbacks:
+            feedback.cancel()
+
+    def _stopped(self) -> bool:
+        return self._feedback.isCanceled()
+
+    def _stop_for_quota(self) -> None:
+        # memo: 容量を超えると使われていないキャッシュが削除されるので、それ以上作らない
+        self._quota_reached.set()
+        self._stop()
+
+    def _get_vector(self, vector_id: str) -> api.vector.KumoyVectorDetail:
+        if self._stopped():
+            raise SyncCancelledError()
+        with request_feedback(self._feedback):
+            return api.vector.get_vector(vector_id)
+
+    def run(self) -> bool:
+        try:
+            vectors = api.vector.get_vectors(self.project_id)
+            with ThreadPoolExecutor(
+                max_workers=METADATA_CONCURRENCY,
+                thread_name_prefix="kumoy-prewarm-metadata",
+            ) as executor:
+                details = list(
+                    executor.map(self._get_vector, [vector.id for vector in vectors])
+                )
+        except Exception as e:
+            if self._stopped():
+                return False
+            QgsMessageLog.logMessage(
+                f"Error listing vectors to prepare caches: {format_api_error(e)}",
+                LOG_CATEGORY,
+                Qgis.Warning,
+            )
+            return False
+
+        targets = sorted(
+            (d for d in details if d.count <= PREWARM_MAX_FEATURES),
+            key=lambda d: d.count,
+        )
+        self.skipped = len(details) - len(targets)
+        if not targets:
+            return True
+        self._bytes_per_feature = bytes_per_feature(manifest.entries())
+
+        with ThreadPoolExecutor(
+            max_workers=PREWARM_CONCURRENCY, thread_name_prefix="kumoy-prewarm"
+        ) as executor:
+            for _ in executor.map(self._sync, targets):
+                with self._lock:
+                    done = len(self.synced) + len(self.failed)
+                self.setProgress(done / len(targets) * 100)
+        return not self.isCanceled()
+
+    def _reserve(self, vector: api.vector.KumoyVectorDetail) -> bool:
+        """Reserve the estimated cache size of a vector within the quota.
+        Returns False when it would not fit."""
+        quota_bytes = get_quota_bytes()
+        if not quota_bytes:
+            return True
+        estimate = vector.count * self._bytes_per_feature
+        entry = manifest.get_entry(vector.id)
+        if entry is not None:
+            # 既存のキャッシュのサイズは合計に含まれている
+            estimate = max(0.0, estimate - entry.byte_size)
+        with self._lock:
+            if _cached_bytes() + sum(self._reserved.values()) + estimate > quota_bytes:
+                return False
+            self._reserved[vector.id] = estimate
+        return True
+
+    def _sync(self, vector: api.vector.KumoyVectorDetail) -> None:
+        if self._stopped():
+            return
+        if vector.id in open_vector_ids():
+            # memo: 開いているレイヤーのキャッシュはレイヤー側で同期されている
+            with self._lock:
+                self.skipped_open += 1
+            return
+        if not self._reserve(vector):
+            self._stop_for_quota()
+            return
+
+        quota_bytes = get_quota_bytes()
+
+        def on_progress(processed_count: int) -> None:
+            if quota_bytes and processed_count % QUOTA_CHECK_FEATURES == 0:
+                # memo: 見積もりを超えて大きくなった場合も、作成中のサイズで上限を確認する
+                building = local_cache.vector.part_file_size(vector.id)
+                if _cached_bytes() + building > quota_bytes:
+                    self._stop_for_quota()
+
+        # memo: ベクターごとのフィードバックは、同じベクターのレイヤーが開かれたときに
+        # sync_local_cacheがキャンセルする（yield_to_foreground）
+        feedback = QgsFeedback()
+        with self._lock:
+            self._vector_feedbacks[vector.id] = feedback
+        if self._stopped():
+            feedback.cancel()
+
+        try:
+            local_cache.vector.sync_local_cache(
+                vector.id,
+                vector_fields(vector),
+                vector_wkb_type(vector),
+                progress_callback=on_progress,
+                throttle=self._limiter.consume,
+                feedback=feedback,
+                yield_to_foreground=True,
+            )
+        except SyncCancelledError:
+            # memo: 作成途中で中断すると、書き込み済みの地物は次回の同期で再利用される
+            if not self._stopped():
+                with self._lock:
+                    self.yielded += 1
+            return
+        except Exception as e:
+            QgsMessageLog.logMessage(
+                f"Error preparing cache of {vector.name}: {format_api_error(e)}",
+                LOG_CATEGORY,
+                Qgis.Warning,
+            )
+            with self._lock:
+                self.failed.append(vector.id)
+            return
+        finally:
+            with self._lock:
+                self._reserved.pop(vector.id, None)
+                self._vector_feedbacks.pop(vector.id, None)
+        with self._lock:
+            self.synced.append(vector.id)
+
+    def finished(self, result: bool) -> None:
+        # 同期中に開かれたレイヤーは、同期後のキャッシュを開き直す（編集中のレイヤーを除く）
+        synced = set(self.synced)
+        for layer in QgsProject.instance().mapLayers().values():
+            provider = layer.dataProvider()
+            if (
+                provider is not None
+                and provider.name() == DATA_PROVIDER_KEY
+                and provider.vector_id in synced
+                and not layer.isEditable()
+            ):
+                provider.reload_cache()
+                layer.triggerRepaint()
+
+        QgsMessageLog.logMessage(
+            "Prepared caches of {} vectors ({} failed, {} too large to prepare, "
+            "{} already open, {} left to opened layers{}).".format(
+                len(self.synced),
+                len(self.failed),
+                self.skipped,
+                self.skipped_open,
+                self.yielded,
+                ", cache size limit reached" if self._quota_reached.is_set() else "",
+            ),
+            LOG_CATEGORY,
+            Qgis.Info,
+        )
+
+
+_task: Optional[CachePrewarmTask] = None
+
+
+def is_prewarm_enabled() -> bool:
+    return settings_manager.get_settings().prewarm_caches == "true"
+
+
+def schedule_prewarm(project_id: str) -> None:
+    """Start preparing the caches of a project when enabled in the settings.
+    A job already running for another project is cancelled.
+    Must be called from the main thread."""
+    global _task
+    if not project_id or not is_prewarm_enabled():
+        return
+    if _task is not None:
+        try:
+            if _task.status() not in (QgsTask.Complete, QgsTask.Terminated):
+                if _task.project_id == project_id:
+                    return
+                _task.cancel()
+        except RuntimeError:
+            # memo: 終了したタスクのC++オブジェクトは削除されている
+            pass
+    _task = CachePrewarmTask(project_id)
+    QgsApplication.taskManager().addTask(_task)
+
+
+def cancel_prewarm() -> None:
+    global _task
+    if _task is None:
+        return
+    try:
+        if _task.status() not in (QgsTask.Complete, QgsTask.Terminated):
+            _task.cancel()
+    except RuntimeError:
+        pass
+    _task = None
@@ -1,8 +1,5 @@
-import json
 import os
-import urllib.request
 import webbrowser
-from urllib.error import HTTPError, URLError
 
 from qgis.core import (
     Qgis,
@@ -15,17 +12,20 @@ from qgis.core import (
 )
 from qgis.gui import QgisInterface
 from qgis.PyQt.QtCore import QCoreApplication, QTranslator
-from qgis.PyQt.QtWidgets import QAction, QMenu, QMessageBox
+from qgis.PyQt.QtWidgets import QAction, QInputDialog, QMenu, QMessageBox
 
 from .kumoy import api
-from .kumoy.api.error import format_api_error
 from .kumoy.constants import (
     DATA_PROVIDER_KEY,
     DOCUMENTATION_URL,
     LOG_CATEGORY,
     PLUGIN_NAME,
 )
+from .kumoy.get_token import cancel_scheduled_refresh
+from .kumoy.local_cache.eviction import schedule_eviction, update_open_vectors
 from .kumoy.local_cache.map import handle_project_saved
+from .kumoy.provider.auto_sync import AutoSyncScheduler
+from .kumoy.provider.prewarm import cancel_prewarm, schedule_prewarm
 from .kumoy.provider.dataprovider_metadata import KumoyProviderMetadata
 from .plugin_version import is_plugin_version_compatible, read_plugin_version
 from .processing.close_all_processing_dialogs import close_all_processing_dialogs
@@ -63,9 +63,16 @@ class KumoyPlugin:
 
         # Initialize menu actions
         self.reset_plugin_settings = None
+        self.cache_quota_action = None
+        self.sync_interval_action = None
+        self.prewarm_action = None
+        self.dump_metrics_action = None
         self.logout_action = None
         self.help_action = None
 
+        # Periodic background sync of loaded Kumoy layers
+        self.auto_sync = None
+
     def init_translation(self):
         """Initialize translation for the plugin"""
         locale = QgsApplication.instance().locale()
@@ -111,6 +118,7 @@ class KumoyPlugin:
 
             QgsProject.instance().clear()
             close_all_processing_dialogs()
+            cancel_prewarm()
             reset_settings()
 
             # Refresh browser panel
@@ -125,6 +133,75 @@ class KumoyPlugin:
                 self.tr("Plugin settings have been reset successfully."),
             )
 
+    def on_set_cache_quota(self):
+        """Handle cache size limit action"""
+        try:
+            current = int(get_settings().cache_quota_mb)
+        except ValueError:
+            current = 0
+        quota_mb, ok = QInputDialog.getInt(
+            self.win,
+            self.tr("Cache Size Limit"),
+            self.tr(
+                "Maximum size of the local cache in MB (0 = unlimited).\n"
+                "The least recently used caches of layers which are not open "
+                "are deleted when the limit is exceeded."
+            ),
+            current,
+            0,
+            1024 * 1024,
+            256,
+        )
+        if not ok:
+            return
+        store_setting("cache_quota_mb", str(quota_mb))
+        schedule_eviction()
+
+    def on_set_sync_interval(self):
+        """Handle auto sync interval action"""
+        try:
+            current = int(get_settings().sync_interval_sec)
+        except ValueError:
+            current = 0
+        interval_sec, ok = QInputDialog.getInt(
+            self.win,
+            self.tr("Auto Sync Interval"),
+            self.tr(
+                "Interval in seconds to fetch changes on the server for open "
+                "Kumoy layers (0 = disabled).\n"
+                "Layers without changes are synced less often."
+            ),
+            current,
+            0,
+            24 * 60 * 60,
+            30,
+        )
+        if not ok:
+            return
+        store_setting("sync_interval_sec", str(interval_sec))
+
+    def on_dump_metrics(self):
+        """Handle dump API metrics action"""
+        path = api.metrics.dump_metrics()
+        if path is None:
+            self.iface.messageBar().pushMessage(
+                PLUGIN_NAME, self.tr("No API requests recorded yet."), level=Qgis.Info
+            )
+            return
+        self.iface.messageBar().pushMessage(
+            PLUGIN_NAME,
+            self.tr("API metrics written to the log and {}").format(path),
+            level=Qgis.Info,
+        )
+
+    def on_toggle_prewarm(self, checked: bool):
+        """Handle prepare project caches action"""
+        store_setting("prewarm_caches", "true" if checked else "false")
+        if checked:
+            schedule_prewarm(get_settings().selected_project_id)
+        else:
+            cancel_prewarm()
+
     def on_logout(self):
         """Handle logout action"""
         if QgsProject.instance().isDirty():
@@ -145,6 +222,10 @@ class KumoyPlugin:
         QgsProject.instance().clear()
 
         close_all_processing_dialogs()
+        cancel_prewarm()
+
+        # Dump API request metrics of the session if enabled in the settings
+        api.metrics.dump_metrics_if_enabled()
 
         # Clear stored settings
         store_setting("id_token", "")
@@ -292,41 +373,35 @@ class KumoyPlugin:
             return
 
     def check_plugin_version(self):
-        """Check if the plugin version is compatible with the minimum required version"""
-        try:
-            api_config = api.config.get_api_config()
-            params_response = urllib.request.urlopen(
-                f"{api_config.SERVER_URL}/api/_public/params"
-            )
-            params_data = json.loads(params_response.read().decode("utf-8"))
-        except HTTPError as e:
-            error_body = e.read().decode("utf-8")
-            try:
-                error_data = json.loads(error_body)
-                error_message = error_data.get("error", format_api_error(e))
-            except Exception:
-                error_message = format_api_error(e)
-            QgsMessageLog.logMessage(
-                f"Error: {str(error_message)}", LOG_CATEGORY, Qgis.Critical
-            )
-            # Explicit server error
-            QMessageBox.critical(
-                None,
-                self.tr("Error"),
-                self.tr("Server error: {}").format(str(error_message)),
-            )
-            return
-        except URLError as e:
-            error_details = format_api_error(e)
+        """Check if the plugin version is compatible with the minimum required version.
+        The server parameters are fetched asynchronously so QGIS startup is not blocked."""
+        api.public_params.get_public_params_service().fetch_async(
+            self._on_public_params_fetched
+        )
+
+    def _on_public_params_fetched(self, params_data, error):
+        if error is not None:
+            if error.server_error:
+                QgsMessageLog.logMessage(
+                    f"Error: {error.message}", LOG_CATEGORY, Qgis.Critical
+                )
+                # Explicit server error
+                QMessageBox.critical(
+                    None,
+                    self.tr("Error"),
+                    self.tr("Server error: {}").format(error.message),
+                )
+                return
+
             QgsMessageLog.logMessage(
-                f"Network error: {str(error_details)}", LOG_CATEGORY, Qgis.Critical
+                f"Network error: {error.message}", LOG_CATEGORY, Qgis.Critical
             )
             # Explicit network error
             error_message = self.tr(
                 "Network connection error.\n"
                 "Please check your internet connection and server URL.\n\n"
                 "Details: {}"
-            ).format(error_details)
+            ).format(error.message)
 
             QMessageBox.critical(
                 None,
@@ -334,18 +409,6 @@ class KumoyPlugin:
                 error_message,
             )
             return
-        except Exception as e:
-            error_text = format_api_error(e)
-            QgsMessageLog.logMessage(
-                f"Error: {error_text}", LOG_CATEGORY, Qgis.Critical
-            )
-            # Explicit error
-            QMessageBox.critical(
-                None,
-                self.tr("Error"),
-                self.tr("An error occurred: {}").format(error_text),
-            )
-            return
 
         min_qgisplugin_version = params_data.get("minQgisPluginVersion")
         if min_qgisplugin_version is not None and not is_plugin_version_compatible(
@@ -406,6 +469,10 @@ class KumoyPlugin:
         )
         QgsProject.instance().layersAdded.connect(update_kumoy_indicator)
 
+        # Keep the caches of open layers from being evicted
+        QgsProject.instance().layersAdded.connect(update_open_vectors)
+        QgsProject.instance().layersRemoved.connect(update_open_vectors)
+
         # Add menu action for logout
         self.logout_action = QAction(self.tr("Logout"), self.win)
         self.logout_action.triggered.connect(self.on_logout)
@@ -416,6 +483,28 @@ class KumoyPlugin:
         self.reset_plugin_settings.triggered.connect(self.on_reset_settings)
         self.iface.addPluginToMenu(PLUGIN_NAME, self.reset_plugin_settings)
 
+        # Add menu action for the cache size limit
+        self.cache_quota_action = QAction(self.tr("Cache Size Limit"), self.win)
+        self.cache_quota_action.triggered.connect(self.on_set_cache_quota)
+        self.iface.addPluginToMenu(PLUGIN_NAME, self.cache_quota_action)
+
+        # Add menu action for the auto sync interval
+        self.sync_interval_action = QAction(self.tr("Auto Sync Interval"), self.win)
+        self.sync_interval_action.triggered.connect(self.on_set_sync_interval)
+        self.iface.addPluginToMenu(PLUGIN_NAME, self.sync_interval_action)
+
+        # Add menu action for preparing the caches of the selected project
+        self.prewarm_action = QAction(self.tr("Prepare Project Caches"), self.win)
+        self.prewarm_action.setCheckable(True)
+        self.prewarm_action.setChecked(get_settings().prewarm_caches == "true")
+        self.prewarm_action.toggled.connect(self.on_toggle_prewarm)
+        self.iface.addPluginToMenu(PLUGIN_NAME, self.prewarm_action)
+
+        # Add menu action for dumping API request metrics (debugging)
+        self.dump_metrics_action = QAction(self.tr("Dump API Metrics"), self.win)
+        self.dump_metrics_action.triggered.connect(self.on_dump_metrics)
+        self.iface.addPluginToMenu(PLUGIN_NAME, self.dump_metrics_action)
+
         # Add menu action for help/documentation
         self.help_action = QAction(self.tr("Help"), self.win)
         self.help_action.triggered.connect(lambda: webbrowser.open(DOCUMENTATION_URL))
@@ -430,6 +519,17 @@ class KumoyPlugin:
         # Check plugin version compatibility
         self.check_plugin_version()
 
+        # Delete least recently used caches if they exceed the size limit
+        schedule_eviction()
+
+        # Start periodic sync of loaded Kumoy layers
+        self.auto_sync = AutoSyncScheduler(self.win)
+        self.auto_sync.start()
+
+        # Prepare the caches of the saved project if enabled
+        if get_settings().id_token:
+            schedule_prewarm(get_settings().selected_project_id)
+
     def update_logout_action_visibility(self):
         # MEMO: メニューバーを開くたびに実行されるので重たい処理を実装してはいけない
         is_logged_in = bool(api.config.get_settings().id_token)
@@ -441,6 +541,29 @@ class KumoyPlugin:
             self.iface.removePluginMenu(PLUGIN_NAME, self.logout_action)
         if self.reset_plugin_settings:
             self.iface.removePluginMenu(PLUGIN_NAME, self.reset_plugin_settings)
+        if self.cache_quota_action:
+            self.iface.removePluginMenu(PLUGIN_NAME, self.cache_quota_action)
+        if self.sync_interval_action:
+            self.iface.removePluginMenu(PLUGIN_NAME, self.sync_interval_action)
+        if self.prewarm_action:
+            self.iface.removePluginMenu(PLUGIN_NAME, self.prewarm_action)
+        if self.dump_metrics_action:
+            self.iface.removePluginMenu(PLUGIN_NAME, self.dump_metrics_action)
+
+        # Dump API request metrics if enabled in the settings
+        api.metrics.dump_metrics_if_enabled()
+
+        # Stop preparing caches
+        cancel_prewarm()
+
+        # Stop the background token refresh
+        cancel_scheduled_refresh()
+
+        # Stop periodic sync
+        if self.auto_sync:
+            self.auto_sync.stop()
+            self.auto_sync.deleteLater()
+            self.auto_sync = None
         if self.help_action:
             self.iface.removePluginMenu(PLUGIN_NAME, self.help_action)
 
@@ -463,6 +586,8 @@ class KumoyPlugin:
             self.iface.projectRead.disconnect(self.check_kumoy_project_on_load)
             QgsProject.instance().projectSaved.disconnect(handle_project_saved)
             QgsProject.instance().layersAdded.disconnect(update_kumoy_indicator)
+            QgsProject.instance().layersAdded.disconnect(update_open_vectors)
+            QgsProject.instance().layersRemoved.disconnect(update_open_vectors)
             QgsProject.instance().layerTreeRoot().removedChildren.disconnect(
                 update_kumoy_indicator
             )
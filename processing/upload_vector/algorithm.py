@@ -3,6 +3,7 @@ from typing import Any, Dict, List, Optional, Set
 from qgis.core import (
     Qgis,
     QgsCoordinateReferenceSystem,
+    QgsFeature,
     QgsMessageLog,
     QgsProcessing,
     QgsProcessingAlgorithm,
@@ -11,7 +12,9 @@ from qgis.core import (
     QgsProcessingFeedback,
     QgsProcessingParameterEnum,
     QgsProcessingParameterFeatureSink,
+    QgsProcessingParameterDefinition,
     QgsProcessingParameterField,
+    QgsProcessingParameterNumber,
     QgsProcessingParameterString,
     QgsProcessingParameterVectorLayer,
     QgsVectorLayer,
@@ -113,6 +116,14 @@ def _create_attribute_list(valid_fields_layer: QgsVectorLayer) -> List[dict]:
     return attr_list
 
 
+def _wkb_size(feature: QgsFeature) -> int:
+    """WKB size of the geometry of a feature, in bytes"""
+    geometry = feature.geometry()
+    if geometry.isNull():
+        return 0
+    return geometry.constGet().wkbSize()
+
+
 class UploadVectorAlgorithm(QgsProcessingAlgorithm):
     """Algorithm to upload vector layer to Kumoy backend"""
 
@@ -120,6 +131,7 @@ class UploadVectorAlgorithm(QgsProcessingAlgorithm):
     KUMOY_PROJECT: str = "PROJECT"
     VECTOR_NAME: str = "VECTOR_NAME"
     SELECTED_FIELDS: str = "SELECTED_FIELDS"
+    PRECISION: str = "PRECISION"
     OUTPUT: str = "OUTPUT"  # Hidden output for internal processing
 
     project_ids: List[str]
@@ -185,9 +197,11 @@ class UploadVectorAlgorithm(QgsProcessingAlgorithm):
             organizations = api.organization.get_organizations()
             project_options = []
 
-            # Get projects for each organization
-            for org in organizations:
-                projects = api.project.get_projects_by_organization(org.id)
+            # Get projects for each organization (fetched in parallel)
+            projects_by_org = api.project.get_projects_by_organizations(
+                [org.id for org in organizations]
+            )
+            for org, projects in zip(organizations, projects_by_org):
                 for project in projects:
                     project_options.append(f"{org.name} / {project.name}")
                     self.project_ids.append(project.id)
@@ -246,6 +260,21 @@ class UploadVectorAlgorithm(QgsProcessingAlgorithm):
             )
         )
 
+        # Coordinate precision (grid size in degrees, 0 keeps full precision)
+        # memo: 1e-7度でおよそ1cm
+        precision_param = QgsProcessingParameterNumber(
+            self.PRECISION,
+            self.tr("Coordinate precision in degrees (0 = keep full precision)"),
+            type=QgsProcessingParameterNumber.Double,
+            defaultValue=0.0,
+            optional=True,
+            minValue=0.0,
+        )
+        precision_param.setFlags(
+            precision_param.flags() | QgsProcessingParameterDefinition.FlagAdvanced
+        )
+        self.addParameter(precision_param)
+
         # Hidden output parameter for internal processing
         param = QgsProcessingParameterFeatureSink(
             self.OUTPUT,
@@ -401,11 +430,13 @@ class UploadVectorAlgorithm(QgsProcessingAlgorithm):
             feedback.setProgress(10)
 
             # Process layer geometry (progress 10-40%)
+            precision = self.parameterAsDouble(parameters, self.PRECISION, context)
             processed_layer = self._process_layer_geometry(
                 normalized_layer,
                 field_mapping,
                 context,
                 child_feedback,
+                precision,
             )
             feedback.setProgress(40)
 
@@ -483,9 +514,13 @@ class UploadVectorAlgorithm(QgsProcessingAlgorithm):
         field_mapping: Dict[str, Dict[str, Any]],
         context: QgsProcessingContext,
         feedback: QgsProcessingFeedback,
+        precision: float = 0.0,
     ) -> QgsVectorLayer:
         """Run processing-based pipeline to prepare geometries
-        feedback progress: 10-40%"""
+        feedback progress: 10-40%
+
+        When precision > 0, coordinates are snapped to a grid of that size
+        (in degrees) after reprojection and duplicate vertices are removed."""
 
         source_crs = layer.crs()
         if not source_crs.isValid():
@@ -611,6 +646,15 @@ class UploadVectorAlgorithm(QgsProcessingAlgorithm):
 
         self._raise_if_canceled(feedback)
 
+        # Step 6: snap coordinates to a grid to reduce the upload size
+        if precision > 0:
+            current_layer = self._snap_to_grid(
+                current_layer, precision, context, feedback
+            )
+            feedback.setProgress(38)
+
+        self._raise_if_canceled(feedback)
+
         feedback.pushInfo(self.tr("Refactoring attributes..."))
         current_layer = self._run_child_algorithm(
             "native:refactorfields",
@@ -627,6 +671,115 @@ class UploadVectorAlgorithm(QgsProcessingAlgorithm):
 
         return current_layer
 
+    def _snap_to_grid(
+        self,
+        layer: QgsVectorLayer,
+        precision: float,
+        context: QgsProcessingContext,
+        feedback: QgsProcessingFeedback,
+    ) -> QgsVectorLayer:
+        """Snap coordinates to a grid of precision degrees and drop the
+        vertices and features which collapse by snapping"""
+        feedback.pushInfo(
+            self.tr("Snapping coordinates to a grid of {} degrees").format(precision)
+        )
+        original_count = layer.featureCount()
+
+        current_layer = self._run_child_algorithm(
+            "native:snappointstogrid",
+            {
+                "INPUT": layer,
+                "HSPACING": precision,
+                "VSPACING": precision,
+                "ZSPACING": 0,
+                "MSPACING": 0,
+                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+            },
+            context,
+            feedback,
+        )
+        self._raise_if_canceled(feedback)
+
+        # memo: スナップ後の頂点は格子点上にあるので、格子間隔の半分より近い頂点は重複
+        current_layer = self._run_child_algorithm(
+            "native:removeduplicatevertices",
+            {
+                "INPUT": current_layer,
+                "TOLERANCE": precision / 2,
+                "USE_Z_VALUE": False,
+                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+            },
+            context,
+            feedback,
+        )
+        self._raise_if_canceled(feedback)
+
+        # スナップで自己交差したポリゴンを修復する
+        if QgsWkbTypes.geometryType(current_layer.wkbType()) == (
+            QgsWkbTypes.PolygonGeometry
+        ):
+            current_layer = self._run_child_algorithm(
+                "native:fixgeometries",
+                {
+                    "INPUT": current_layer,
+                    "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                },
+                context,
+                feedback,
+            )
+            self._raise_if_canceled(feedback)
+
+        # 潰れて空になったジオメトリを除外する
+        current_layer = self._run_child_algorithm(
+            "native:extractbyexpression",
+            {
+                "INPUT": current_layer,
+                "EXPRESSION": self._build_geometry_filter_expression(current_layer),
+                "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+            },
+            context,
+            feedback,
+        )
+        if current_layer.featureCount() == 0:
+            raise QgsProcessingException(
+                self.tr("No features remain after snapping coordinates to the grid")
+            )
+
+        # memo: 地物数の比較はマルチパートの分割前に行う（分割で地物数が増えるため）
+        collapsed_count = original_count - current_layer.featureCount()
+        if collapsed_count > 0:
+            feedback.pushInfo(
+                self.tr("Removed {} features collapsed by snapping.").format(
+                    collapsed_count
+                )
+            )
+        self._raise_if_canceled(feedback)
+
+        # 修復でマルチパートになったポリゴンを分割する
+        wkb_type = current_layer.wkbType()
+        if QgsWkbTypes.geometryType(
+            wkb_type
+        ) == QgsWkbTypes.PolygonGeometry and QgsWkbTypes.isMultiType(wkb_type):
+            unsplit_count = current_layer.featureCount()
+            current_layer = self._run_child_algorithm(
+                "native:multiparttosingleparts",
+                {
+                    "INPUT": current_layer,
+                    "OUTPUT": QgsProcessing.TEMPORARY_OUTPUT,
+                },
+                context,
+                feedback,
+            )
+            self._raise_if_canceled(feedback)
+            split_count = current_layer.featureCount() - unsplit_count
+            if split_count > 0:
+                feedback.pushInfo(
+                    self.tr(
+                        "Added {} features by splitting multipart polygons."
+                    ).format(split_count)
+                )
+        return current_layer
+
     def _build_field_mapping(
         self,
         layer: QgsVectorLayer,
@@ -822,41 +975,41 @@ class UploadVectorAlgorithm(QgsProcessingAlgorithm):
         valid_fields_layer: QgsVectorLayer,
         feedback: QgsProcessingFeedback,
     ) -> bool:
-        """Upload features to Kumoy in batches. Returns True when canceled."""
-        cur_features = []
+        """Upload features to Kumoy in batches. Returns True when canceled.
+
+        Batches are cut by estimated encoded size and adapted to the observed
+        request latency (see api.batching), shared with the data provider.
+        """
+        batcher = api.batching.get_batcher("add_features")
         accumulated_features = 0
-        batch_size = 1000
+        total = valid_fields_layer.featureCount()
+        geometry_size = 0
 
-        for f in valid_fields_layer.getFeatures():
-            self._raise_if_canceled(feedback)
+        # memo: ジオメトリサイズはバッチ分割で地物を読むついでに数える（レイヤーを再走査しない）
+        def feature_size(feature: QgsFeature) -> int:
+            nonlocal geometry_size
+            geometry_size += _wkb_size(feature)
+            return api.batching.feature_size(feature)
 
-            if len(cur_features) >= batch_size:
-                self._add_features_batch(vector_id, cur_features)
+        for batch in batcher.batches(valid_fields_layer.getFeatures(), feature_size):
+            self._raise_if_canceled(feedback)
+            batcher.send(
+                batch, lambda features: self._add_features_batch(vector_id, features)
+            )
 
-                accumulated_features += len(cur_features)
-                feedback.pushInfo(
-                    self.tr("Upload complete: {} / {} features").format(
-                        accumulated_features, valid_fields_layer.featureCount()
-                    )
-                )
-                # Progress mapped to 50-100% range
-                progress_ratio = (
-                    accumulated_features / valid_fields_layer.featureCount()
-                )
-                feedback.setProgress(50 + int(progress_ratio * 50))
-                cur_features = []
-            cur_features.append(f)
-
-        # Upload remaining features
-        if cur_features:
-            self._add_features_batch(vector_id, cur_features)
-            accumulated_features += len(cur_features)
+            accumulated_features += len(batch)
             feedback.pushInfo(
                 self.tr("Upload complete: {} / {} features").format(
-                    accumulated_features, valid_fields_layer.featureCount()
+                    accumulated_features, total
                 )
             )
+            # Progress mapped to 50-100% range
+            progress_ratio = accumulated_features / total
+            feedback.setProgress(50 + int(progress_ratio * 50))
 
+        feedback.pushInfo(
+            self.tr("Uploaded {:.2f} MB of geometry").format(geometry_size / 1e6)
+        )
         return feedback.isCanceled()
 
     def _add_features_batch(self, vector_id: str, features: list) -> None:
@@ -2,7 +2,7 @@
 
 from qgis.PyQt.QtCore import QT_VERSION_STR, Qt, QBuffer
 from qgis.PyQt.QtGui import QRegion, QPainter, QTextCursor
-from qgis.PyQt.QtNetwork import QNetworkRequest
+from qgis.PyQt.QtNetwork import QNetworkReply, QNetworkRequest
 from qgis.PyQt.QtWidgets import (
     QDialog,
     QDialogButtonBox,
@@ -138,6 +138,22 @@ Qt5: QNetworkRequest.ContentTypeHeader, etc.
 Qt6: QNetworkRequest.KnownHeaders.ContentTypeHeader, etc.
 """
 
+Q_NETWORK_REQUEST_ATTRIBUTE = (
+    QNetworkRequest if QT_VERSION_INT <= 5 else QNetworkRequest.Attribute
+)
+"""Qt network request attribute type
+Qt5: QNetworkRequest.HttpStatusCodeAttribute, etc.
+Qt6: QNetworkRequest.Attribute.HttpStatusCodeAttribute, etc.
+"""
+
+Q_NETWORK_REPLY_ERROR = (
+    QNetworkReply if QT_VERSION_INT <= 5 else QNetworkReply.NetworkError
+)
+"""Qt network reply error type
+Qt5: QNetworkReply.NoError, etc.
+Qt6: QNetworkReply.NetworkError.NoError, etc.
+"""
+
 Q_REGION_TYPE = QRegion if QT_VERSION_INT <= 5 else QRegion.RegionType
 """Qt region type
 Qt5: QRegion.Ellipse, etc.
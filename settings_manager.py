@@ -1,5 +1,6 @@
 import json
 from dataclasses import dataclass
+from typing import Callable, List, Optional
 
 from qgis.core import Qgis, QgsMessageLog
 from qgis.PyQt.QtCore import QSettings
@@ -17,10 +18,40 @@ class UserSettings:
     selected_project_id: str = ""
     use_custom_server: str = "false"
     custom_server_url: str = ""
+    public_params: str = ""  # 最後に取得した /api/_public/params（JSON）
+    cache_quota_mb: str = "2048"  # キャッシュの容量の上限（MB、0は無制限）
+    # 開いているレイヤーの定期的な同期の間隔（秒、0は無効）
+    sync_interval_sec: str = "0"
+    prewarm_caches: str = "false"  # プロジェクトの選択時にキャッシュを事前に作成する
+    # プラグインの終了時・ログアウト時にAPIリクエストの計測結果を出力する
+    dump_metrics_on_unload: str = "false"
 
 
 SETTING_GROUP = "/Kumoy"
 
+# store_setting/reset_settings の際に呼び出されるコールバック
+# 引数は変更されたキー（reset_settingsの場合はNone）
+_setting_listeners: List[Callable[[Optional[str]], None]] = []
+
+
+def add_setting_listener(callback: Callable[[Optional[str]], None]) -> None:
+    """Register a callback invoked whenever a setting is stored or reset.
+    Used by in-memory caches to drop values derived from settings."""
+    if callback not in _setting_listeners:
+        _setting_listeners.append(callback)
+
+
+def _notify_setting_changed(key: Optional[str]) -> None:
+    for callback in list(_setting_listeners):
+        try:
+            callback(key)
+        except Exception as e:
+            QgsMessageLog.logMessage(
+                f"Error in setting listener: {e}",
+                constants.LOG_CATEGORY,
+                Qgis.Warning,
+            )
+
 
 def get_settings():
     # load settings from QSettings
@@ -36,6 +67,11 @@ def get_settings():
             selected_project_id=qsettings.value("selected_project_id", ""),
             use_custom_server=qsettings.value("use_custom_server", "false"),
             custom_server_url=qsettings.value("custom_server_url", ""),
+            public_params=qsettings.value("public_params", ""),
+            cache_quota_mb=qsettings.value("cache_quota_mb", "2048"),
+            sync_interval_sec=qsettings.value("sync_interval_sec", "0"),
+            prewarm_caches=qsettings.value("prewarm_caches", "false"),
+            dump_metrics_on_unload=qsettings.value("dump_metrics_on_unload", "false"),
         )
     except Exception as e:
         QgsMessageLog.logMessage(
@@ -57,6 +93,7 @@ def store_setting(key, value):
     qsettings.beginGroup(SETTING_GROUP)
     qsettings.setValue(key, value)
     qsettings.endGroup()
+    _notify_setting_changed(key)
 
 
 def reset_settings():
@@ -64,5 +101,6 @@ def reset_settings():
     qsettings.beginGroup(SETTING_GROUP)
     qsettings.remove("")
     qsettings.endGroup()
+    _notify_setting_changed(None)
 
     reset_local_cache_settings()
@@ -0,0 +1,224 @@
+"""Local HTTP server standing in for the Kumoy API in tests.
+
+Routes are registered per method and path regex. Gzip request bodies are
+decoded before reaching the handler and responses are gzip-compressed when
+the client accepts it, like the real server behind its load balancer.
+
+Served traffic can be saved with save_recording() and replayed later with
+load_recording(). VectorBackend (stand_in_vectors.py) implements the
+/_qgis/vector/* endpoints over synthetic datasets.
+"""
+
+import base64
+import gzip
+import json
+import re
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Tuple
+
+# レスポンスをgzip圧縮する最小サイズ
+GZIP_MIN_RESPONSE_SIZE = 1024
+
+
+@dataclass
+class RecordedRequest:
+    method: str
+    path: str
+    headers: Dict[str, str]
+    raw_body: bytes  # 受信したままのボディ（圧縮されている場合がある）
+    body: bytes  # 展開後のボディ
+
+    def json(self):
+        return json.loads(self.body.decode("utf-8")) if self.body else None
+
+
+@dataclass
+class Response:
+    status: int = 200
+    body: bytes = b""
+    headers: Dict[str, str] = field(default_factory=dict)
+
+    @classmethod
+    def json(cls, data, status: int = 200) -> "Response":
+        return cls(
+            status=status,
+            body=json.dumps(data).encode("utf-8"),
+            headers={"Content-Type": "application/json"},
+        )
+
+
+Handler = Callable[[RecordedRequest, "re.Match"], Response]
+
+
+class StandInServer:
+    """Threaded local server. Use as a context manager."""
+
+    def __init__(self):
+        self.requests: List[RecordedRequest] = []
+        self.compressed_responses = 0
+        # 送受信したボディのバイト数（圧縮後）
+        self.bytes_received = 0
+        self.bytes_sent = 0
+        self.record_responses = False
+        self.recording: List[Tuple[RecordedRequest, Response]] = []
+        self._lock = threading.Lock()
+        self._routes: List[Tuple[str, "re.Pattern", Handler]] = []
+        self._httpd: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def route(self, method: str, pattern: str, handler: Handler) -> None:
+        """Register handler for requests whose path fully matches pattern"""
+        self._routes.append((method, re.compile(pattern), handler))
+
+    def start(self) -> "StandInServer":
+        server = self
+
+        class _RequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *_args):
+                pass
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                raw_body = self.rfile.read(length) if length else b""
+                body = raw_body
+                if self.headers.get("Content-Encoding") == "gzip":
+                    body = gzip.decompress(raw_body)
+                request = RecordedRequest(
+                    method=self.command,
+                    path=self.path,
+                    headers=dict(self.headers.items()),
+                    raw_body=raw_body,
+                    body=body,
+                )
+                response = server._dispatch(request)
+                with server._lock:
+                    server.requests.append(request)
+                    server.bytes_received += len(raw_body)
+                    if server.record_responses:
+                        server.recording.append((request, response))
+                self._send(response)
+
+            def _send(self, response: Response):
+                body = response.body
+                headers = dict(response.headers)
+                accept = self.headers.get("Accept-Encoding", "")
+                if "gzip" in accept and len(body) >= GZIP_MIN_RESPONSE_SIZE:
+                    body = gzip.compress(body)
+                    headers["Content-Encoding"] = "gzip"
+                    with server._lock:
+                        server.compressed_responses += 1
+                with server._lock:
+                    server.bytes_sent += len(body)
+                self.send_response(response.status)
+                for key, value in headers.items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            do_GET = do_POST = do_PUT = do_DELETE = _handle
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _RequestHandler)
+        self._thread = threading.Thread(target=self._httpd.serve_forever)
+        self._thread.daemon = True
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._thread.join()
+            self._httpd = None
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *_exc) -> None:
+        self.stop()
+
+    def save_recording(self, path: str) -> None:
+        """Write the recorded request/response pairs to a JSON file
+        (set record_responses = True before sending the requests)"""
+        with self._lock:
+            recording = list(self.recording)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(
+                [
+                    {
+                        "method": request.method,
+                        "path": request.path.split("?", 1)[0],
+                        "status": response.status,
+                        "headers": response.headers,
+                        "body": base64.b64encode(response.body).decode("ascii"),
+                    }
+                    for request, response in recording
+                ],
+                f,
+                indent=1,
+            )
+
+    def load_recording(self, path: str) -> None:
+        """Serve the responses of a recording, in recorded order per method
+        and path. The last response is repeated once a path is exhausted."""
+        with open(path, encoding="utf-8") as f:
+            entries = json.load(f)
+
+        queues: Dict[Tuple[str, str], List[Response]] = {}
+        for entry in entries:
+            queues.setdefault((entry["method"], entry["path"]), []).append(
+                Response(
+                    status=entry["status"],
+                    body=base64.b64decode(entry["body"]),
+                    headers=entry["headers"],
+                )
+            )
+
+        for (method, path), responses in queues.items():
+
+            def replay(_request, _match, responses=responses):
+                with self._lock:
+                    return responses.pop(0) if len(responses) > 1 else responses[0]
+
+            self.route(method, re.escape(path), replay)
+
+    def _dispatch(self, request: RecordedRequest) -> Response:
+        path = request.path.split("?", 1)[0]
+        for method, pattern, handler in self._routes:
+            if method == request.method:
+                match = pattern.fullmatch(path)
+                if match:
+                    return handler(request, match)
+        return Response.json({"message": "Not Found", "error": path}, status=404)
+
+
+@contextmanager
+def use_stand_in_server(server: StandInServer):
+    """Point the plugin settings at server and log in with a dummy token.
+    Settings are restored afterwards."""
+    from datetime import datetime, timedelta
+
+    from plugin_dir.settings_manager import get_settings, store_setting
+
+    saved = get_settings()
+    store_setting("use_custom_server", "true")
+    store_setting("custom_server_url", server.url)
+    store_setting("id_token", "dummy-token")
+    store_setting("token_expires_at", (datetime.now() + timedelta(hours=1)).isoformat())
+    try:
+        yield server
+    finally:
+        store_setting("use_custom_server", saved.use_custom_server)
+        store_setting("custom_server_url", saved.custom_server_url)
+        store_setting("id_token", saved.id_token)
+        store_setting("token_expires_at", saved.token_expires_at)
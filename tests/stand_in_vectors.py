@@ -0,0 +1,401 @@
+"""Synthetic vector datasets served by the stand-in server.
+
+VectorBackend implements GET /api/vector/{id} and the /_qgis/vector/*
+endpoints (get-features-v2 paging, get-diff, add-features, ...) in memory,
+so sync and upload can run end to end without the real API.
+
+The module does not import the plugin (or QGIS), so it also works in a
+standalone process, e.g. ``python -m tests.stand_in_vectors 100000``.
+"""
+
+import base64
+import datetime
+import json
+import math
+import random
+import struct
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+from .stand_in_server import RecordedRequest, Response, StandInServer
+
+# get-features-v2 の1ページの件数（API仕様）
+PAGE_SIZE = 5000
+
+# get-diff が返す差分の上限。超えると MAX_DIFF_COUNT_EXCEEDED
+MAX_DIFF_COUNT = 5000
+
+WKB_FRAMES_CONTENT_TYPE = "application/vnd.kumoy.wkb-frames"
+
+# 合成データの属性カラム（名前、型）
+COLUMNS = (
+    ("name", "string"),
+    ("category", "integer"),
+    ("value", "float"),
+    ("active", "boolean"),
+)
+
+_WKB_TYPES = {"POINT": 1, "LINESTRING": 2, "POLYGON": 3}
+
+
+def _point_wkb(x: float, y: float) -> bytes:
+    return struct.pack("<BIdd", 1, 1, x, y)
+
+
+def _linestring_wkb(coords: List[tuple]) -> bytes:
+    return struct.pack("<BII", 1, 2, len(coords)) + b"".join(
+        struct.pack("<dd", x, y) for x, y in coords
+    )
+
+
+def _polygon_wkb(ring: List[tuple]) -> bytes:
+    return struct.pack("<BIII", 1, 3, 1, len(ring)) + b"".join(
+        struct.pack("<dd", x, y) for x, y in ring
+    )
+
+
+def synthetic_wkb(geometry: str, rnd: random.Random, vertices: int) -> bytes:
+    """Random geometry around Japan. vertices is ignored for points."""
+    cx = rnd.uniform(129.0, 145.0)
+    cy = rnd.uniform(31.0, 45.0)
+    if geometry == "POINT":
+        return _point_wkb(cx, cy)
+    if geometry == "LINESTRING":
+        return _linestring_wkb(
+            [(cx + i * 1e-4, cy + rnd.uniform(-1e-4, 1e-4)) for i in range(vertices)]
+        )
+    ring = [
+        (
+            cx + 1e-3 * math.cos(2 * math.pi * i / vertices),
+            cy + 1e-3 * math.sin(2 * math.pi * i / vertices),
+        )
+        for i in range(vertices)
+    ]
+    return _polygon_wkb(ring + ring[:1])
+
+
+def _now_iso() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def _parse_iso(value: str) -> float:
+    return (
+        datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+        .replace(tzinfo=datetime.timezone.utc)
+        .timestamp()
+    )
+
+
+@dataclass
+class SyntheticVector:
+    id: str
+    geometry: str  # "POINT" | "LINESTRING" | "POLYGON"
+    columns: Dict[str, str]  # カラム名 -> 型
+    # kumoy_id -> {"kumoy_id", "kumoy_wkb"(bytes), "properties"}
+    features: Dict[int, dict] = field(default_factory=dict)
+    updated_at: Dict[int, float] = field(default_factory=dict)
+    deleted_at: Dict[int, float] = field(default_factory=dict)
+    next_id: int = 1
+    project_id: str = "project-1"
+
+    def add(self, wkb: bytes, properties: dict) -> int:
+        kumoy_id = self.next_id
+        self.next_id += 1
+        self.features[kumoy_id] = {
+            "kumoy_id": kumoy_id,
+            "kumoy_wkb": wkb,
+            "properties": {name: properties.get(name) for name in self.columns},
+        }
+        self.updated_at[kumoy_id] = time.time()
+        return kumoy_id
+
+    def touch(self, kumoy_id: int) -> None:
+        self.updated_at[kumoy_id] = time.time()
+
+    def delete(self, kumoy_id: int) -> None:
+        if self.features.pop(kumoy_id, None) is not None:
+            self.updated_at.pop(kumoy_id, None)
+            self.deleted_at[kumoy_id] = time.time()
+
+
+def synthetic_vector(
+    vector_id: str,
+    count: int,
+    geometry: str = "POINT",
+    vertices: int = 16,
+    seed: int = 0,
+) -> SyntheticVector:
+    """Build a dataset of count features with the attribute columns in COLUMNS"""
+    rnd = random.Random(seed)
+    vector = SyntheticVector(id=vector_id, geometry=geometry, columns=dict(COLUMNS))
+    for i in range(count):
+        vector.add(
+            synthetic_wkb(geometry, rnd, vertices),
+            {
+                "name": f"feature {i}",
+                "category": rnd.randrange(10),
+                "value": rnd.random() * 1000,
+                "active": rnd.random() < 0.5,
+            },
+        )
+    # memo: 既存の地物は1時間前に作成されたことにして、以降の変更だけがget-diffに載るようにする
+    created_at = time.time() - 3600
+    for kumoy_id in vector.updated_at:
+        vector.updated_at[kumoy_id] = created_at
+    return vector
+
+
+def _encode_features(data, accept: str) -> Response:
+    """Encode a response with WKB as bytes, honouring the Accept header"""
+    if WKB_FRAMES_CONTENT_TYPE in accept:
+        blobs: List[bytes] = []
+
+        def blob_index(obj):
+            blobs.append(obj)
+            return len(blobs) - 1
+
+        document = json.dumps(data, default=blob_index).encode("utf-8")
+        parts = [b"KMYW", b"\x01", struct.pack(">I", len(document)), document]
+        for blob in blobs:
+            parts += [struct.pack(">I", len(blob)), blob]
+        return Response(
+            body=b"".join(parts),
+            headers={"Content-Type": WKB_FRAMES_CONTENT_TYPE},
+        )
+
+    def to_base64(obj):
+        return base64.b64encode(obj).decode("ascii")
+
+    return Response(
+        body=json.dumps(data, default=to_base64).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+
+
+def _decode_features(request: RecordedRequest):
+    """Decode a request body, returning "kumoy_wkb" values as bytes"""
+    body = request.body
+    if request.headers.get("Content-Type", "").startswith(WKB_FRAMES_CONTENT_TYPE):
+        (length,) = struct.unpack_from(">I", body, 5)
+        document = body[9 : 9 + length]
+        blobs = []
+        offset = 9 + length
+        while offset < len(body):
+            (size,) = struct.unpack_from(">I", body, offset)
+            blobs.append(body[offset + 4 : offset + 4 + size])
+            offset += 4 + size
+
+        def hook(obj):
+            if "kumoy_wkb" in obj:
+                obj["kumoy_wkb"] = blobs[obj["kumoy_wkb"]]
+            return obj
+
+        return json.loads(document.decode("utf-8"), object_hook=hook)
+
+    def hook(obj):
+        if isinstance(obj.get("kumoy_wkb"), str):
+            obj["kumoy_wkb"] = base64.b64decode(obj["kumoy_wkb"])
+        return obj
+
+    return json.loads(body.decode("utf-8") or "{}", object_hook=hook)
+
+
+class VectorBackend:
+    """In-memory vectors behind the Kumoy vector endpoints"""
+
+    def __init__(
+        self, page_size: int = PAGE_SIZE, max_diff_count: int = MAX_DIFF_COUNT
+    ):
+        self.vectors: Dict[str, SyntheticVector] = {}
+        self.page_size = page_size
+        self.max_diff_count = max_diff_count
+        self._lock = threading.Lock()
+
+    def add_vector(self, vector: SyntheticVector) -> SyntheticVector:
+        self.vectors[vector.id] = vector
+        return vector
+
+    def install(self, server: StandInServer) -> "VectorBackend":
+        server.route("GET", r"/api/vector/([^/]+)", self._get_vector)
+        server.route("DELETE", r"/api/vector/([^/]+)", self._delete_vector)
+        server.route("POST", r"/api/project/([^/]+)/vector", self._create_vector)
+        server.route(
+            "POST", r"/api/_qgis/vector/([^/]+)/([a-z0-9-]+)", self._qgis_endpoint
+        )
+        return self
+
+    # --- /api/vector ---
+
+    def _vector_detail(self, vector: SyntheticVector) -> dict:
+        now = _now_iso()
+        return {
+            "id": vector.id,
+            "name": vector.id,
+            "type": vector.geometry,
+            "projectId": vector.project_id,
+            "project": {"id": vector.project_id, "name": vector.project_id},
+            "attribution": "",
+            "storageUnits": 0,
+            "createdAt": now,
+            "updatedAt": now,
+            "role": "OWNER",
+            "extent": [129.0, 31.0, 145.0, 45.0],
+            "count": len(vector.features),
+            "columns": [
+                {"name": name, "type": type_} for name, type_ in vector.columns.items()
+            ],
+        }
+
+    def _get_vector(self, _request, match) -> Response:
+        vector = self.vectors.get(match.group(1))
+        if vector is None:
+            return Response.json({"message": "Not Found"}, status=404)
+        with self._lock:
+            return Response.json(self._vector_detail(vector))
+
+    def _delete_vector(self, _request, match) -> Response:
+        with self._lock:
+            self.vectors.pop(match.group(1), None)
+        return Response.json({})
+
+    def _create_vector(self, request, match) -> Response:
+        data = request.json() or {}
+        with self._lock:
+            vector = self.add_vector(
+                SyntheticVector(
+                    id=f"vector-{len(self.vectors) + 1}",
+                    geometry=data.get("type", "POINT"),
+                    columns={},
+                    project_id=match.group(1),
+                )
+            )
+            return Response.json(self._vector_detail(vector))
+
+    # --- /api/_qgis/vector/{id}/* ---
+
+    def _qgis_endpoint(self, request, match) -> Response:
+        vector = self.vectors.get(match.group(1))
+        if vector is None:
+            return Response.json({"message": "Not Found"}, status=404)
+        handler = {
+            "get-features-v2": self._get_features_v2,
+            "get-diff": self._get_diff,
+            "add-features": self._add_features,
+            "delete-features": self._delete_features,
+            "change-attribute-values": self._change_attribute_values,
+            "change-geometry-values": self._change_geometry_values,
+            "update-columns": self._update_columns,
+            "add-attributes-v2": self._add_attributes_v2,
+            "delete-attributes": self._delete_attributes,
+        }.get(match.group(2))
+        if handler is None:
+            return Response.json({"message": "Not Found"}, status=404)
+        with self._lock:
+            return handler(vector, request)
+
+    def _get_features_v2(self, vector: SyntheticVector, request) -> Response:
+        after_id = _decode_features(request).get("after_id") or 0
+        page = []
+        # memo: kumoy_idは昇順に追加されるので、dictの順序がそのままid順になる
+        for kumoy_id, feature in vector.features.items():
+            if kumoy_id <= after_id:
+                continue
+            page.append(feature)
+            if len(page) >= self.page_size:
+                break
+        return _encode_features(page, request.headers.get("Accept", ""))
+
+    def _get_diff(self, vector: SyntheticVector, request) -> Response:
+        since = _parse_iso(_decode_features(request)["last_updated"])
+        updated = [
+            vector.features[kumoy_id]
+            for kumoy_id, at in vector.updated_at.items()
+            if at >= since
+        ]
+        deleted = [
+            kumoy_id for kumoy_id, at in vector.deleted_at.items() if at >= since
+        ]
+        if len(updated) + len(deleted) > self.max_diff_count:
+            return Response.json(
+                {"message": "Application Error", "error": "MAX_DIFF_COUNT_EXCEEDED"},
+                status=400,
+            )
+        return _encode_features(
+            {"updatedRows": updated, "deletedRows": deleted},
+            request.headers.get("Accept", ""),
+        )
+
+    def _add_features(self, vector: SyntheticVector, request) -> Response:
+        for feature in _decode_features(request)["features"]:
+            vector.add(feature["kumoy_wkb"], feature["properties"])
+        return Response.json({})
+
+    def _delete_features(self, vector: SyntheticVector, request) -> Response:
+        for kumoy_id in request.json()["kumoy_ids"]:
+            vector.delete(kumoy_id)
+        return Response.json({})
+
+    def _change_attribute_values(self, vector: SyntheticVector, request) -> Response:
+        for item in request.json()["attribute_items"]:
+            feature = vector.features.get(item["kumoy_id"])
+            if feature is not None:
+                feature["properties"].update(item["properties"])
+                vector.touch(item["kumoy_id"])
+        return Response.json({})
+
+    def _change_geometry_values(self, vector: SyntheticVector, request) -> Response:
+        for item in _decode_features(request)["geometry_items"]:
+            feature = vector.features.get(item["kumoy_id"])
+            if feature is not None:
+                feature["kumoy_wkb"] = item["kumoy_wkb"]
+                vector.touch(item["kumoy_id"])
+        return Response.json({})
+
+    def _update_columns(self, vector: SyntheticVector, request) -> Response:
+        vector.columns.update(request.json()["columns"])
+        return Response.json({})
+
+    def _add_attributes_v2(self, vector: SyntheticVector, request) -> Response:
+        for attribute in request.json()["attributes"]:
+            vector.columns[attribute["name"]] = attribute["type"]
+            for feature in vector.features.values():
+                feature["properties"].setdefault(attribute["name"], None)
+        return Response.json({})
+
+    def _delete_attributes(self, vector: SyntheticVector, request) -> Response:
+        for name in request.json()["attributeNames"]:
+            vector.columns.pop(name, None)
+            for feature in vector.features.values():
+                feature["properties"].pop(name, None)
+        return Response.json({})
+
+
+def _main() -> None:
+    # 開発時に手動で叩けるようにサーバーを起動する
+    import argparse
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("count", type=int, nargs="?", default=10000)
+    parser.add_argument("--geometry", default="POINT", choices=sorted(_WKB_TYPES))
+    parser.add_argument("--record", metavar="PATH")
+    args = parser.parse_args()
+
+    backend = VectorBackend()
+    backend.add_vector(synthetic_vector("vector-1", args.count, args.geometry))
+    server = StandInServer()
+    server.record_responses = bool(args.record)
+    backend.install(server)
+    with server:
+        print(f"Serving vector-1 ({args.count:,} features) at {server.url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+    if args.record:
+        server.save_recording(args.record)
+
+
+if __name__ == "__main__":
+    _main()
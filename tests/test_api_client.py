@@ -0,0 +1,300 @@
+"""ApiClient をローカルのスタンドインサーバーに対して実行するテスト（QGIS環境が必要）"""
+
+import pytest
+
+from .stand_in_server import Response, StandInServer, use_stand_in_server
+
+
+def _echo(request, _match):
+    return Response.json(request.json())
+
+
+@pytest.fixture
+def server(qgis_plugin_path):
+    with StandInServer() as s:
+        s.route("POST", r"/api/echo", _echo)
+        with use_stand_in_server(s):
+            yield s
+
+
+class TestGzipRequestBody:
+    """大きなPOSTボディがgzip圧縮され、往復で内容が変わらないことを検証する"""
+
+    def _client(self):
+        from plugin_dir.kumoy.api import client
+
+        return client
+
+    def test_large_body_is_compressed(self, server):
+        m = self._client()
+        data = {
+            "features": [{"kumoy_wkb": "AQEAAAA" * 20, "i": i} for i in range(2000)]
+        }
+
+        result = m.ApiClient.post("/echo", data)
+
+        request = server.requests[-1]
+        assert request.headers.get("Content-Encoding") == "gzip"
+        assert len(request.raw_body) < len(request.body)
+        assert request.json() == data
+        # レスポンスもgzipで返り、Qtが透過的に展開していること
+        assert server.compressed_responses == 1
+        assert result == data
+
+    def test_small_body_is_not_compressed(self, server):
+        m = self._client()
+
+        result = m.ApiClient.post("/echo", {"kumoy_ids": [1, 2, 3]})
+
+        request = server.requests[-1]
+        assert "Content-Encoding" not in request.headers
+        assert result == {"kumoy_ids": [1, 2, 3]}
+
+    def test_falls_back_when_server_rejects_gzip(self, server):
+        m = self._client()
+
+        def reject_gzip(request, _match):
+            if request.headers.get("Content-Encoding") == "gzip":
+                return Response.json({"message": "Unsupported"}, status=415)
+            return Response.json(request.json())
+
+        server.route("POST", r"/api/plain", reject_gzip)
+        data = {"payload": "x" * (m.GZIP_MIN_BODY_SIZE + 1)}
+
+        try:
+            assert m.ApiClient.post("/plain", data) == data
+            assert len(server.requests) == 2
+            assert not m.get_session().gzip_enabled()
+        finally:
+            m.get_session().invalidate()
+
+
+class TestRetry:
+    """一時的なエラーが再送され、冪等でないリクエストは再送されないことを検証する"""
+
+    @pytest.fixture(autouse=True)
+    def fast_retry(self, server):
+        from plugin_dir.kumoy.api import retry
+
+        saved = retry.get_retry_policy()
+        retry.set_retry_policy(retry.RetryPolicy(base_delay=0.01, max_delay=0.05))
+        retry.get_retry_metrics().reset()
+        yield retry
+        retry.set_retry_policy(saved)
+
+    def _flaky(self, server, path, status, failures, retry_after="0"):
+        """Route answering `status` for the first `failures` requests"""
+        calls = []
+
+        def handler(request, _match):
+            calls.append(request)
+            if len(calls) <= failures:
+                response = Response.json({"message": "Busy"}, status=status)
+                if retry_after is not None:
+                    response.headers["Retry-After"] = retry_after
+                return response
+            return Response.json({"ok": True})
+
+        server.route("POST", path, handler)
+        return calls
+
+    def test_retries_after_429(self, server, fast_retry):
+        from plugin_dir.kumoy.api.client import ApiClient
+
+        calls = self._flaky(server, r"/api/_qgis/vector/[^/]+/add-features", 429, 2)
+
+        assert ApiClient.post("/_qgis/vector/abc/add-features", {}) == {"ok": True}
+        assert len(calls) == 3
+        stats = fast_retry.get_retry_metrics().snapshot()
+        assert stats["recovered"] == {"/_qgis/vector/abc/add-features": 1}
+
+    def test_retry_after_longer_than_max_delay_is_not_retried(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient
+
+        # fast_retryのmax_delayは0.05秒
+        calls = self._flaky(
+            server, r"/api/_qgis/vector/[^/]+/get-diff", 429, 1, retry_after="60"
+        )
+
+        with pytest.raises(Exception):
+            ApiClient.post("/_qgis/vector/abc/get-diff", {})
+        assert len(calls) == 1
+
+    def test_non_idempotent_post_is_not_replayed_after_502(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient
+
+        calls = self._flaky(server, r"/api/_qgis/vector/[^/]+/add-features", 502, 1)
+
+        with pytest.raises(Exception):
+            ApiClient.post("/_qgis/vector/abc/add-features", {})
+        assert len(calls) == 1
+
+    def test_non_idempotent_post_after_503_needs_retry_after(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient
+
+        calls = self._flaky(
+            server,
+            r"/api/_qgis/vector/[^/]+/add-features",
+            503,
+            1,
+            retry_after=None,
+        )
+
+        with pytest.raises(Exception):
+            ApiClient.post("/_qgis/vector/abc/add-features", {})
+        assert len(calls) == 1
+
+    def test_retry_wait_keeps_event_loop_running(self, server):
+        from qgis.PyQt.QtCore import QTimer
+
+        from plugin_dir.kumoy.api.client import _wait
+
+        fired = []
+        QTimer.singleShot(0, lambda: fired.append(True))
+
+        _wait(0.05)
+
+        assert fired == [True]
+
+    def test_idempotent_post_is_replayed_after_502(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient
+
+        calls = self._flaky(server, r"/api/_qgis/vector/[^/]+/get-diff", 502, 1)
+
+        assert ApiClient.post("/_qgis/vector/abc/get-diff", {}) == {"ok": True}
+        assert len(calls) == 2
+
+    def test_async_request_is_retried(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient, gather
+
+        calls = self._flaky(server, r"/api/_qgis/vector/[^/]+/get-diff", 503, 1)
+
+        result = gather(
+            [lambda: ApiClient.post_async("/_qgis/vector/abc/get-diff", {})]
+        )
+        assert result == [{"ok": True}]
+        assert len(calls) == 2
+
+
+class TestCoalescing:
+    """直後の同じGETが再送されず、変更リクエストの後は再取得されることを検証する"""
+
+    def test_repeated_get_is_memoised(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient
+
+        calls = []
+
+        def handler(request, _match):
+            calls.append(request)
+            return Response.json({"id": "abc", "n": len(calls)})
+
+        server.route("GET", r"/api/vector/abc", handler)
+        server.route("PUT", r"/api/vector/abc", lambda _r, _m: Response.json({}))
+
+        assert ApiClient.get("/vector/abc") == {"id": "abc", "n": 1}
+        assert ApiClient.get("/vector/abc") == {"id": "abc", "n": 1}
+        assert len(calls) == 1
+
+        ApiClient.put("/vector/abc", {"name": "renamed"})
+        assert ApiClient.get("/vector/abc") == {"id": "abc", "n": 2}
+
+
+class TestStreamingFeatures:
+    """get-features-v2 のレスポンスが1件ずつデコードされることを検証する"""
+
+    def test_iter_features(self, server):
+        import base64
+
+        from plugin_dir.kumoy.api import qgis_vector
+
+        wkb = bytes.fromhex("0101000000000000000000f03f0000000000000040")
+        page = [
+            {
+                "kumoy_id": i,
+                "kumoy_wkb": base64.b64encode(wkb).decode(),
+                "properties": {"name": f"地物{i}"},
+            }
+            for i in range(1, 101)
+        ]
+        server.route(
+            "POST",
+            r"/api/_qgis/vector/[^/]+/get-features-v2",
+            lambda request, _match: Response.json(
+                [f for f in page if f["kumoy_id"] > request.json().get("after_id", 0)]
+            ),
+        )
+
+        features = qgis_vector.iter_features("abc", after_id=50)
+        first = next(features)
+        assert first["kumoy_id"] == 51
+        assert first["kumoy_wkb"] == wkb
+        assert [f["kumoy_id"] for f in features] == list(range(52, 101))
+
+
+class TestPayloadNegotiation:
+    """サーバーが対応している場合のみバイナリ形式で送受信することを検証する"""
+
+    @pytest.fixture
+    def codec(self, server):
+        from plugin_dir.kumoy.api import payload_codec, public_params
+
+        server.route(
+            "GET",
+            r"/api/_public/params",
+            lambda _r, _m: Response.json(
+                {
+                    payload_codec.PUBLIC_PARAMS_CODECS_KEY: [
+                        payload_codec.WKB_FRAMES_CONTENT_TYPE
+                    ]
+                }
+            ),
+        )
+        public_params.get_public_params_service().get(max_age=0)
+        yield payload_codec
+        payload_codec._on_setting_changed(None)
+
+    def _features_route(self, server, codec, features):
+        def handler(request, _match):
+            if codec.WKB_FRAMES_CONTENT_TYPE in request.headers.get("Accept", ""):
+                return Response(
+                    body=codec.WKB_FRAMES_CODEC.encode(features),
+                    headers={"Content-Type": codec.WKB_FRAMES_CONTENT_TYPE},
+                )
+            return Response(
+                body=codec.JSON_CODEC.encode(features),
+                headers={"Content-Type": "application/json"},
+            )
+
+        server.route("POST", r"/api/_qgis/vector/[^/]+/get-features-v2", handler)
+
+    def test_binary_features(self, server, codec):
+        from plugin_dir.kumoy.api import qgis_vector
+
+        wkb = bytes.fromhex("0101000000000000000000f03f0000000000000040")
+        features = [
+            {"kumoy_id": i, "kumoy_wkb": wkb, "properties": {}} for i in range(3)
+        ]
+        self._features_route(server, codec, features)
+
+        assert qgis_vector.get_features("abc") == features
+        assert server.requests[-1].headers["Content-Type"] == (
+            codec.WKB_FRAMES_CONTENT_TYPE
+        )
+
+    def test_falls_back_to_json_on_415(self, server, codec):
+        from plugin_dir.kumoy.api import qgis_vector
+
+        received = []
+
+        def handler(request, _match):
+            if request.headers["Content-Type"] != "application/json":
+                return Response.json({"message": "Unsupported"}, status=415)
+            received.append(codec.JSON_CODEC.decode(request.body))
+            return Response.json({})
+
+        server.route("POST", r"/api/_qgis/vector/[^/]+/change-geometry-values", handler)
+
+        qgis_vector.change_geometry_values("abc", [{"kumoy_id": 1, "geom": b"\x01"}])
+
+        assert received == [{"geometry_items": [{"kumoy_id": 1, "kumoy_wkb": b"\x01"}]}]
+        assert codec.negotiate_codec() is codec.JSON_CODEC
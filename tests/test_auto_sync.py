@@ -0,0 +1,30 @@
+"""定期的な差分の同期の間隔のテスト（QGIS環境が必要）"""
+
+
+class TestNextInterval:
+    def test_doubles_while_unchanged(self, qgis_plugin_path):
+        from plugin_dir.kumoy.provider.auto_sync import next_interval
+
+        assert next_interval(60, 60, changed=False) == 120
+        assert next_interval(60, 120, changed=False) == 240
+
+    def test_capped_at_max_backoff(self, qgis_plugin_path):
+        from plugin_dir.kumoy.provider.auto_sync import MAX_BACKOFF, next_interval
+
+        assert next_interval(60, 60 * MAX_BACKOFF, changed=False) == 60 * MAX_BACKOFF
+
+    def test_resets_after_change(self, qgis_plugin_path):
+        from plugin_dir.kumoy.provider.auto_sync import next_interval
+
+        assert next_interval(60, 480, changed=True) == 60
+
+    def test_hidden_layer_uses_longest_interval(self, qgis_plugin_path):
+        from plugin_dir.kumoy.provider.auto_sync import MAX_BACKOFF, next_interval
+
+        assert next_interval(60, 60, changed=True, visible=False) == 60 * MAX_BACKOFF
+
+    def test_follows_changed_base_interval(self, qgis_plugin_path):
+        from plugin_dir.kumoy.provider.auto_sync import next_interval
+
+        # 設定の間隔が長くなったら、それより短くはしない
+        assert next_interval(300, 60, changed=False) == 300
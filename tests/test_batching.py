@@ -0,0 +1,64 @@
+import pytest
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+class TestAdaptiveBatcher:
+    """推定バイト数によるバッチ分割と、所要時間による大きさの調整を検証する"""
+
+    def _batcher(self, **kwargs):
+        from plugin_dir.kumoy.api.batching import AdaptiveBatcher
+
+        kwargs.setdefault("initial_bytes", 100)
+        kwargs.setdefault("min_bytes", 10)
+        kwargs.setdefault("max_bytes", 1000)
+        return AdaptiveBatcher("test", **kwargs)
+
+    def test_batches_are_cut_by_bytes(self):
+        batcher = self._batcher()
+        batches = list(batcher.batches([40, 40, 40, 10, 90], lambda size: size))
+        assert batches == [[40, 40], [40, 10], [90]]
+
+    def test_batches_are_capped_by_count(self):
+        batcher = self._batcher(max_count=3)
+        batches = list(batcher.batches(range(7), lambda _: 1))
+        assert [len(b) for b in batches] == [3, 3, 1]
+
+    def test_oversized_item_is_sent_alone(self):
+        batcher = self._batcher()
+        batches = list(batcher.batches([10, 500, 10], lambda size: size))
+        assert batches == [[10], [500], [10]]
+
+    def test_budget_follows_latency(self):
+        batcher = self._batcher(target_seconds=2.0)
+        batcher.record(0.1)
+        assert batcher.budget == 150
+        batcher.record(2.0)
+        assert batcher.budget == 150
+        batcher.record(6.0)
+        assert batcher.budget == 50
+        batcher.record(1.0, ok=False)
+        assert batcher.budget == 25
+
+    def test_budget_is_clamped(self):
+        batcher = self._batcher()
+        for _ in range(20):
+            batcher.record(0.0)
+        assert batcher.budget == 1000
+        for _ in range(20):
+            batcher.record(0.0, ok=False)
+        assert batcher.budget == 10
+
+    def test_run_sends_all_and_raises_errors(self):
+        batcher = self._batcher()
+        sent = []
+        assert batcher.run([60] * 5, lambda size: size, sent.append) == 5
+        assert sum(len(b) for b in sent) == 5
+
+        budget = batcher.budget
+
+        def fail(_batch):
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            batcher.run([60] * 5, lambda size: size, fail)
+        assert batcher.budget < budget
@@ -0,0 +1,305 @@
+"""同期・アップロードのスループット計測（QGIS環境が必要）
+
+通常のテスト実行では実行されない。環境変数 KUMOY_BENCHMARK=1 を設定して実行する:
+
+    KUMOY_BENCHMARK=1 KUMOY_BENCHMARK_FEATURES=100000 pytest tests/test_benchmark.py -s
+
+- KUMOY_BENCHMARK_FEATURES: 合成データの地物数（既定 50000）
+- KUMOY_BENCHMARK_GEOMETRY: POINT / LINESTRING / POLYGON（既定 POINT）
+- KUMOY_BENCHMARK_OUTPUT: 結果をJSONで追記するファイル（比較用）
+
+features/s、サーバーが送受信したMB/s（圧縮後）、プロセスのピークRSSを出力する。
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+
+import pytest
+
+from .stand_in_server import StandInServer, use_stand_in_server
+from .stand_in_vectors import COLUMNS, VectorBackend, synthetic_vector
+
+pytestmark = pytest.mark.skipif(
+    not os.environ.get("KUMOY_BENCHMARK"),
+    reason="set KUMOY_BENCHMARK=1 to run benchmarks",
+)
+
+FEATURE_COUNT = int(os.environ.get("KUMOY_BENCHMARK_FEATURES", "50000"))
+GEOMETRY = os.environ.get("KUMOY_BENCHMARK_GEOMETRY", "POINT")
+VECTOR_ID = "benchmark-vector"
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # memo: ru_maxrssの単位はLinuxではKB、macOSではバイト
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _report(name: str, server: StandInServer, features: int, seconds: float) -> dict:
+    transferred = server.bytes_sent + server.bytes_received
+    result = {
+        "benchmark": name,
+        "geometry": GEOMETRY,
+        "features": features,
+        "seconds": round(seconds, 3),
+        "features_per_second": round(features / seconds, 1),
+        "megabytes": round(transferred / 1e6, 2),
+        "megabytes_per_second": round(transferred / 1e6 / seconds, 2),
+        "requests": len(server.requests),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+    }
+    print(
+        f"\n{name}: {features:,} features in {seconds:.2f}s "
+        f"({result['features_per_second']:,} features/s, "
+        f"{result['megabytes_per_second']} MB/s, "
+        f"peak RSS {result['peak_rss_mb']} MB)"
+    )
+    output = os.environ.get("KUMOY_BENCHMARK_OUTPUT")
+    if output:
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(result) + "\n")
+    return result
+
+
+def _fields():
+    from qgis.core import QgsField, QgsFields
+    from qgis.PyQt.QtCore import QVariant
+
+    types = {
+        "string": QVariant.String,
+        "integer": QVariant.LongLong,
+        "float": QVariant.Double,
+        "boolean": QVariant.Bool,
+    }
+    fields = QgsFields()
+    fields.append(QgsField("kumoy_id", QVariant.LongLong))
+    for name, type_ in COLUMNS:
+        fields.append(QgsField(name, types[type_]))
+    return fields
+
+
+@pytest.fixture
+def server(qgis_plugin_path):
+    from plugin_dir.kumoy.api.metrics import get_request_metrics
+
+    backend = VectorBackend()
+    backend.add_vector(synthetic_vector(VECTOR_ID, FEATURE_COUNT, GEOMETRY))
+    with StandInServer() as s:
+        backend.install(s)
+        s.backend = backend
+        with use_stand_in_server(s):
+            get_request_metrics().reset()
+            yield s
+            get_request_metrics().dump_to_log()
+
+
+class TestBenchmark:
+    def test_sync_full(self, server):
+        from qgis.core import QgsWkbTypes
+
+        from plugin_dir.kumoy.local_cache import vector as local_cache
+
+        wkb_type = {
+            "POINT": QgsWkbTypes.Point,
+            "LINESTRING": QgsWkbTypes.LineString,
+            "POLYGON": QgsWkbTypes.Polygon,
+        }[GEOMETRY]
+        local_cache.clear(VECTOR_ID)
+        try:
+            started = time.perf_counter()
+            local_cache.sync_local_cache(VECTOR_ID, _fields(), wkb_type)
+            seconds = time.perf_counter() - started
+
+            assert local_cache.get_layer(VECTOR_ID).featureCount() == FEATURE_COUNT
+            _report("sync_full", server, FEATURE_COUNT, seconds)
+        finally:
+            local_cache.clear(VECTOR_ID)
+
+    def test_upload(self, server):
+        from qgis.core import QgsFeature, QgsGeometry, QgsProcessingFeedback
+
+        from plugin_dir.processing.upload_vector.algorithm import (
+            UploadVectorAlgorithm,
+        )
+
+        # アップロード元のメモリレイヤーを合成データから作る
+        source = server.backend.vectors[VECTOR_ID]
+        layer = _memory_layer()
+        features = []
+        for feature in source.features.values():
+            f = QgsFeature(layer.fields())
+            g = QgsGeometry()
+            g.fromWkb(feature["kumoy_wkb"])
+            f.setGeometry(g)
+            for name, value in feature["properties"].items():
+                f[name] = value
+            features.append(f)
+        layer.dataProvider().addFeatures(features)
+        del features
+
+        target = server.backend.add_vector(
+            synthetic_vector("benchmark-upload", 0, GEOMETRY)
+        )
+
+        started = time.perf_counter()
+        UploadVectorAlgorithm()._upload_features(
+            target.id, layer, QgsProcessingFeedback()
+        )
+        seconds = time.perf_counter() - started
+
+        assert len(target.features) == FEATURE_COUNT
+        _report("upload", server, FEATURE_COUNT, seconds)
+        _report_phases("add_features.encode")
+
+
+class TestSerializeBenchmark:
+    """add-features のペイロード作成のみを計測する（通信なし）"""
+
+    @pytest.mark.usefixtures("qgis_plugin_path")
+    def test_serialize_date_heavy(self):
+        from qgis.core import QgsFeature, QgsField, QgsFields, QgsGeometry, QgsPointXY
+        from qgis.PyQt.QtCore import QDate, QDateTime, QTime, QVariant
+
+        from plugin_dir.kumoy.api import payload_codec
+        from plugin_dir.kumoy.api.qgis_vector import (
+            features_payload,
+            serialize_features,
+        )
+
+        count = 100000
+        fields = QgsFields()
+        fields.append(QgsField("kumoy_id", QVariant.LongLong))
+        fields.append(QgsField("name", QVariant.String))
+        for i in range(4):
+            fields.append(QgsField(f"datetime_{i}", QVariant.DateTime))
+        fields.append(QgsField("date", QVariant.Date))
+        fields.append(QgsField("time", QVariant.Time))
+
+        geometry = QgsGeometry.fromPointXY(QgsPointXY(139.7, 35.7))
+        features = []
+        for i in range(count):
+            f = QgsFeature(fields)
+            f.setGeometry(geometry)
+            datetime = QDateTime(2026, 1, 1, 0, 0, 0).addSecs(i)
+            f.setAttributes(
+                [None, f"feature {i}"]
+                + [datetime] * 4
+                + [datetime.date(), QTime(i % 24, 0, 0) if i % 10 else QVariant()]
+            )
+            features.append(f)
+
+        started = time.perf_counter()
+        serialized = serialize_features(features)
+        serialize_seconds = time.perf_counter() - started
+        assert serialized[1]["properties"]["date"] == QDate(2026, 1, 1).toString(
+            "yyyy-MM-dd"
+        )
+
+        started = time.perf_counter()
+        payload_codec.JSON_CODEC.encode({"features": serialized})
+        encode_seconds = time.perf_counter() - started
+        del serialized
+
+        # 地物を変換しながら1つのバッファに書き込む（add_featuresの経路）
+        started = time.perf_counter()
+        body = payload_codec.JSON_CODEC.encode(features_payload(features))
+        stream_seconds = time.perf_counter() - started
+
+        print(
+            f"\nserialize_date_heavy: {count:,} features, "
+            f"serialize {serialize_seconds:.2f}s "
+            f"({count / serialize_seconds:,.0f} features/s), "
+            f"JSON encode {encode_seconds:.2f}s, "
+            f"streaming serialize+encode {stream_seconds:.2f}s "
+            f"({len(body) / 1e6:.1f} MB)"
+        )
+
+
+class TestCacheWriteBenchmark:
+    """キャッシュ新規作成時のGPKGへの書き込みのみを計測する（通信なし）"""
+
+    @pytest.mark.usefixtures("qgis_plugin_path")
+    def test_write_cache(self, tmp_path):
+        from qgis.core import (
+            QgsCoordinateReferenceSystem,
+            QgsFeature,
+            QgsGeometry,
+            QgsProject,
+            QgsVectorFileWriter,
+            QgsWkbTypes,
+        )
+
+        from plugin_dir.kumoy.local_cache.bulk_writer import GpkgBulkWriter
+        from plugin_dir.kumoy.local_cache.vector import _create_cache_table
+
+        wkb_type = {
+            "POINT": QgsWkbTypes.Point,
+            "LINESTRING": QgsWkbTypes.LineString,
+            "POLYGON": QgsWkbTypes.Polygon,
+        }[GEOMETRY]
+        fields = _fields()
+        features = list(
+            synthetic_vector(VECTOR_ID, FEATURE_COUNT, GEOMETRY).features.values()
+        )
+
+        # 従来の経路: QgsVectorFileWriter.addFeature で1件ずつ書き込む
+        options = QgsVectorFileWriter.SaveVectorOptions()
+        options.layerOptions = ["FID=kumoy_id"]
+        options.driverName = "GPKG"
+        options.fileEncoding = "UTF-8"
+        started = time.perf_counter()
+        writer = QgsVectorFileWriter.create(
+            str(tmp_path / "per_feature.gpkg"),
+            fields,
+            wkb_type,
+            QgsCoordinateReferenceSystem("EPSG:4326"),
+            QgsProject.instance().transformContext(),
+            options,
+        )
+        for feature in features:
+            qgsfeature = QgsFeature(fields)
+            g = QgsGeometry()
+            g.fromWkb(feature["kumoy_wkb"])
+            qgsfeature.setGeometry(g)
+            qgsfeature["kumoy_id"] = feature["kumoy_id"]
+            for name, value in feature["properties"].items():
+                qgsfeature[name] = value
+            writer.addFeature(qgsfeature)
+        del writer
+        per_feature_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        bulk_file = str(tmp_path / "bulk.gpkg")
+        _create_cache_table(bulk_file, fields, wkb_type)
+        with GpkgBulkWriter(bulk_file, fields) as bulk_writer:
+            for feature in features:
+                bulk_writer.add(feature)
+        bulk_seconds = time.perf_counter() - started
+
+        print(
+            f"\nwrite_cache: {FEATURE_COUNT:,} {GEOMETRY} features, "
+            f"per-feature {FEATURE_COUNT / per_feature_seconds:,.0f} rows/s, "
+            f"bulk {FEATURE_COUNT / bulk_seconds:,.0f} rows/s "
+            f"({per_feature_seconds / bulk_seconds:.1f}x)"
+        )
+
+
+def _report_phases(*names: str) -> None:
+    from plugin_dir.kumoy.api.metrics import get_request_metrics
+
+    phases = get_request_metrics().phase_summary()
+    for name in names:
+        if name in phases:
+            print(f"{name}: {phases[name]['seconds_total']:.2f}s")
+
+
+def _memory_layer():
+    from qgis.core import QgsVectorLayer
+
+    layer = QgsVectorLayer(f"{GEOMETRY}?crs=EPSG:4326", "benchmark", "memory")
+    layer.dataProvider().addAttributes([f for f in _fields() if f.name() != "kumoy_id"])
+    layer.updateFields()
+    return layer
@@ -0,0 +1,173 @@
+"""GpkgBulkWriter・キャッシュの空間インデックスのテスト（QGIS環境が必要）"""
+
+import struct
+
+import pytest
+
+
+def _fields():
+    from qgis.core import QgsField, QgsFields
+    from qgis.PyQt.QtCore import QVariant
+
+    fields = QgsFields()
+    fields.append(QgsField("kumoy_id", QVariant.LongLong))
+    fields.append(QgsField("name", QVariant.String))
+    fields.append(QgsField("value", QVariant.Double))
+    fields.append(QgsField("active", QVariant.Bool))
+    return fields
+
+
+def _point(x: float, y: float) -> bytes:
+    return struct.pack("<BIdd", 1, 1, x, y)
+
+
+@pytest.fixture
+def cache_file(qgis_plugin_path, tmp_path):
+    from qgis.core import QgsWkbTypes
+
+    from plugin_dir.kumoy.local_cache.vector import _create_cache_table
+
+    path = str(tmp_path / "vector.gpkg")
+    _create_cache_table(path, _fields(), QgsWkbTypes.Point)
+    return path
+
+
+class TestGpkgBulkWriter:
+    def test_writes_features_across_transactions(self, cache_file):
+        from qgis.core import QgsVectorLayer
+
+        from plugin_dir.kumoy.local_cache.bulk_writer import GpkgBulkWriter
+
+        with GpkgBulkWriter(cache_file, _fields(), transaction_size=2) as writer:
+            for i in range(1, 6):
+                writer.add(
+                    {
+                        "kumoy_id": i * 10,
+                        "kumoy_wkb": _point(139 + i, 35),
+                        "properties": {
+                            "name": f"feature {i}",
+                            "value": None if i == 3 else i / 2,
+                            "active": i % 2 == 0,
+                        },
+                    }
+                )
+        assert writer.written == 5
+
+        layer = QgsVectorLayer(cache_file, "cache", "ogr")
+        assert layer.featureCount() == 5
+        feature = layer.getFeature(20)
+        assert feature["kumoy_id"] == 20
+        assert feature["name"] == "feature 2"
+        assert feature["value"] == 1.0
+        assert feature["active"] is True
+        assert feature.geometry().asPoint().x() == 141
+        # memo: NULLはQGISのバージョンによりNoneまたはNULLのQVariantになる
+        assert not layer.getFeature(30)["value"]
+
+    def test_rolls_back_on_error(self, cache_file):
+        from qgis.core import QgsVectorLayer
+
+        from plugin_dir.kumoy.local_cache.bulk_writer import GpkgBulkWriter
+
+        with pytest.raises(RuntimeError):
+            with GpkgBulkWriter(cache_file, _fields()) as writer:
+                writer.add(
+                    {"kumoy_id": 1, "kumoy_wkb": _point(139, 35), "properties": {}}
+                )
+                raise RuntimeError("fetch failed")
+
+        assert QgsVectorLayer(cache_file, "cache", "ogr").featureCount() == 0
+
+    def test_failed_commit_raises(self, cache_file):
+        from osgeo import ogr
+        from qgis.core import QgsVectorLayer
+
+        from plugin_dir.kumoy.local_cache.bulk_writer import GpkgBulkWriter
+
+        class BusyDataset:
+            """CommitTransaction fails as with SQLITE_BUSY"""
+
+            def __init__(self, dataset):
+                self._dataset = dataset
+
+            def CommitTransaction(self):
+                return ogr.OGRERR_FAILURE
+
+            def __getattr__(self, name):
+                return getattr(self._dataset, name)
+
+        with pytest.raises(Exception, match="Error committing"):
+            with GpkgBulkWriter(cache_file, _fields()) as writer:
+                writer._dataset = BusyDataset(writer._dataset)
+                writer.add(
+                    {"kumoy_id": 1, "kumoy_wkb": _point(139, 35), "properties": {}}
+                )
+
+        assert QgsVectorLayer(cache_file, "cache", "ogr").featureCount() == 0
+
+    def test_failed_delete_raises(self, cache_file):
+        from plugin_dir.kumoy.local_cache.bulk_writer import GpkgBulkWriter
+
+        with pytest.raises(Exception, match="Error executing SQL"):
+            with GpkgBulkWriter(
+                cache_file, _fields(), relax_durability=False
+            ) as writer:
+                writer._execute('DELETE FROM "missing" WHERE fid IN (1)')
+
+    def test_delete_and_replace_in_one_transaction(self, cache_file):
+        from qgis.core import QgsVectorLayer
+
+        from plugin_dir.kumoy.local_cache.bulk_writer import GpkgBulkWriter
+
+        def record(kumoy_id, name):
+            return {
+                "kumoy_id": kumoy_id,
+                "kumoy_wkb": _point(139, 35),
+                "properties": {"name": name},
+            }
+
+        with GpkgBulkWriter(cache_file, _fields()) as writer:
+            for i in range(1, 4):
+                writer.add(record(i, f"feature {i}"))
+
+        # 1を削除、2を更新（存在しない99の削除は無視される）
+        with GpkgBulkWriter(cache_file, _fields(), relax_durability=False) as writer:
+            writer.delete([1, 2, 99])
+            writer.add(record(2, "renamed"))
+
+        layer = QgsVectorLayer(cache_file, "cache", "ogr")
+        assert sorted(f["kumoy_id"] for f in layer.getFeatures()) == [2, 3]
+        assert layer.getFeature(2)["name"] == "renamed"
+
+
+class TestSpatialIndex:
+    def test_built_after_bulk_load_and_rebuilt_when_stale(self, cache_file):
+        from osgeo import ogr
+
+        from plugin_dir.kumoy.local_cache import spatial_index
+        from plugin_dir.kumoy.local_cache.bulk_writer import GpkgBulkWriter
+
+        # テーブルは空間インデックスなしで作成される
+        assert not spatial_index.has_spatial_index(cache_file)
+
+        with GpkgBulkWriter(cache_file, _fields()) as writer:
+            for i in range(1, 4):
+                writer.add(
+                    {"kumoy_id": i, "kumoy_wkb": _point(139 + i, 35), "properties": {}}
+                )
+        spatial_index.build_spatial_index(cache_file)
+        assert spatial_index.has_spatial_index(cache_file)
+        assert not spatial_index.ensure_spatial_index(cache_file, verify=True)
+
+        # R-treeのエントリを消して古い状態にする
+        dataset = ogr.Open(cache_file, 1)
+        layer = dataset.GetLayer(0)
+        dataset.ExecuteSQL(
+            f'DELETE FROM "rtree_{layer.GetName()}_{layer.GetGeometryColumn()}"'
+            " WHERE id = 1"
+        )
+        del dataset
+
+        assert not spatial_index.ensure_spatial_index(cache_file)
+        assert spatial_index.ensure_spatial_index(cache_file, verify=True)
+        assert not spatial_index.ensure_spatial_index(cache_file, verify=True)
@@ -0,0 +1,149 @@
+import threading
+
+import pytest
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+class TestRequestCoalescer:
+    """同じリクエストが1回の送信にまとめられることを検証する"""
+
+    def _coalescer(self, **kwargs):
+        from plugin_dir.kumoy.api.coalesce import RequestCoalescer
+
+        return RequestCoalescer(**kwargs)
+
+    def test_concurrent_calls_share_one_request(self):
+        coalescer = self._coalescer()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def send():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return {"id": "a"}
+
+        results = []
+        owner = threading.Thread(
+            target=lambda: results.append(coalescer.run("k", send))
+        )
+        owner.start()
+        started.wait()
+        joiner = threading.Thread(
+            target=lambda: results.append(coalescer.run("k", send))
+        )
+        joiner.start()
+        while coalescer.stats().joined == 0:
+            pass
+        release.set()
+        owner.join()
+        joiner.join()
+
+        assert len(calls) == 1
+        assert results == [{"id": "a"}, {"id": "a"}]
+        # 呼び出し元ごとに別のオブジェクトを返す
+        assert results[0] is not results[1]
+
+    def test_gui_thread_does_not_wait_for_other_threads(self):
+        coalescer = self._coalescer()
+        started = threading.Event()
+        release = threading.Event()
+
+        def slow_send():
+            started.set()
+            release.wait()
+            return "worker"
+
+        owner = threading.Thread(target=lambda: coalescer.run("k", slow_send))
+        owner.start()
+        started.wait()
+        try:
+            # テストはGUIスレッドで実行されるので、実行中のリクエストを待たずに送信する
+            assert coalescer.run("k", lambda: "gui") == "gui"
+        finally:
+            release.set()
+            owner.join()
+        assert coalescer.stats().joined == 0
+        assert coalescer.stats().executed == 2
+
+    def test_result_is_not_copied_without_joiners_or_memo(self):
+        coalescer = self._coalescer()
+        result = {"id": "a"}
+
+        assert coalescer.run("k", lambda: result) is result
+
+    def test_errors_are_not_memoised(self):
+        coalescer = self._coalescer()
+
+        def send():
+            raise ValueError("boom")
+
+        with pytest.raises(ValueError):
+            coalescer.run("k", send)
+        # 失敗した結果はメモしない
+        with pytest.raises(ValueError):
+            coalescer.run("k", send, memo=True)
+        assert coalescer.stats().executed == 2
+
+    def test_memo_is_reused_until_invalidated(self):
+        coalescer = self._coalescer()
+        calls = []
+
+        def send():
+            calls.append(1)
+            return {"n": len(calls)}
+
+        assert coalescer.run("k", send, memo=True) == {"n": 1}
+        result = coalescer.run("k", send, memo=True)
+        assert result == {"n": 1}
+        result["n"] = 100
+        assert coalescer.run("k", send, memo=True) == {"n": 1}
+
+        coalescer.invalidate()
+        assert coalescer.run("k", send, memo=True) == {"n": 2}
+
+    def test_memo_expires(self):
+        coalescer = self._coalescer(memo_ttl=0)
+        calls = []
+
+        def send():
+            calls.append(1)
+            return len(calls)
+
+        coalescer.run("k", send, memo=True)
+        coalescer.run("k", send, memo=True)
+        assert len(calls) == 2
+
+    def test_result_started_before_invalidation_is_not_memoised(self):
+        coalescer = self._coalescer()
+
+        def send():
+            # 送信中に変更リクエストが完了した
+            coalescer.invalidate()
+            return "old"
+
+        coalescer.run("k", send, memo=True)
+        assert coalescer.run("k", lambda: "new", memo=True) == "new"
+
+    def test_key_includes_body(self):
+        coalescer = self._coalescer()
+        assert coalescer.make_key("POST", "u", b"{}") != coalescer.make_key(
+            "POST", "u", b'{"after_id": 1}'
+        )
+
+    def test_key_includes_variant(self):
+        coalescer = self._coalescer()
+        json_key = coalescer.make_key("POST", "u", b"{}", "application/json")
+        msgpack_key = coalescer.make_key("POST", "u", b"{}", "application/msgpack")
+
+        assert json_key != msgpack_key
+        assert json_key == coalescer.make_key("POST", "u", b"{}", "application/json")
+
+    def test_read_only_endpoints(self):
+        from plugin_dir.kumoy.api.coalesce import is_read_only
+
+        assert is_read_only("GET", "/vector/{id}")
+        assert is_read_only("POST", "/_qgis/vector/{id}/get-diff")
+        assert not is_read_only("POST", "/_qgis/vector/{id}/add-features")
+        assert not is_read_only("PUT", "/vector/{id}")
@@ -0,0 +1,82 @@
+"""キャッシュの容量制限（LRU）のテスト（QGIS環境が必要）"""
+
+MB = 1024 * 1024
+NOW = 1_000_000.0
+
+
+def _item(id, size_mb, idle_seconds, kind="vector"):
+    from plugin_dir.kumoy.local_cache.eviction import CacheItem
+
+    return CacheItem(kind, id, size_mb * MB, NOW - idle_seconds)
+
+
+class TestPlanEviction:
+    def test_evicts_least_recently_accessed_first(self, qgis_plugin_path):
+        from plugin_dir.kumoy.local_cache.eviction import plan_eviction
+
+        items = [
+            _item("new", 40, 1000),
+            _item("old", 40, 9000),
+            _item("middle", 40, 5000, kind="map"),
+        ]
+
+        evicted = plan_eviction(items, 50 * MB, set(), now=NOW)
+
+        assert [item.id for item in evicted] == ["old", "middle"]
+
+    def test_nothing_to_evict_under_quota(self, qgis_plugin_path):
+        from plugin_dir.kumoy.local_cache.eviction import plan_eviction
+
+        items = [_item("a", 10, 9000), _item("b", 10, 9000)]
+
+        assert plan_eviction(items, 20 * MB, set(), now=NOW) == []
+
+    def test_keeps_protected_and_recently_accessed(self, qgis_plugin_path):
+        from plugin_dir.kumoy.local_cache.eviction import (
+            MIN_IDLE_SECONDS,
+            plan_eviction,
+        )
+
+        items = [
+            _item("open-layer", 40, 9000),
+            _item("just-synced", 40, MIN_IDLE_SECONDS - 1),
+            _item("idle", 40, 5000),
+        ]
+
+        evicted = plan_eviction(items, 10 * MB, {"open-layer"}, now=NOW)
+
+        # 容量に収まらなくても保護されたキャッシュは残す
+        assert [item.id for item in evicted] == ["idle"]
+
+
+class TestClearIdleVector:
+    def test_skips_vector_being_synced(self, qgis_plugin_path, monkeypatch):
+        from plugin_dir.kumoy.local_cache import eviction
+        from plugin_dir.kumoy.local_cache import vector as vector_cache
+
+        cleared = []
+        monkeypatch.setattr(
+            vector_cache, "clear", lambda id: cleared.append(id) or True
+        )
+
+        with vector_cache._sync_lock("syncing"):
+            assert not eviction._clear_idle_vector("syncing")
+        assert cleared == []
+
+        # 同期が終われば削除できる
+        assert eviction._clear_idle_vector("syncing")
+        assert cleared == ["syncing"]
+
+    def test_skips_vector_opened_after_scheduling(self, qgis_plugin_path, monkeypatch):
+        from plugin_dir.kumoy.local_cache import eviction
+        from plugin_dir.kumoy.local_cache import vector as vector_cache
+
+        cleared = []
+        monkeypatch.setattr(
+            vector_cache, "clear", lambda id: cleared.append(id) or True
+        )
+        monkeypatch.setattr(eviction, "_open_vector_ids", frozenset({"opened"}))
+
+        assert not eviction._clear_idle_vector("opened")
+        assert eviction._clear_idle_vector("closed")
+        assert cleared == ["closed"]
@@ -0,0 +1,63 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def token_module(qgis_plugin_path, monkeypatch):
+    from plugin_dir.kumoy import get_token
+    from plugin_dir.settings_manager import get_settings, store_setting
+
+    saved = get_settings()
+    store_setting("id_token", "old-token")
+    store_setting("refresh_token", "refresh-token")
+    # 有効期限まで5分を切っているのでリフレッシュが必要
+    store_setting(
+        "token_expires_at", (datetime.now() + timedelta(minutes=1)).isoformat()
+    )
+    monkeypatch.setattr(get_token, "_save_token_to_cache", lambda _response: None)
+    yield get_token
+    get_token._token_cache.cancel_scheduled_refresh()
+    store_setting("id_token", saved.id_token)
+    store_setting("refresh_token", saved.refresh_token)
+    store_setting("token_expires_at", saved.token_expires_at)
+
+
+def test_concurrent_callers_share_one_refresh(token_module, monkeypatch):
+    calls = []
+
+    def fake_refresh(refresh_token):
+        calls.append(refresh_token)
+        time.sleep(0.2)
+        return {"id_token": "new-token", "expires_in": 3600}
+
+    monkeypatch.setattr(token_module, "_refresh_token", fake_refresh)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(token_module.get_token()))
+        for _ in range(5)
+    ]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ["refresh-token"]
+    assert results == ["new-token"] * 5
+
+
+def test_valid_token_is_served_from_memory(token_module, monkeypatch):
+    from plugin_dir.settings_manager import store_setting
+
+    store_setting("token_expires_at", (datetime.now() + timedelta(hours=1)).isoformat())
+    assert token_module.get_token() == "old-token"
+
+    # 設定を読み直さないこと
+    def fail():
+        raise AssertionError("settings should not be read")
+
+    monkeypatch.setattr(token_module, "get_settings", fail)
+    assert token_module.get_token() == "old-token"
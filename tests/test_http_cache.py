@@ -0,0 +1,60 @@
+import base64
+import json
+
+import pytest
+
+
+def _auth_header(sub: str) -> bytes:
+    payload = base64.urlsafe_b64encode(json.dumps({"sub": sub}).encode()).decode()
+    return f"Bearer header.{payload.rstrip('=')}.signature".encode()
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+class TestHttpCache:
+    """HttpCache がETag/Last-Modified付きのレスポンスを保持することを検証する"""
+
+    def _mod(self):
+        from plugin_dir.kumoy.api import http_cache
+
+        return http_cache
+
+    def test_store_and_lookup(self, tmp_path):
+        m = self._mod()
+        cache = m.HttpCache(str(tmp_path))
+        key = cache.make_key("https://example.com/api/organization", _auth_header("a"))
+        cache.store(key, etag='"v1"', last_modified="", body=b"[]")
+
+        entry = cache.lookup(key)
+        assert entry.etag == '"v1"'
+        assert entry.body == b"[]"
+
+    def test_persisted_to_disk(self, tmp_path):
+        m = self._mod()
+        key = m.HttpCache(str(tmp_path)).make_key("u", _auth_header("a"))
+        m.HttpCache(str(tmp_path)).store(key, "", "Mon, 01 Jan 2024", b"{}")
+
+        entry = m.HttpCache(str(tmp_path)).lookup(key)
+        assert entry.last_modified == "Mon, 01 Jan 2024"
+        assert entry.body == b"{}"
+
+    def test_response_without_validators_is_not_cached(self, tmp_path):
+        m = self._mod()
+        cache = m.HttpCache(str(tmp_path))
+        key = cache.make_key("u", _auth_header("a"))
+        cache.store(key, etag="", last_modified="", body=b"{}")
+        assert cache.lookup(key) is None
+
+    def test_key_is_per_user(self):
+        m = self._mod()
+        cache = m.HttpCache()
+        assert cache.make_key("u", _auth_header("a")) != cache.make_key(
+            "u", _auth_header("b")
+        )
+
+    def test_key_survives_token_refresh(self):
+        """同じユーザーであればトークンが更新されてもキーは変わらないこと"""
+        m = self._mod()
+        cache = m.HttpCache()
+        first = _auth_header("a")
+        refreshed = first.replace(b"header", b"header2")
+        assert cache.make_key("u", first) == cache.make_key("u", refreshed)
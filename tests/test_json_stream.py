@@ -0,0 +1,45 @@
+import json
+
+import pytest
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+class TestIterJsonArray:
+    """iter_json_array が json.loads と同じ結果を要素ごとに返すことを検証する"""
+
+    def _mod(self):
+        from plugin_dir.kumoy.api import json_stream
+
+        return json_stream
+
+    def test_matches_json_loads_for_any_chunk_size(self):
+        m = self._mod()
+        data = [
+            {"kumoy_id": i, "kumoy_wkb": "AQ" * i, "properties": {"名前": "東京" * i}}
+            for i in range(30)
+        ] + [123456789, 1.5e10, -0.25, "x", None, [1, [2]], True, {}]
+        for ensure_ascii in (True, False):
+            raw = json.dumps(data, ensure_ascii=ensure_ascii, indent=1).encode()
+            for chunk_size in (1, 2, 3, 7, 64, 4096):
+                assert list(m.iter_json_array(raw, chunk_size)) == data
+
+    def test_empty(self):
+        m = self._mod()
+        assert list(m.iter_json_array(b"")) == []
+        assert list(m.iter_json_array(b" [ ] ")) == []
+
+    def test_element_larger_than_chunk(self):
+        m = self._mod()
+        data = [{"kumoy_wkb": "A" * 1_000_000}, 1]
+        raw = json.dumps(data).encode()
+        assert list(m.iter_json_array(raw, chunk_size=16)) == data
+
+    def test_not_an_array(self):
+        m = self._mod()
+        with pytest.raises(ValueError):
+            list(m.iter_json_array(b'{"message": "Not Found"}'))
+
+    def test_truncated(self):
+        m = self._mod()
+        with pytest.raises(ValueError):
+            list(m.iter_json_array(b'[{"a": 1}, {"a": '))
@@ -0,0 +1,110 @@
+"""キャッシュのマニフェストのテスト（QGIS環境が必要）"""
+
+import os
+
+import pytest
+
+
+@pytest.fixture
+def manifest(qgis_plugin_path, tmp_path, monkeypatch):
+    from plugin_dir.kumoy.local_cache import manifest
+
+    monkeypatch.setattr(manifest, "get_cache_dir", lambda: str(tmp_path))
+    return manifest
+
+
+def _fields(*names):
+    from qgis.core import QgsField, QgsFields
+    from qgis.PyQt.QtCore import QVariant
+
+    fields = QgsFields()
+    for name in names:
+        fields.append(QgsField(name, QVariant.String))
+    return fields
+
+
+class TestManifest:
+    def test_record_and_get_entry(self, manifest):
+        assert manifest.get_entry("vector-1") is None
+
+        manifest.record_sync(
+            "vector-1",
+            schema_hash="abc",
+            feature_count=10,
+            byte_size=4096,
+            last_updated="2026-01-01T00:00:00Z",
+            sync_seconds=1.5,
+        )
+
+        entry = manifest.get_entry("vector-1")
+        assert entry.format_version == manifest.CACHE_FORMAT_VERSION
+        assert entry.schema_hash == "abc"
+        assert entry.feature_count == 10
+        assert entry.byte_size == 4096
+        assert entry.last_updated == "2026-01-01T00:00:00Z"
+        assert entry.last_accessed is not None
+
+        manifest.delete_entry("vector-1")
+        assert manifest.get_entry("vector-1") is None
+
+    def test_entries_are_ordered_by_last_access(self, manifest):
+        for vector_id in ("a", "b"):
+            manifest.record_sync(vector_id, "h", 0, 0, "2026-01-01T00:00:00Z", 0.1)
+        manifest.touch("a")
+
+        assert [e.vector_id for e in manifest.entries()] == ["b", "a"]
+
+    def test_schema_hash_changes_with_columns(self, manifest):
+        from qgis.core import QgsWkbTypes
+
+        point = QgsWkbTypes.Point
+        assert manifest.schema_hash(_fields("a"), point) == manifest.schema_hash(
+            _fields("a"), point
+        )
+        assert manifest.schema_hash(_fields("a"), point) != manifest.schema_hash(
+            _fields("a", "b"), point
+        )
+        assert manifest.schema_hash(_fields("a"), point) != manifest.schema_hash(
+            _fields("a"), QgsWkbTypes.Polygon
+        )
+
+    def test_imports_legacy_qsettings(self, manifest, tmp_path, monkeypatch):
+        from qgis.PyQt.QtCore import QSettings
+
+        # memo: 実際のQGISの設定を書き換えないよう、一時的なiniファイルの設定を使う
+        settings_file = str(tmp_path / "settings.ini")
+        monkeypatch.setattr(
+            manifest, "QSettings", lambda: QSettings(settings_file, QSettings.IniFormat)
+        )
+        with open(os.path.join(tmp_path, "legacy.gpkg"), "wb") as f:
+            f.write(b"x" * 100)
+        qsettings = manifest.QSettings()
+        qsettings.beginGroup(manifest.LEGACY_SETTING_GROUP)
+        qsettings.setValue("legacy", "2025-01-01T00:00:00Z")
+        # キャッシュファイルのないエントリは取り込まない
+        qsettings.setValue("missing", "2025-01-01T00:00:00Z")
+        qsettings.endGroup()
+
+        entry = manifest.get_entry("legacy")
+
+        assert entry.last_updated == "2025-01-01T00:00:00Z"
+        assert entry.format_version == 1
+        assert entry.schema_hash is None
+        assert entry.byte_size == 100
+        assert manifest.get_entry("missing") is None
+
+    def test_migrates_once_per_process(self, manifest, monkeypatch):
+        migrations = []
+        migrate = manifest._migrate
+        monkeypatch.setattr(
+            manifest, "_migrate", lambda conn: migrations.append(migrate(conn))
+        )
+
+        manifest.get_entry("vector-1")
+        manifest.entries()
+
+        assert len(migrations) == 1
+        qsettings = manifest.QSettings()
+        qsettings.beginGroup(manifest.LEGACY_SETTING_GROUP)
+        assert qsettings.childKeys() == []
+        qsettings.endGroup()
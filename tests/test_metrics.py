@@ -0,0 +1,108 @@
+import json
+import os
+
+import pytest
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+class TestRequestMetrics:
+    """RequestMetrics がエンドポイントごとに集計できることを検証する"""
+
+    def _mod(self):
+        from plugin_dir.kumoy.api import metrics
+
+        return metrics
+
+    def test_summary_per_endpoint(self):
+        m = self._mod()
+        metrics = m.RequestMetrics()
+        for wall_time in (0.02, 0.3, 0.4):
+            metrics.record("/vector/{id}", "GET", 200, wall_time, 0, 100, 0.001)
+        metrics.record("/vector/{id}", "GET", 404, 0.01, 0, 10, 0.0)
+        metrics.record("/_qgis/vector/{id}/get-diff", "POST", 200, 1.0, 50, 10, 0.0)
+
+        summary = metrics.summary()
+        s = summary["GET /vector/{id}"]
+        assert s.count == 4
+        assert s.errors == 1
+        assert s.response_bytes == 310
+        assert s.wall_time_max == 0.4
+        assert s.histogram == {"<=0.05s": 2, "<=0.5s": 2}
+        assert summary["POST /_qgis/vector/{id}/get-diff"].request_bytes == 50
+
+    def test_network_errors_are_counted(self):
+        m = self._mod()
+        metrics = m.RequestMetrics()
+        metrics.record("/a", "GET", 200, 0.1, 0, 5, 0.0)
+        # タイムアウトなどで応答がない場合はステータスがない
+        metrics.record("/a", "GET", None, 30.0, 0, 0, 0.0)
+
+        assert metrics.summary()["GET /a"].errors == 1
+
+    def test_rolling_window(self):
+        m = self._mod()
+        metrics = m.RequestMetrics(max_samples=3)
+        for i in range(5):
+            metrics.record("/a", "GET", 200, float(i), 0, 0, 0.0)
+        assert [s.wall_time for s in metrics.samples()] == [2.0, 3.0, 4.0]
+
+    def test_dump_to_file(self, tmp_path):
+        m = self._mod()
+        metrics = m.RequestMetrics()
+        metrics.record("/a", "GET", 200, 0.1, 0, 5, 0.0)
+        with metrics.measure("decode", items=3):
+            pass
+
+        path = tmp_path / "metrics.json"
+        metrics.dump_to_file(str(path))
+        dumped = json.loads(path.read_text())
+        assert dumped["endpoints"]["GET /a"]["count"] == 1
+        assert dumped["phases"]["decode"]["items"] == 3
+        assert len(dumped["samples"]) == 1
+
+    def test_dump_writes_timestamped_file(self, tmp_path):
+        m = self._mod()
+        metrics = m.RequestMetrics()
+        assert metrics.dump(str(tmp_path)) is None
+
+        metrics.record("/a", "GET", 200, 0.1, 0, 5, 0.0)
+        path = metrics.dump(str(tmp_path / "metrics"))
+
+        assert path.startswith(str(tmp_path / "metrics"))
+        assert json.loads(open(path).read())["endpoints"]["GET /a"]["count"] == 1
+
+    def test_dump_metrics_uses_metrics_dir(self, tmp_path, monkeypatch):
+        m = self._mod()
+        monkeypatch.setattr(m, "get_metrics_dir", lambda: str(tmp_path))
+        m.get_request_metrics().reset()
+        m.get_request_metrics().record("/a", "GET", 200, 0.1, 0, 5, 0.0)
+        try:
+            path = m.dump_metrics()
+        finally:
+            m.get_request_metrics().reset()
+
+        assert os.path.dirname(path) == str(tmp_path)
+
+    def test_dump_on_unload_is_gated_by_setting(self, tmp_path, monkeypatch):
+        from plugin_dir import settings_manager
+
+        m = self._mod()
+        monkeypatch.setattr(m, "get_metrics_dir", lambda: str(tmp_path))
+        m.get_request_metrics().reset()
+        m.get_request_metrics().record("/a", "GET", 200, 0.1, 0, 5, 0.0)
+        try:
+            monkeypatch.setattr(
+                settings_manager, "get_settings", settings_manager.UserSettings
+            )
+            assert m.dump_metrics_if_enabled() is None
+            assert os.listdir(tmp_path) == []
+
+            monkeypatch.setattr(
+                settings_manager,
+                "get_settings",
+                lambda: settings_manager.UserSettings(dump_metrics_on_unload="true"),
+            )
+            assert m.dump_metrics_if_enabled() is not None
+            assert len(os.listdir(tmp_path)) == 1
+        finally:
+            m.get_request_metrics().reset()
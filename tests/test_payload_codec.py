@@ -0,0 +1,133 @@
+import struct
+
+import pytest
+
+WKB = bytes.fromhex("0101000000000000000000f03f0000000000000040")
+DATA = {
+    "features": [
+        {"kumoy_id": 1, "kumoy_wkb": WKB, "properties": {"name": "東京", "n": 1.5}},
+        {"kumoy_id": 2, "kumoy_wkb": WKB[:5], "properties": {"name": None}},
+    ]
+}
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+class TestPayloadCodecs:
+    """各コーデックでWKBがbytesのまま往復することを検証する"""
+
+    def _mod(self):
+        from plugin_dir.kumoy.api import payload_codec
+
+        return payload_codec
+
+    def test_json_round_trip(self):
+        m = self._mod()
+        body = m.JSON_CODEC.encode(DATA)
+        assert b'"kumoy_wkb": "AQEAAAAAAAAAAADwPwAAAAAAAABA"' in body
+        assert m.JSON_CODEC.decode(body) == DATA
+        assert (
+            list(m.JSON_CODEC.iter_array(m.JSON_CODEC.encode(DATA["features"])))
+            == (DATA["features"])
+        )
+
+    def test_wkb_frames_round_trip(self):
+        m = self._mod()
+        codec = m.WKB_FRAMES_CODEC
+        body = codec.encode(DATA)
+        assert codec.decode(body) == DATA
+        assert (
+            list(codec.iter_array(codec.encode(DATA["features"]))) == (DATA["features"])
+        )
+        # base64より小さいこと
+        assert len(body) < len(m.JSON_CODEC.encode(DATA))
+
+    def test_record_stream_matches_document_encoding(self):
+        m = self._mod()
+        stream = m.RecordStream("features", lambda: iter(DATA["features"]))
+        for codec in (m.JSON_CODEC, m.WKB_FRAMES_CODEC):
+            assert codec.decode(bytes(codec.encode(stream))) == DATA
+            # 再エンコード（JSONへのフォールバック）しても同じ内容になる
+            assert codec.decode(bytes(codec.encode(stream))) == DATA
+
+    def test_empty_record_stream(self):
+        m = self._mod()
+        stream = m.RecordStream("features", lambda: iter([]))
+        assert m.JSON_CODEC.decode(bytes(m.JSON_CODEC.encode(stream))) == {
+            "features": []
+        }
+
+    def test_wkb_frames_layout(self):
+        m = self._mod()
+        body = m.WKB_FRAMES_CODEC.encode([{"kumoy_wkb": b"\x01\x02"}])
+        document = b'[{"kumoy_wkb": 0}]'
+        assert body == (
+            b"KMYW\x01"
+            + struct.pack(">I", len(document))
+            + document
+            + struct.pack(">I", 2)
+            + b"\x01\x02"
+        )
+
+    def test_truncated_frames(self):
+        m = self._mod()
+        body = m.WKB_FRAMES_CODEC.encode([{"kumoy_wkb": WKB}])
+        with pytest.raises(ValueError):
+            m.WKB_FRAMES_CODEC.decode(body[:-1])
+
+    def test_codec_for_content_type(self):
+        m = self._mod()
+        assert m.codec_for_content_type("application/json; charset=utf-8") is (
+            m.JSON_CODEC
+        )
+        assert m.codec_for_content_type(m.WKB_FRAMES_CONTENT_TYPE) is (
+            m.WKB_FRAMES_CODEC
+        )
+        assert m.codec_for_content_type("") is m.JSON_CODEC
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+class TestNegotiateCodec:
+    """negotiate_codec がサーバーのパラメータを1度だけ参照すること"""
+
+    @pytest.fixture
+    def params(self, monkeypatch):
+        from plugin_dir.kumoy.api import payload_codec
+
+        lookups = []
+        params = {}
+
+        class Service:
+            def last_known(self):
+                lookups.append(True)
+                return params
+
+        monkeypatch.setattr(payload_codec, "get_public_params_service", Service)
+        monkeypatch.setattr(payload_codec, "_binary_enabled", True)
+        monkeypatch.setattr(payload_codec, "_negotiated", None)
+        return params, lookups
+
+    def test_codec_is_cached(self, params):
+        from plugin_dir.kumoy.api import payload_codec
+
+        params, lookups = params
+        params[payload_codec.PUBLIC_PARAMS_CODECS_KEY] = [
+            payload_codec.WKB_FRAMES_CONTENT_TYPE
+        ]
+
+        assert payload_codec.negotiate_codec() is payload_codec.WKB_FRAMES_CODEC
+        assert payload_codec.negotiate_codec() is payload_codec.WKB_FRAMES_CODEC
+        assert len(lookups) == 1
+
+    def test_new_params_are_consulted_again(self, params):
+        from plugin_dir.kumoy.api import payload_codec
+
+        params, lookups = params
+        assert payload_codec.negotiate_codec() is payload_codec.JSON_CODEC
+
+        params[payload_codec.PUBLIC_PARAMS_CODECS_KEY] = [
+            payload_codec.WKB_FRAMES_CONTENT_TYPE
+        ]
+        payload_codec._on_setting_changed(payload_codec.PUBLIC_PARAMS_SETTING_KEY)
+
+        assert payload_codec.negotiate_codec() is payload_codec.WKB_FRAMES_CODEC
+        assert len(lookups) == 2
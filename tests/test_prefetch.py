@@ -0,0 +1,70 @@
+"""FeaturePrefetcher をスタンドインサーバーに対して実行するテスト（QGIS環境が必要）"""
+
+import pytest
+
+from .stand_in_server import StandInServer, use_stand_in_server
+from .stand_in_vectors import VectorBackend, synthetic_vector
+
+
+@pytest.fixture
+def server(qgis_plugin_path):
+    backend = VectorBackend()
+    backend.add_vector(synthetic_vector("vector-1", 12000))
+    with StandInServer() as s:
+        backend.install(s)
+        with use_stand_in_server(s):
+            yield s
+
+
+class TestFeaturePrefetcher:
+    def _prefetcher(self, *args, **kwargs):
+        from plugin_dir.kumoy.local_cache.prefetch import FeaturePrefetcher
+
+        return FeaturePrefetcher(*args, **kwargs)
+
+    def test_yields_all_pages_in_order(self, server):
+        with self._prefetcher("vector-1") as features:
+            ids = [f["kumoy_id"] for f in features]
+
+        assert ids == list(range(1, 12001))
+        # 5000件 + 5000件 + 2000件
+        assert len(server.requests) == 3
+
+    def test_stops_when_consumer_stops_early(self, server):
+        prefetcher = self._prefetcher("vector-1", prefetch_pages=1)
+        with prefetcher as features:
+            assert next(features)["kumoy_id"] == 1
+
+        assert not prefetcher._thread.isRunning()
+
+    def test_canceled_feedback_ends_iteration(self, server):
+        from qgis.core import QgsFeedback
+
+        feedback = QgsFeedback()
+        prefetcher = self._prefetcher("vector-1", prefetch_pages=1, feedback=feedback)
+        ids = []
+        with prefetcher as features:
+            for feature in features:
+                ids.append(feature["kumoy_id"])
+                if len(ids) == 10:
+                    feedback.cancel()
+
+        assert len(ids) < 12000
+        assert not prefetcher._thread.isRunning()
+
+    def test_stop_ends_iteration_and_wakes_fetcher(self, server):
+        prefetcher = self._prefetcher("vector-1", prefetch_pages=1)
+        with prefetcher as features:
+            next(features)
+            # memo: 取得スレッドは満杯のキューで待っているが、stop()で起こされる
+            prefetcher.stop()
+            assert list(features) == []
+
+        assert not prefetcher._thread.isRunning()
+
+    def test_fetch_error_is_raised_to_consumer(self, server):
+        from plugin_dir.kumoy.api.error import NotFoundError
+
+        with pytest.raises(NotFoundError):
+            with self._prefetcher("missing") as features:
+                list(features)
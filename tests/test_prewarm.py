@@ -0,0 +1,71 @@
+"""キャッシュの事前作成の帯域制限のテスト（QGIS環境が必要）"""
+
+
+class TestBandwidthLimiter:
+    def test_first_reservation_waits_for_its_own_bytes(self, qgis_plugin_path):
+        from plugin_dir.kumoy.provider.prewarm import BandwidthLimiter
+
+        limiter = BandwidthLimiter(1000)
+
+        assert limiter.reserve(500, now=10.0) == 0.5
+
+    def test_reservations_queue_up(self, qgis_plugin_path):
+        from plugin_dir.kumoy.provider.prewarm import BandwidthLimiter
+
+        limiter = BandwidthLimiter(1000)
+        limiter.reserve(1000, now=10.0)
+
+        # 別のスレッドからの受信も合計の帯域に含める
+        assert limiter.reserve(1000, now=10.0) == 2.0
+
+    def test_idle_time_is_not_saved_up(self, qgis_plugin_path):
+        from plugin_dir.kumoy.provider.prewarm import BandwidthLimiter
+
+        limiter = BandwidthLimiter(1000)
+        limiter.reserve(1000, now=10.0)
+
+        assert limiter.reserve(1000, now=60.0) == 1.0
+
+    def test_stop_releases_waiting_consumers(self, qgis_plugin_path):
+        import time
+
+        from plugin_dir.kumoy.provider.prewarm import BandwidthLimiter
+
+        limiter = BandwidthLimiter(1)
+        limiter.stop()
+
+        started = time.monotonic()
+        limiter.consume(60)
+        assert time.monotonic() - started < 1
+
+
+class TestBytesPerFeature:
+    def _entry(self, feature_count, byte_size):
+        from plugin_dir.kumoy.local_cache.manifest import CacheEntry
+
+        return CacheEntry(
+            vector_id="vector",
+            format_version=0,
+            schema_hash="",
+            feature_count=feature_count,
+            byte_size=byte_size,
+            last_updated=None,
+            last_accessed=None,
+            sync_seconds=None,
+        )
+
+    def test_average_of_existing_caches(self, qgis_plugin_path):
+        from plugin_dir.kumoy.provider.prewarm import bytes_per_feature
+
+        entries = [self._entry(100, 10000), self._entry(300, 70000)]
+
+        assert bytes_per_feature(entries) == 200
+
+    def test_default_without_caches(self, qgis_plugin_path):
+        from plugin_dir.kumoy.provider.prewarm import (
+            DEFAULT_BYTES_PER_FEATURE,
+            bytes_per_feature,
+        )
+
+        assert bytes_per_feature([]) == DEFAULT_BYTES_PER_FEATURE
+        assert bytes_per_feature([self._entry(0, 4096)]) == DEFAULT_BYTES_PER_FEATURE
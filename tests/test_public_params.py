@@ -0,0 +1,50 @@
+import pytest
+
+from .stand_in_server import Response, StandInServer, use_stand_in_server
+
+PARAMS = {
+    "cognitoDomain": "auth.example.com",
+    "cognitoClientId": "client",
+    "minQgisPluginVersion": "0.0.1",
+}
+
+
+@pytest.fixture
+def server(qgis_plugin_path):
+    with StandInServer() as s:
+        s.route("GET", r"/api/_public/params", lambda _r, _m: Response.json(PARAMS))
+        with use_stand_in_server(s):
+            yield s
+
+
+class TestPublicParamsService:
+    """/api/_public/params がセッション中に共有されることを検証する"""
+
+    def _service(self):
+        from plugin_dir.kumoy.api.public_params import PublicParamsService
+
+        return PublicParamsService()
+
+    def test_fetched_once_within_ttl(self, server):
+        service = self._service()
+        assert service.get() == PARAMS
+        assert service.get() == PARAMS
+        assert len(server.requests) == 1
+
+    def test_refetched_after_ttl(self, server):
+        service = self._service()
+        service.get()
+        service.get(max_age=0)
+        assert len(server.requests) == 2
+
+    def test_last_known_value_when_server_is_down(self, server):
+        from urllib.error import URLError
+
+        self._service().get()
+        server.stop()
+
+        # 新しいセッションでも設定に保存された値を使える
+        service = self._service()
+        assert service.get(allow_stale=True) == PARAMS
+        with pytest.raises(URLError):
+            service.get()
@@ -0,0 +1,98 @@
+import pytest
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+class TestRetryClassification:
+    """失敗したリクエストを再送してよいかの判定を検証する"""
+
+    def _mod(self):
+        from plugin_dir.kumoy.api import retry
+
+        return retry
+
+    def _errors(self):
+        from plugin_dir.pyqt_version import Q_NETWORK_REPLY_ERROR
+
+        return Q_NETWORK_REPLY_ERROR
+
+    def test_rejected_status_is_always_retried(self):
+        m = self._mod()
+        errors = self._errors()
+        assert m.should_retry(
+            "POST", "/_qgis/vector/{id}/add-features", 429, errors.NoError
+        )
+
+    def test_service_unavailable_needs_retry_after_for_non_idempotent(self):
+        m = self._mod()
+        errors = self._errors()
+        template = "/_qgis/vector/{id}/add-features"
+        # プロキシ・ゲートウェイの503は処理済みの可能性がある
+        assert not m.should_retry("POST", template, 503, errors.NoError)
+        assert m.should_retry("POST", template, 503, errors.NoError, retry_after=1.0)
+        assert m.should_retry("GET", "/vector/{id}", 503, errors.NoError)
+
+    def test_ambiguous_status_only_for_idempotent_requests(self):
+        m = self._mod()
+        errors = self._errors()
+        assert m.should_retry("GET", "/vector/{id}", 504, errors.NoError)
+        assert m.should_retry(
+            "POST", "/_qgis/vector/{id}/delete-features", 502, errors.NoError
+        )
+        # 地物追加は二重登録になりうるため再送しない
+        assert not m.should_retry(
+            "POST", "/_qgis/vector/{id}/add-features", 502, errors.NoError
+        )
+
+    def test_client_errors_are_not_retried(self):
+        m = self._mod()
+        errors = self._errors()
+        for status in (400, 401, 404, 409, 500):
+            assert not m.should_retry("GET", "/vector/{id}", status, errors.NoError)
+
+    def test_network_errors(self):
+        m = self._mod()
+        errors = self._errors()
+        template = "/_qgis/vector/{id}/add-features"
+        assert m.should_retry("POST", template, None, errors.ConnectionRefusedError)
+        assert not m.should_retry("POST", template, None, errors.TimeoutError)
+        assert m.should_retry("GET", "/vector/{id}", None, errors.TimeoutError)
+
+    def test_parse_retry_after(self):
+        m = self._mod()
+        assert m.parse_retry_after("3") == 3.0
+        assert m.parse_retry_after("") is None
+        assert m.parse_retry_after("invalid") is None
+        assert m.parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+
+    def test_delay_is_bounded(self):
+        m = self._mod()
+        policy = m.RetryPolicy(base_delay=1.0, max_delay=4.0)
+        for attempt in range(1, 10):
+            assert 0 <= policy.delay(attempt) <= 4.0
+        assert policy.delay(1, retry_after=3) == 3.0
+
+    def test_long_retry_after_is_not_waited_for(self):
+        m = self._mod()
+        policy = m.RetryPolicy(max_delay=10.0)
+        assert policy.waits_for(None)
+        assert policy.waits_for(10)
+        # 早く再送してもサーバーの負荷を増やすだけなので、待たずに失敗とする
+        assert not policy.waits_for(60)
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+def test_endpoint_template():
+    from plugin_dir.kumoy.api.client import endpoint_template
+
+    assert (
+        endpoint_template(
+            "/_qgis/vector/0b6a1c8e-2f4d-4c3b-9a7e-1d2c3b4a5f6e/get-diff?x=1"
+        )
+        == "/_qgis/vector/{id}/get-diff"
+    )
+    assert endpoint_template("/organization/12/projects") == (
+        "/organization/{id}/projects"
+    )
+    assert endpoint_template("/_qgis/vector/add-features") == (
+        "/_qgis/vector/add-features"
+    )
@@ -0,0 +1,78 @@
+"""serialize_features のユニットテスト（QGIS環境が必要）"""
+
+import pytest
+from qgis.core import QgsFeature, QgsField, QgsFields, QgsGeometry, QgsPointXY
+from qgis.PyQt.QtCore import QDate, QDateTime, QTime, QVariant
+
+
+def _fields():
+    fields = QgsFields()
+    fields.append(QgsField("kumoy_id", QVariant.LongLong))
+    fields.append(QgsField("name", QVariant.String))
+    fields.append(QgsField("count", QVariant.Int))
+    fields.append(QgsField("observed_at", QVariant.DateTime))
+    fields.append(QgsField("observed_on", QVariant.Date))
+    fields.append(QgsField("opens", QVariant.Time))
+    return fields
+
+
+def _feature(attributes):
+    f = QgsFeature(_fields())
+    f.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(139.7, 35.7)))
+    f.setAttributes(attributes)
+    return f
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+class TestSerializeFeatures:
+    """列ごとの変換で従来と同じペイロードが得られることを検証する"""
+
+    def _serialize(self, features):
+        from plugin_dir.kumoy.api.qgis_vector import serialize_features
+
+        return serialize_features(features)
+
+    def test_converts_temporal_values_and_drops_kumoy_id(self):
+        feature = _feature(
+            [
+                1,
+                "駅",
+                3,
+                QDateTime(2026, 2, 4, 10, 29, 41, 859),
+                QDate(2026, 2, 4),
+                QTime(9, 0, 0),
+            ]
+        )
+
+        [result] = self._serialize([feature])
+
+        assert result["kumoy_wkb"] == bytes(feature.geometry().asWkb())
+        assert result["properties"] == {
+            "name": "駅",
+            "count": 3,
+            "observed_at": "2026-02-04T10:29:41.859",
+            "observed_on": "2026-02-04",
+            "opens": "09:00:00.000",
+        }
+
+    def test_null_values_become_none(self):
+        null = QVariant()
+        [result] = self._serialize([_feature([None, null, null, null, null, null])])
+
+        assert result["properties"] == {
+            "name": None,
+            "count": None,
+            "observed_at": None,
+            "observed_on": None,
+            "opens": None,
+        }
+
+    def test_keeps_feature_order(self):
+        features = [_feature([None, f"f{i}", i, None, None, None]) for i in range(5)]
+
+        result = self._serialize(features)
+
+        assert [r["properties"]["count"] for r in result] == list(range(5))
+
+    def test_empty_batch(self):
+        assert self._serialize([]) == []
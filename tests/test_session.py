@@ -0,0 +1,158 @@
+"""ApiSession と非同期API（ApiClient.*_async）のテスト（QGIS環境が必要）"""
+
+import threading
+
+import pytest
+
+from .stand_in_server import Response, StandInServer, use_stand_in_server
+
+
+@pytest.fixture
+def server(qgis_plugin_path):
+    from plugin_dir.kumoy.api.session import get_session
+
+    with StandInServer() as s:
+        s.route("GET", r"/api/item/(\w+)", lambda _r, m: Response.json({"id": m[1]}))
+        with use_stand_in_server(s):
+            get_session().reset_stats()
+            yield s
+
+
+def _wait_for(future):
+    from qgis.PyQt.QtCore import QEventLoop, QTimer
+
+    from plugin_dir.pyqt_version import exec_event_loop
+
+    loop = QEventLoop()
+    future.add_done_callback(lambda _f: loop.quit())
+    QTimer.singleShot(5000, loop.quit)
+    if not future.done():
+        exec_event_loop(loop)
+    return future
+
+
+class TestSessionStats:
+    def test_gui_thread_blocking_requests_open_new_connections(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient
+        from plugin_dir.kumoy.api.session import get_session
+
+        ApiClient.get("/item/a")
+        ApiClient.get("/item/b")
+
+        stats = get_session().stats()
+        # memo: GUIスレッドからのリクエストは毎回新しいスレッドのマネージャーで送信される
+        assert stats.requests == 2
+        assert stats.connections_opened == 2
+        assert stats.connections_reused == 0
+
+    def test_worker_thread_requests_reuse_the_threads_manager(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient
+        from plugin_dir.kumoy.api.session import get_session
+
+        results = []
+        worker = threading.Thread(
+            target=lambda: results.extend(
+                [ApiClient.get("/item/c"), ApiClient.get("/item/d")]
+            )
+        )
+        worker.start()
+        worker.join()
+
+        assert results == [{"id": "c"}, {"id": "d"}]
+        stats = get_session().stats()
+        # スタンドインサーバーはHTTPなのでハンドシェイクは数えられない
+        assert stats.requests == 2
+        assert stats.connections_opened == 0
+        assert stats.connections_reused == 2
+
+    def test_new_connection_is_counted_from_the_reply(self, qgis_plugin_path):
+        from plugin_dir.kumoy.api.session import ApiSession
+
+        class Reply:
+            def attribute(self, _attribute):
+                return False
+
+        session = ApiSession()
+        session.record_reply(Reply(), new_connection=True)
+        session.record_reply(Reply())
+
+        stats = session.stats()
+        assert (stats.requests, stats.connections_opened) == (2, 1)
+        assert stats.connections_reused == 1
+
+
+class TestSessionCache:
+    def test_server_setting_change_rereads_config(self, qgis_plugin_path, monkeypatch):
+        from plugin_dir.kumoy.api import session as session_module
+
+        reads = []
+
+        def get_api_config():
+            reads.append(True)
+            return object()
+
+        monkeypatch.setattr(session_module.api_config, "get_api_config", get_api_config)
+        session = session_module.ApiSession()
+
+        first = session.api_config()
+        assert session.api_config() is first
+        session.invalidate("id_token")
+        assert session.api_config() is first
+        session.invalidate("custom_server_url")
+        assert session.api_config() is not first
+        assert len(reads) == 2
+
+
+class TestAsyncApi:
+    def test_get_async_calls_back_with_result(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient
+
+        future = _wait_for(ApiClient.get_async("/item/e"))
+
+        assert future.done()
+        assert future.result() == {"id": "e"}
+
+    def test_error_is_raised_from_result(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient
+
+        server.route(
+            "PUT",
+            r"/api/item/missing",
+            lambda _r, _m: Response.json({"message": "Not Found"}, status=404),
+        )
+
+        future = _wait_for(ApiClient.put_async("/item/missing", {}))
+
+        assert future.exception() is not None
+        with pytest.raises(Exception):
+            future.result()
+
+    def test_cancel_aborts_request(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient
+
+        release = threading.Event()
+
+        def slow(_request, _match):
+            release.wait(5)
+            return Response.json({})
+
+        server.route("DELETE", r"/api/item/slow", slow)
+        try:
+            future = ApiClient.delete_async("/item/slow")
+            future.cancel()
+            _wait_for(future)
+        finally:
+            release.set()
+
+        assert future.done()
+        assert future.exception() is not None
+
+    def test_gather_keeps_call_order(self, server):
+        from plugin_dir.kumoy.api.client import ApiClient, gather
+
+        results = gather(
+            [lambda i=i: ApiClient.get_async(f"/item/n{i}") for i in range(5)],
+            max_concurrency=2,
+        )
+
+        assert results == [{"id": f"n{i}"} for i in range(5)]
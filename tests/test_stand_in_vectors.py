@@ -0,0 +1,321 @@
+"""スタンドインサーバーの合成ベクターに対して同期・アップロードを実行するテスト（QGIS環境が必要）"""
+
+import pytest
+
+from .stand_in_server import StandInServer, use_stand_in_server
+from .stand_in_vectors import VectorBackend, synthetic_vector
+
+
+def _fields():
+    from qgis.core import QgsField, QgsFields
+    from qgis.PyQt.QtCore import QVariant
+
+    fields = QgsFields()
+    fields.append(QgsField("kumoy_id", QVariant.LongLong))
+    fields.append(QgsField("name", QVariant.String))
+    fields.append(QgsField("category", QVariant.LongLong))
+    fields.append(QgsField("value", QVariant.Double))
+    fields.append(QgsField("active", QVariant.Bool))
+    return fields
+
+
+@pytest.fixture
+def backend(qgis_plugin_path):
+    from plugin_dir.kumoy.local_cache import vector as local_cache
+
+    backend = VectorBackend()
+    # memo: 2ページ目の途中で終わる件数にしてページングを通す
+    backend.add_vector(synthetic_vector("vector-1", 7500))
+    with StandInServer() as server:
+        backend.install(server)
+        with use_stand_in_server(server):
+            yield backend
+    local_cache.clear("vector-1")
+
+
+class TestSyncLocalCache:
+    def _sync(self):
+        from qgis.core import QgsWkbTypes
+
+        from plugin_dir.kumoy.local_cache import vector as local_cache
+
+        local_cache.sync_local_cache("vector-1", _fields(), QgsWkbTypes.Point)
+        return local_cache.get_layer("vector-1")
+
+    def test_full_sync_pages_all_features(self, backend):
+        layer = self._sync()
+
+        assert layer.featureCount() == 7500
+        feature = layer.getFeature(42)
+        expected = backend.vectors["vector-1"].features[42]
+        assert feature["name"] == expected["properties"]["name"]
+        assert bytes(feature.geometry().asWkb()) == expected["kumoy_wkb"]
+
+    def test_diff_applies_server_changes(self, backend):
+        self._sync()
+        vector = backend.vectors["vector-1"]
+        vector.delete(1)
+        vector.features[2]["properties"]["name"] = "renamed"
+        vector.touch(2)
+
+        layer = self._sync()
+
+        assert layer.featureCount() == 7499
+        assert not layer.getFeature(1).isValid()
+        assert layer.getFeature(2)["name"] == "renamed"
+
+    def test_sync_diff_only_updates_existing_cache(self, backend):
+        from qgis.core import QgsWkbTypes
+
+        from plugin_dir.kumoy.local_cache import vector as local_cache
+
+        # キャッシュがなければ作成しない
+        assert local_cache.sync_diff("vector-1", _fields(), QgsWkbTypes.Point) is None
+
+        self._sync()
+        assert local_cache.sync_diff("vector-1", _fields(), QgsWkbTypes.Point) == 0
+
+        backend.vectors["vector-1"].delete(3)
+        assert local_cache.sync_diff("vector-1", _fields(), QgsWkbTypes.Point) == 1
+        assert not local_cache.get_layer("vector-1").getFeature(3).isValid()
+
+    def test_canceled_sync_releases_lock_for_sync_diff(self, backend):
+        from qgis.core import QgsFeedback, QgsWkbTypes
+
+        from plugin_dir.kumoy.local_cache import vector as local_cache
+
+        self._sync()
+        vector = backend.vectors["vector-1"]
+        vector.delete(3)
+        vector.features[2]["properties"]["name"] = "renamed"
+
+        feedback = QgsFeedback()
+        feedback.cancel()
+        with pytest.raises(local_cache.SyncCancelledError):
+            local_cache.sync_local_cache(
+                "vector-1", _fields(), QgsWkbTypes.Point, feedback=feedback
+            )
+        # キャンセルされた同期は何も適用していない
+        assert local_cache.get_layer("vector-1").getFeature(3).isValid()
+
+        # ロックが解放されているので、定期的な同期が差分を適用できる
+        assert local_cache.sync_diff("vector-1", _fields(), QgsWkbTypes.Point) == 2
+        assert not local_cache.get_layer("vector-1").getFeature(3).isValid()
+
+    def test_cancel_while_waiting_for_another_sync(self, backend):
+        import threading
+        import time
+
+        from qgis.core import QgsFeedback, QgsWkbTypes
+
+        from plugin_dir.kumoy.local_cache import vector as local_cache
+
+        feedback = QgsFeedback()
+        canceler = threading.Timer(0.1, feedback.cancel)
+        # 別の同期がロックを持ったまま終わらない
+        with local_cache._sync_lock("vector-1"):
+            canceler.start()
+            started = time.monotonic()
+            with pytest.raises(local_cache.SyncCancelledError):
+                local_cache.sync_local_cache(
+                    "vector-1", _fields(), QgsWkbTypes.Point, feedback=feedback
+                )
+            assert time.monotonic() - started < 5
+        canceler.join()
+
+    def test_background_sync_yields_to_waiting_sync(self, qgis_plugin_path):
+        import threading
+        import time
+
+        from qgis.core import QgsFeedback
+
+        from plugin_dir.kumoy.local_cache import vector as local_cache
+
+        lock = local_cache._sync_lock("vector-yield")
+        background = QgsFeedback()
+        lock.acquire()
+        local_cache._yielding_feedbacks["vector-yield"] = background
+
+        def background_sync():
+            # キャンセルされたらロックを手放す
+            while not background.isCanceled():
+                time.sleep(0.01)
+            local_cache._yielding_feedbacks.pop("vector-yield", None)
+            lock.release()
+
+        thread = threading.Thread(target=background_sync)
+        thread.start()
+        local_cache._acquire_sync_lock("vector-yield", lock, None)
+        lock.release()
+        thread.join()
+
+        assert background.isCanceled()
+
+
+class TestResumeCacheBuild:
+    def test_interrupted_build_resumes_from_committed_features(
+        self, qgis_plugin_path, monkeypatch
+    ):
+        import os
+
+        from qgis.core import QgsWkbTypes
+
+        from plugin_dir.kumoy import api
+        from plugin_dir.kumoy.local_cache import bulk_writer
+        from plugin_dir.kumoy.local_cache import vector as local_cache
+
+        from .stand_in_server import Response
+        from .stand_in_vectors import _decode_features
+
+        monkeypatch.setattr(bulk_writer, "TRANSACTION_SIZE", 1000)
+        backend = VectorBackend()
+        backend.add_vector(synthetic_vector("vector-1", 7500))
+        get_features = backend._get_features_v2
+
+        def fail_after_first_page(vector, request):
+            if _decode_features(request).get("after_id"):
+                return Response.json(
+                    {"message": "Application Error", "error": "INTERRUPTED"},
+                    status=400,
+                )
+            return get_features(vector, request)
+
+        cache_file = os.path.join(local_cache._get_cache_dir(), "vector-1.gpkg")
+        local_cache.clear("vector-1")
+        try:
+            with StandInServer() as server:
+                backend.install(server)
+                with use_stand_in_server(server):
+                    backend._get_features_v2 = fail_after_first_page
+                    with pytest.raises(api.error.AppError):
+                        local_cache.sync_local_cache(
+                            "vector-1", _fields(), QgsWkbTypes.Point
+                        )
+                    # 作成途中のファイルはキャッシュとして見えない
+                    assert not os.path.exists(cache_file)
+
+                    backend._get_features_v2 = get_features
+                    server.requests.clear()
+                    local_cache.sync_local_cache(
+                        "vector-1", _fields(), QgsWkbTypes.Point
+                    )
+
+                    # 1ページ目（コミット済み）の続きから取得している
+                    first = next(
+                        r for r in server.requests if r.path.endswith("get-features-v2")
+                    )
+                    assert _decode_features(first)["after_id"] == 5000
+            assert local_cache.get_layer("vector-1").featureCount() == 7500
+            assert not os.path.exists(local_cache._part_file(cache_file))
+        finally:
+            local_cache.clear("vector-1")
+
+    def test_canceled_build_closes_part_file_and_resumes(
+        self, qgis_plugin_path, monkeypatch
+    ):
+        import os
+        import sqlite3
+
+        from qgis.core import QgsFeedback, QgsWkbTypes
+
+        from plugin_dir.kumoy.local_cache import bulk_writer
+        from plugin_dir.kumoy.local_cache import vector as local_cache
+
+        from .stand_in_vectors import _decode_features
+
+        monkeypatch.setattr(bulk_writer, "TRANSACTION_SIZE", 1000)
+        backend = VectorBackend()
+        backend.add_vector(synthetic_vector("vector-1", 7500))
+
+        cache_file = os.path.join(local_cache._get_cache_dir(), "vector-1.gpkg")
+        part_file = local_cache._part_file(cache_file)
+        local_cache.clear("vector-1")
+        try:
+            with StandInServer() as server:
+                backend.install(server)
+                with use_stand_in_server(server):
+                    feedback = QgsFeedback()
+
+                    def cancel_midway(processed_count):
+                        if processed_count == 5500:
+                            feedback.cancel()
+
+                    with pytest.raises(local_cache.SyncCancelledError):
+                        local_cache.sync_local_cache(
+                            "vector-1",
+                            _fields(),
+                            QgsWkbTypes.Point,
+                            progress_callback=cancel_midway,
+                            feedback=feedback,
+                        )
+                    assert not os.path.exists(cache_file)
+
+                    # 一時ファイルは閉じられていて、書き込みのロックが残っていない
+                    connection = sqlite3.connect(part_file, timeout=0)
+                    try:
+                        connection.execute("BEGIN IMMEDIATE")
+                        connection.rollback()
+                    finally:
+                        connection.close()
+                    # 同期のロックも解放されている
+                    assert local_cache._sync_lock("vector-1").acquire(blocking=False)
+                    local_cache._sync_lock("vector-1").release()
+
+                    server.requests.clear()
+                    local_cache.sync_local_cache(
+                        "vector-1", _fields(), QgsWkbTypes.Point
+                    )
+
+                    # キャンセルまでに書き込んだ地物の続きから取得している
+                    first = next(
+                        r for r in server.requests if r.path.endswith("get-features-v2")
+                    )
+                    assert _decode_features(first)["after_id"] == 5500
+            assert local_cache.get_layer("vector-1").featureCount() == 7500
+            assert not os.path.exists(part_file)
+        finally:
+            local_cache.clear("vector-1")
+
+
+class TestUpload:
+    def test_add_features_round_trip(self, backend):
+        from qgis.core import QgsFeature, QgsGeometry, QgsPointXY
+
+        from plugin_dir.kumoy import api
+
+        features = []
+        for i in range(3):
+            f = QgsFeature(_fields())
+            f.setGeometry(QgsGeometry.fromPointXY(QgsPointXY(139 + i, 35)))
+            f["name"] = f"uploaded {i}"
+            features.append(f)
+
+        api.qgis_vector.add_features("vector-1", features)
+
+        stored = list(backend.vectors["vector-1"].features.values())[-3:]
+        assert [f["properties"]["name"] for f in stored] == [
+            "uploaded 0",
+            "uploaded 1",
+            "uploaded 2",
+        ]
+        assert stored[0]["kumoy_wkb"] == bytes(features[0].geometry().asWkb())
+
+
+class TestRecording:
+    def test_replays_recorded_responses(self, qgis_plugin_path, tmp_path):
+        from plugin_dir.kumoy import api
+
+        path = str(tmp_path / "recording.json")
+        backend = VectorBackend()
+        backend.add_vector(synthetic_vector("vector-1", 10))
+        with StandInServer() as server:
+            server.record_responses = True
+            backend.install(server)
+            with use_stand_in_server(server):
+                recorded = api.qgis_vector.get_features("vector-1")
+            server.save_recording(path)
+
+        with StandInServer() as server:
+            server.load_recording(path)
+            with use_stand_in_server(server):
+                assert api.qgis_vector.get_features("vector-1") == recorded
@@ -1,4 +1,4 @@
-"""_get_geometry_type / _create_attribute_list のユニットテスト（QGIS環境が必要）"""
+"""_get_geometry_type / _create_attribute_list / _wkb_size のユニットテスト（QGIS環境が必要）"""
 
 import pytest
 from qgis.core import (
@@ -109,3 +109,20 @@ class TestCreateAttributeList:
     def test_empty_layer(self):
         layer = self._make_layer([])
         assert self._get_fn()(layer) == []
+
+
+@pytest.mark.usefixtures("qgis_plugin_path")
+class TestWkbSize:
+    """_wkb_size が地物のジオメトリのWKBバイト数を返すこと"""
+
+    def test_counts_geometry_and_skips_null(self):
+        from qgis.core import QgsFeature, QgsGeometry
+
+        from plugin_dir.processing.upload_vector.algorithm import _wkb_size
+
+        line = QgsFeature()
+        line.setGeometry(QgsGeometry.fromWkt("LineString (0 0, 1 1, 2 2)"))
+
+        # byte order(1) + type(4) + count(4) + 3 * 2 * 8
+        assert _wkb_size(line) == 57
+        assert _wkb_size(QgsFeature()) == 0
@@ -1,5 +1,4 @@
 import json
-import urllib.request
 import webbrowser
 from urllib.error import HTTPError, URLError
 
@@ -203,11 +202,8 @@ class DialogLogin(QDialog):
 
         try:
             # /api/_public/params エンドポイントからCognito設定を取得
-            api_config = api.config.get_api_config()
-            params_response = urllib.request.urlopen(
-                f"{api_config.SERVER_URL}/api/_public/params"
-            )
-            params_data = json.loads(params_response.read().decode("utf-8"))
+            # memo: 起動時に取得済みであればその値を使う
+            params_data = api.public_params.get_public_params_service().get()
 
             # Check plugin version compatibility
             min_qgisplugin_version = params_data.get("minQgisPluginVersion")
@@ -31,6 +31,7 @@ from ..kumoy.constants import (
     DOCUMENTATION_URL,
     LOG_CATEGORY,
 )
+from ..kumoy.provider.prewarm import schedule_prewarm
 from ..pyqt_version import (
     Q_MESSAGEBOX_STD_BUTTON,
     QDIALOG_CODE,
@@ -694,6 +695,8 @@ class ProjectSelectDialog(QDialog):
         if org and self.selected_project:
             store_setting("selected_organization_id", org.id)
             store_setting("selected_project_id", self.selected_project.id)
+            # 有効な場合、プロジェクトのベクターのキャッシュを事前に作成する
+            schedule_prewarm(self.selected_project.id)
         super().accept()
 
     def load_saved_selection(self):
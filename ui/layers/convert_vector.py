@@ -191,8 +191,9 @@ def convert_to_kumoy(
         # Get the project index for the processing algorithm using project id
         organizations = api.organization.get_organizations()
         all_projects = []
-        for org in organizations:
-            org_projects = api.project.get_projects_by_organization(org.id)
+        for org_projects in api.project.get_projects_by_organizations(
+            [org.id for org in organizations]
+        ):
             all_projects.extend(org_projects)
 
         # Find the index of current project